@@ -1,8 +1,28 @@
 """
 Helpers for cursor manipulation and movement.
 
+Every cursor function prints its escape sequence and flushes right away.
+The matching *_code function only returns the sequence, so many moves can be joined and written at once.
+
 TODO Consider implementing cursor pos save and auto pause on unfocus
 """
+from types import MappingProxyType
+
+# Built once, every lookup shares this read-only table
+MOVE_OPTIONS = MappingProxyType({
+    "up": "A",
+    "down": "B",
+    "right": "C",
+    "left": "D",
+    "next_line": "E",
+    "previous_line": "F",
+    "column": "G",
+    "position": "H",
+    "scroll_up": "S",
+    "scroll_down": "T",
+    "save_position": "s",
+    "load_position": "u"
+})
 
 
 def get_move_options():
@@ -11,6 +31,7 @@ def get_move_options():
 
     :postcondition: get a dictionary of available movement options and their ANSI escape code letter
     :postcondition: the key-value pairs have the form <name>: <sequence letter> and both are strings
+    :postcondition: the same read-only dictionary is returned on every call
     :return: a dictionary representing the available movement options and their ANSI escape code letter.
 
     >>> get_move_options() == {
@@ -28,20 +49,21 @@ def get_move_options():
     ...     "load_position": "u"}
     True
     """
-    return {
-        "up": "A",
-        "down": "B",
-        "right": "C",
-        "left": "D",
-        "next_line": "E",
-        "previous_line": "F",
-        "column": "G",
-        "position": "H",
-        "scroll_up": "S",
-        "scroll_down": "T",
-        "save_position": "s",
-        "load_position": "u"
-    }
+    return MOVE_OPTIONS
+
+
+def cursor_previous_line_code(amount=1):
+    """
+    Get the escape sequence that moves the cursor to column 1 of the line <amount> lines up.
+
+    :param amount: an integer larger than or equal to 0 representing the number of lines to move up
+    :precondition: amount must be an integer larger than or equal to 0
+    :return: a string representing the escape sequence, nothing is printed
+
+    >>> cursor_previous_line_code(5)
+    '\\x1b[5F'
+    """
+    return f"\033[{amount}{MOVE_OPTIONS["previous_line"]}"
 
 
 def cursor_previous_line(amount=1):
@@ -63,7 +85,21 @@ def cursor_previous_line(amount=1):
     >>> cursor_previous_line(5)
     \\x1b[5F
     """
-    print(f"\033[{amount}{get_move_options()["previous_line"]}", end="", flush=True)
+    print(cursor_previous_line_code(amount), end="", flush=True)
+
+
+def cursor_next_line_code(amount=1):
+    """
+    Get the escape sequence that moves the cursor to column 1 of the line <amount> lines down.
+
+    :param amount: an integer larger than or equal to 0 representing the number of lines to move down
+    :precondition: amount must be an integer larger than or equal to 0
+    :return: a string representing the escape sequence, nothing is printed
+
+    >>> cursor_next_line_code(5)
+    '\\x1b[5E'
+    """
+    return f"\033[{amount}{MOVE_OPTIONS["next_line"]}"
 
 
 def cursor_next_line(amount=1):
@@ -85,7 +121,21 @@ def cursor_next_line(amount=1):
     >>> cursor_next_line(5)
     \\x1b[5E
     """
-    print(f"\033[{amount}{get_move_options()["next_line"]}", end="", flush=True)
+    print(cursor_next_line_code(amount), end="", flush=True)
+
+
+def cursor_visibility_code(show):
+    """
+    Get the escape sequence that shows or hides the terminal's cursor.
+
+    :param show: a boolean representing whether to show or hide the cursor
+    :precondition: show must be a boolean
+    :return: a string representing the escape sequence, nothing is printed
+
+    >>> cursor_visibility_code(show=False)
+    '\\x1b[?25l'
+    """
+    return "\033[?25h" if show else "\033[?25l"
 
 
 def set_cursor_visibility(show):
@@ -102,10 +152,23 @@ def set_cursor_visibility(show):
     >>> set_cursor_visibility(show=False)
     \\x1b[?25l
     """
-    if show:
-        print("\033[?25h", end="", flush=True)
-    else:
-        print("\033[?25l", end="", flush=True)
+    print(cursor_visibility_code(show), end="", flush=True)
+
+
+def cursor_set_code(column, row):
+    """
+    Get the escape sequence that sets the cursor's 1-based position to (<column>, <row>).
+
+    :param column: an integer representing the new column (horizontal) position of the cursor
+    :param row: an integer representing the new row (vertical) position of the cursor
+    :precondition: column must be a positive integer larger than 0
+    :precondition: row must be a positive integer larger than 0
+    :return: a string representing the escape sequence, nothing is printed
+
+    >>> cursor_set_code(8, 90)
+    '\\x1b[90;8H'
+    """
+    return f"\033[{row};{column}{MOVE_OPTIONS["position"]}"
 
 
 def cursor_set(column, row):
@@ -129,7 +192,23 @@ def cursor_set(column, row):
     >>> cursor_set(15, 1)
     \\x1b[1;15H
     """
-    print(f"\033[{row};{column}{get_move_options()["position"]}", end="", flush=True)
+    print(cursor_set_code(column, row), end="", flush=True)
+
+
+def cursor_shift_code(direction, amount=1):
+    """
+    Get the escape sequence that shifts the cursor by <amount> in <direction>.
+
+    :param direction: a string representing the direction to shift the cursor in
+    :param amount: an integer representing the number of units to shift the cursor by
+    :precondition: direction must be a string in ("up", "down", "left", "right")
+    :precondition: amount must be a positive integer
+    :return: a string representing the escape sequence, nothing is printed
+
+    >>> cursor_shift_code("left", 20)
+    '\\x1b[20D'
+    """
+    return f"\033[{amount}{MOVE_OPTIONS[direction]}"
 
 
 def cursor_shift(direction, amount=1):
@@ -152,7 +231,7 @@ def cursor_shift(direction, amount=1):
     >>> cursor_shift("left", 20)
     \\x1b[20D
     """
-    print(f"\033[{amount}{get_move_options()[direction]}", end="", flush=True)
+    print(cursor_shift_code(direction, amount), end="", flush=True)
 
 
 def main():
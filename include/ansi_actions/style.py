@@ -2,6 +2,8 @@
 Helpers for visual customization like text colour and emphasis.
 """
 from enum import Enum
+from functools import lru_cache
+from types import MappingProxyType
 
 
 class Style(Enum):
@@ -39,12 +41,53 @@ class Style(Enum):
     BACKGROUND_WHITE = 47
 
 
+# Most (text, styles) pairs style() remembers
+STYLE_CACHE_SIZE = 1024
+
+# Built once, every lookup shares this read-only table
+STYLE_CODES = MappingProxyType({
+    Style.RESET: "\033[0m",
+    Style.BOLD: "\033[1m",
+    Style.DIM: "\033[2m",
+    Style.ITALIC: "\033[3m",
+    Style.UNDERLINE: "\033[4m",
+    # <-Usually only for Windows Powershell->
+    Style.SLOW_BLINK: "\033[5m",
+    Style.RAPID_BLINK: "\033[6m",
+    Style.STRIKE: "\033[9m",
+    # <------------------------------------->
+    Style.NORMAL_INTENSITY: "\033[22m",
+    Style.NOT_ITALIC: "\033[23m",
+    Style.NOT_UNDERLINED: "\033[24m",
+    Style.NOT_BLINKING: "\033[25m",
+    # Foreground Colours
+    Style.BLACK: "\033[30m",
+    Style.RED: "\033[31m",
+    Style.GREEN: "\033[32m",
+    Style.YELLOW: "\033[33m",
+    Style.BLUE: "\033[34m",
+    Style.MAGENTA: "\033[35m",
+    Style.CYAN: "\033[36m",
+    Style.WHITE: "\033[37m",
+    # Background Colours
+    Style.BACKGROUND_BLACK: "\033[40m",
+    Style.BACKGROUND_RED: "\033[41m",
+    Style.BACKGROUND_GREEN: "\033[42m",
+    Style.BACKGROUND_YELLOW: "\033[43m",
+    Style.BACKGROUND_BLUE: "\033[44m",
+    Style.BACKGROUND_MAGENTA: "\033[45m",
+    Style.BACKGROUND_CYAN: "\033[46m",
+    Style.BACKGROUND_WHITE: "\033[47m"
+})
+
+
 def get_styles():
     """
     Return a dictionary of available styles and their ANSI escape sequences.
 
     :postcondition: get a dictionary of available styles and their ANSI escape sequences
     :postcondition: the key-value pairs have the form <name>: <sequence> and both are strings
+    :postcondition: the same read-only dictionary is returned on every call
     :return: a dictionary representing the available styles and their ANSI escape sequences.
 
     >>> get_styles() == {
@@ -78,48 +121,18 @@ def get_styles():
     ...     "background_white": "\\033[47m"}
     True
     """
-    return {
-        Style.RESET: "\033[0m",
-        Style.BOLD: "\033[1m",
-        Style.DIM: "\033[2m",
-        Style.ITALIC: "\033[3m",
-        Style.UNDERLINE: "\033[4m",
-        # <-Usually only for Windows Powershell->
-        Style.SLOW_BLINK: "\033[5m",
-        Style.RAPID_BLINK: "\033[6m",
-        Style.STRIKE: "\033[9m",
-        # <------------------------------------->
-        Style.NORMAL_INTENSITY: "\033[22m",
-        Style.NOT_ITALIC: "\033[23m",
-        Style.NOT_UNDERLINED: "\033[24m",
-        Style.NOT_BLINKING: "\033[25m",
-        # Foreground Colours
-        Style.BLACK: "\033[30m",
-        Style.RED: "\033[31m",
-        Style.GREEN: "\033[32m",
-        Style.YELLOW: "\033[33m",
-        Style.BLUE: "\033[34m",
-        Style.MAGENTA: "\033[35m",
-        Style.CYAN: "\033[36m",
-        Style.WHITE: "\033[37m",
-        # Background Colours
-        Style.BACKGROUND_BLACK: "\033[40m",
-        Style.BACKGROUND_RED: "\033[41m",
-        Style.BACKGROUND_GREEN: "\033[42m",
-        Style.BACKGROUND_YELLOW: "\033[43m",
-        Style.BACKGROUND_BLUE: "\033[44m",
-        Style.BACKGROUND_MAGENTA: "\033[45m",
-        Style.BACKGROUND_CYAN: "\033[46m",
-        Style.BACKGROUND_WHITE: "\033[47m"
-    }
+    return STYLE_CODES
 
 
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
 def style(text, *styles, reset=True):
     """
     Return <text> with the style <type> prepended to it.
 
     The optional <reset> will append the ANSI reset code to <text>
 
+    Results are cached, so styling the same text the same way again is a lookup.
+
     :param text: a string representing the text to style
     :param reset: a boolean representing whether to reset the styling after <text>
     :param styles: Styles or strings representing the styles to apply to <text>
@@ -137,11 +150,11 @@ def style(text, *styles, reset=True):
     '\\x1b[1m\\x1b[34mThis is bold and blue and not reset'
     """
     codes = "".join(map(
-        lambda name: get_styles()[name if type(name) == Style else Style[name.upper()]],
+        lambda name: STYLE_CODES[name if type(name) == Style else Style[name.upper()]],
         styles))
     new_text = codes + text
     if reset:
-        new_text += get_styles()[Style.RESET]
+        new_text += STYLE_CODES[Style.RESET]
     return new_text
 
 
@@ -155,7 +168,7 @@ def reset_style():
     >>> reset_style()
     \\x1b[0m
     """
-    print(get_styles()[Style.RESET], end="", flush=True)
+    print(STYLE_CODES[Style.RESET], end="", flush=True)
 
 
 def main():
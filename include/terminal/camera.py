@@ -0,0 +1,171 @@
+"""
+Camera that shows part of a world larger than the terminal.
+
+World cells are 1-based like terminal cells. The camera keeps the world position of the top left screen cell,
+and everything drawn through it is moved by that offset. Cells outside the view are skipped before they reach
+a frame buffer, so drawing costs the same however large the world is.
+"""
+from terminal.render import clear_cell, set_cell
+from utils.utilities import clamp_view_start
+
+
+def create_camera(width, height, world_width=None, world_height=None):
+    """
+    Get a camera dictionary showing a <width> by <height> area from the top left of the world.
+
+    A camera dictionary has the form:
+    {"left": <int>, "top": <int>, "width": <int>, "height": <int>, "world_width": <int>, "world_height": <int>}
+
+    :param width: a positive integer representing the columns of the view
+    :param height: a positive integer representing the rows of the view
+    :param world_width: (default None) a positive integer representing the columns of the world,
+                        or None if the camera may scroll anywhere
+    :param world_height: (default None) a positive integer representing the rows of the world,
+                         or None if the camera may scroll anywhere
+    :precondition: width and height must be positive integers
+    :return: a dictionary representing a camera
+
+    >>> camera = create_camera(10, 5, 40, 20)
+    >>> camera["left"], camera["top"], camera["width"], camera["height"]
+    (1, 1, 10, 5)
+    """
+    return {
+        "left": 1,
+        "top": 1,
+        "width": width,
+        "height": height,
+        "world_width": world_width,
+        "world_height": world_height}
+
+
+def resize_camera(camera, width, height):
+    """
+    Change the size of the view of <camera>, keeping its top left corner.
+
+    :param camera: a dictionary representing a camera created by create_camera()
+    :param width: a positive integer representing the new columns of the view
+    :param height: a positive integer representing the new rows of the view
+    :precondition: camera must be a well-formed camera dictionary
+    :postcondition: the view is <width> by <height>
+
+    >>> camera = create_camera(10, 5)
+    >>> resize_camera(camera, 20, 8)
+    >>> camera["width"], camera["height"]
+    (20, 8)
+    """
+    camera["width"] = width
+    camera["height"] = height
+
+
+def follow(camera, column, row):
+    """
+    Centre the view of <camera> on the world cell (<column>, <row>) without showing past the edges of the world.
+
+    :param camera: a dictionary representing a camera created by create_camera()
+    :param column: an integer representing the world column to follow
+    :param row: an integer representing the world row to follow
+    :precondition: camera must be a well-formed camera dictionary
+    :postcondition: the view is centred on the cell, or as close as the edges of the world allow
+    :return: a boolean representing whether the view moved, in which case everything drawn must be redrawn
+
+    >>> camera = create_camera(10, 5, 40, 20)
+    >>> follow(camera, 20, 10)
+    True
+    >>> camera["left"], camera["top"]
+    (15, 8)
+    >>> follow(camera, 20, 10)
+    False
+    >>> follow(camera, 40, 20)
+    True
+    >>> camera["left"], camera["top"]
+    (31, 16)
+    """
+    left = clamp_view_start(column, camera["width"], camera["world_width"])
+    top = clamp_view_start(row, camera["height"], camera["world_height"])
+    if left == camera["left"] and top == camera["top"]:
+        return False
+    camera["left"] = left
+    camera["top"] = top
+    return True
+
+
+def world_to_screen(camera, column, row):
+    """
+    Get where the world cell (<column>, <row>) is on the screen.
+
+    :param camera: a dictionary representing a camera created by create_camera()
+    :param column: an integer representing the world column of the cell
+    :param row: an integer representing the world row of the cell
+    :precondition: camera must be a well-formed camera dictionary
+    :return: a tuple of two integers representing the screen column and row of the cell,
+             or None if the cell is out of view
+
+    >>> camera = create_camera(10, 5, 40, 20)
+    >>> follow(camera, 20, 10)
+    True
+    >>> world_to_screen(camera, 15, 8)
+    (1, 1)
+    >>> world_to_screen(camera, 24, 12)
+    (10, 5)
+    >>> world_to_screen(camera, 25, 12)
+
+    """
+    screen_column = column - camera["left"] + 1
+    screen_row = row - camera["top"] + 1
+    if 0 < screen_column <= camera["width"] and 0 < screen_row <= camera["height"]:
+        return (screen_column, screen_row)
+    return None
+
+
+def set_world_cell(frame, camera, column, row, character, *styles):
+    """
+    Draw one styled character at the world cell (<column>, <row>) into the back buffer of <frame>.
+
+    :param frame: a dictionary representing a frame buffer created by terminal.render.create_frame_buffer()
+    :param camera: a dictionary representing a camera created by create_camera()
+    :param column: an integer representing the world column of the cell
+    :param row: an integer representing the world row of the cell
+    :param character: a string of one character to draw
+    :param styles: Styles or strings representing the styles to apply to <character>
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :precondition: camera must be a well-formed camera dictionary
+    :postcondition: nothing is drawn if the cell is out of view
+
+    >>> from terminal.render import create_frame_buffer
+    >>> frame = create_frame_buffer(10, 5)
+    >>> camera = create_camera(10, 5, 40, 20)
+    >>> follow(camera, 20, 10)
+    True
+    >>> set_world_cell(frame, camera, 16, 8, "o")
+    >>> frame["back"][1], frame["dirty"]
+    (('o', ''), {1})
+    >>> set_world_cell(frame, camera, 2, 2, "o")
+    >>> frame["dirty"]
+    {1}
+    """
+    position = world_to_screen(camera, column, row)
+    if position is not None:
+        set_cell(frame, position[0], position[1], character, *styles)
+
+
+def clear_world_cell(frame, camera, column, row):
+    """
+    Blank the world cell (<column>, <row>) in the back buffer of <frame> if it is in view.
+
+    :param frame: a dictionary representing a frame buffer created by terminal.render.create_frame_buffer()
+    :param camera: a dictionary representing a camera created by create_camera()
+    :param column: an integer representing the world column of the cell
+    :param row: an integer representing the world row of the cell
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :precondition: camera must be a well-formed camera dictionary
+    :postcondition: nothing is changed if the cell is out of view
+
+    >>> from terminal.render import create_frame_buffer
+    >>> frame = create_frame_buffer(10, 5)
+    >>> clear_world_cell(frame, create_camera(10, 5), 1, 1)
+    >>> frame["dirty"]
+    {0}
+    """
+    position = world_to_screen(camera, column, row)
+    if position is not None:
+        clear_cell(frame, position[0], position[1])
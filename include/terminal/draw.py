@@ -3,7 +3,7 @@ Drawing and animating to the terminal.
 """
 from ansi_actions import cursor
 from terminal.screen import clear_screen
-from utils.utilities import remove_escape_codes, get_escape_codes_indices
+from utils.utilities import clip_escaped_text
 
 
 def create_text_area(column, row, width, height, text=""):
@@ -87,25 +87,19 @@ def draw_text_box(
     if not text_area:
         text_area = create_text_area(column, row, width, height, text)
     text_rows = text_area["text"].split("\n")
-    clip_row_text = lambda row_text: remove_escape_codes(row_text)[:min(len(row_text), text_area["width"])]
-    text_ansi = tuple(map(get_escape_codes_indices, text_rows))
-    text_rows = tuple(map(clip_row_text, text_rows))
+    parts = []
     for row_index in range(text_area["height"]):
         if row_index == len(text_rows) and not overwrite:
             break
-        to_draw = ""
-        cursor.cursor_set(text_area["column"], text_area["row"] + row_index)
+        parts.append(cursor.cursor_set_code(text_area["column"], text_area["row"] + row_index))
+        to_draw, visible_length = "", 0
         if row_index < len(text_rows):
-            ansi_insert = text_rows[row_index]
-            # print(text_ansi, end="")
-            for ansi_code in reversed(text_ansi[row_index]):
-                if ansi_code[0] <= len(text_rows[row_index]):
-                    ansi_insert = ansi_insert[:ansi_code[0]] + ansi_code[1] + ansi_insert[ansi_code[0]:]
-            to_draw = ansi_insert
+            to_draw, visible_length = clip_escaped_text(text_rows[row_index], text_area["width"])
+        parts.append(to_draw)
         if overwrite:
-            to_draw = to_draw.ljust(text_area["width"])
-        print(to_draw, end="")
-    print("", end="", flush=flush_output)
+            # Pad by visible width so escape codes do not count as columns
+            parts.append(" " * (text_area["width"] - visible_length))
+    print("".join(parts), end="", flush=flush_output)
     return text_area
 
 
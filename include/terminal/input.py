@@ -1,7 +1,17 @@
 """
-OS dependent inputs with getch and msvcrt.
+OS dependent inputs with termios and msvcrt.
+
+On POSIX the terminal is put in cbreak mode once and key presses are read without blocking,
+with select() and os.read(), then decoded from a byte buffer so escape sequences split across reads
+are put back together. On Windows msvcrt is polled instead.
 """
+import asyncio
+import atexit
 import os
+import select
+import sys
+import time
+from collections import deque
 from collections.abc import Callable
 from string import printable
 from ansi_actions import cursor
@@ -78,6 +88,98 @@ def get_key_codes(system=os.name):
         return None
 
 
+# Bytes read from the terminal in one os.read()
+READ_SIZE = 1024
+# Seconds between checks for a key press where there is nothing to wait on
+WINDOWS_POLL_INTERVAL = 0.01
+# Seconds to wait for the rest of a split escape sequence before a lone escape byte is the escape key
+ESCAPE_TIMEOUT = 0.05
+# Most key presses kept waiting in an input queue, new presses are rejected past this
+INPUT_QUEUE_SIZE = 64
+# Direction keys and the keys that point the opposite way
+OPPOSITE_KEYS = {"up": "down", "down": "up", "left": "right", "right": "left"}
+
+
+def get_key_names(key_codes):
+    """
+    Get the key names of <key_codes> looked up by key code.
+
+    :param key_codes: a dictionary of key code names and their key codes from get_key_codes()
+    :precondition: key_codes must be a dictionary from get_key_codes()
+    :return: a dictionary of key codes and their key code names
+
+    >>> get_key_names({"enter": "\\n", "up": "escapeA"}) == {"\\n": "enter", "escapeA": "up"}
+    True
+    """
+    return {key_code: key_name for key_name, key_code in key_codes.items()}
+
+
+def decode_key_bytes(buffer, key_names, final=False):
+    """
+    Decode and remove the complete key presses at the front of <buffer>.
+
+    Escape sequences are named like get_key_codes("posix") names them, so "\\x1b[A" is "up".
+    A lone escape byte at the end of <buffer> could still be the start of a sequence,
+    so it is left in the buffer unless <final> is True.
+
+    :param buffer: a bytearray representing the bytes read from the terminal
+    :param key_names: a dictionary of key codes and their names from get_key_names(get_key_codes("posix"))
+    :param final: (default False) a boolean representing whether no more bytes are coming right now
+    :precondition: buffer must be a bytearray
+    :precondition: key_names must be a dictionary from get_key_names(get_key_codes("posix"))
+    :postcondition: decoded bytes are removed from <buffer>, an incomplete key press is left in it
+    :return: a list of strings representing the key names, or the characters for keys without a name
+
+    >>> names = get_key_names(get_key_codes("posix"))
+    >>> data = bytearray(b"a\\x1b[A\\t\\x1b")
+    >>> decode_key_bytes(data, names)
+    ['a', 'up', 'tab']
+    >>> data
+    bytearray(b'\\x1b')
+    >>> decode_key_bytes(data, names, final=True)
+    ['escape']
+    >>> decode_key_bytes(bytearray("é".encode()), names)
+    ['é']
+    """
+    pressed = []
+    index = 0
+    length = len(buffer)
+    while index < length:
+        byte = buffer[index]
+        if byte == 0x1b:
+            if index + 1 == length:
+                if not final:
+                    break
+                code, end = "\x1b", index + 1
+            elif buffer[index + 1] == 0x1b:
+                code, end = "\x1b", index + 2
+            elif buffer[index + 1] in b"[O":
+                # CSI and SS3 sequences end with a byte from "@" to "~"
+                end = index + 2
+                while end < length and not 0x40 <= buffer[end] <= 0x7e:
+                    end += 1
+                if end == length:
+                    if not final:
+                        break
+                    end -= 1
+                end += 1
+                code = "escape" + buffer[index + 2:end].decode("ascii", "replace")
+            else:
+                code, end = "\x1b", index + 1
+        else:
+            # UTF-8 characters take 1 to 4 bytes, told by the first byte
+            end = index + (1 if byte < 0xc0 else 2 if byte < 0xe0 else 3 if byte < 0xf0 else 4)
+            if end > length:
+                if not final:
+                    break
+                end = length
+            code = buffer[index:end].decode("utf-8", "replace")
+        pressed.append(key_names.get(code, code))
+        index = end
+    del buffer[:index]
+    return pressed
+
+
 def init_key_input():
     """
     Return a dictionary representing the info needed for "keyboard" input in the terminal
@@ -85,33 +187,79 @@ def init_key_input():
     The key input dictionary has the following key-value pairs:
         "key_codes": <os dependent dictionary of key codes and their names>\n
         "key_get": <os dependent function for adding the next key press to "input_queue">\n
-        "input_queue": <list backlog of inputs>
+        "key_poll": <os dependent function for adding every key press within a timeout to "input_queue">\n
+        "input_queue": <bounded deque backlog of (<key name>, <time pressed>) from create_input_queue()>\n
+        "accept": <function deciding whether to queue a key press, or None to queue every press>\n
+        "coalesce": <set of key names whose repeated presses are queued once>
+
+    See set_input_rules() for "accept" and "coalesce".
+
+    On POSIX the dictionary also holds the terminal's "file_descriptor", the "key_names" of the key codes,
+    the unread "buffer" of bytes, the "decoded" key presses not handed out yet
+    and the "saved_mode" to restore with restore_key_input(), which also runs at exit.
 
     :return: a dictionary representing the info needed for "keyboard" input in the terminal
     """
     if os.name == "posix":
-        try:
-            from getch import getch
-        except ImportError:
-            print("'getch' module not found: do 'pip install'")
-            return None
+        import termios
+        import tty
         key_codes = get_key_codes("posix")
+        file_descriptor = sys.stdin.fileno()
+        try:
+            saved_mode = termios.tcgetattr(file_descriptor)
+        except termios.error:
+            # Not a terminal, like a pipe, so there is no mode to change
+            saved_mode = None
+        else:
+            # cbreak instead of raw keeps output processing and Ctrl+C working
+            tty.setcbreak(file_descriptor)
+
+        def read_keys(input_info, timeout):
+            buffer = input_info["buffer"]
+            ready, _, _ = select.select((file_descriptor,), (), (), timeout)
+            while ready:
+                data = os.read(file_descriptor, READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                input_info["decoded"].extend(decode_key_bytes(buffer, input_info["key_names"]))
+                # Bytes left over start a sequence split across reads, or are the escape key on its own,
+                # so wait a moment for the rest before deciding
+                ready, _, _ = select.select((file_descriptor,), (), (), ESCAPE_TIMEOUT if buffer else 0)
+            input_info["decoded"].extend(decode_key_bytes(buffer, input_info["key_names"], final=True))
+
+        def key_poll(input_info, timeout=0.0):
+            if not input_info["decoded"]:
+                read_keys(input_info, timeout)
+            pressed = [key_name for key_name in input_info["decoded"] if queue_key_press(input_info, key_name)]
+            input_info["decoded"].clear()
+            return pressed
 
         def key_get(input_info):
-            code = getch()
-            if code == input_info["key_codes"]["escape"]:
-                code = getch()
-                if code != input_info["key_codes"]["escape"]:
-                    code = "escape" + getch()
-            for key_name, key_code in input_info["key_codes"].items():
-                if code == key_code:
-                    input_info["input_queue"].append(key_name)
-                    return key_name
-            # Normal characters and undefined actions
-            return code
+            while not input_info["decoded"]:
+                read_keys(input_info, None)
+            return input_info["decoded"].popleft()
+
+        input_info = {
+            "key_codes": key_codes,
+            "key_get": key_get,
+            "key_poll": key_poll,
+            "input_queue": create_input_queue(),
+            "accept": None,
+            "coalesce": frozenset(),
+            "file_descriptor": file_descriptor,
+            # Built once, every read looks its key codes up here
+            "key_names": get_key_names(key_codes),
+            "buffer": bytearray(),
+            # Key presses read by one os.read() but not handed out yet
+            "decoded": deque(),
+            "saved_mode": saved_mode
+        }
+        atexit.register(restore_key_input, input_info)
+        return input_info
 
     elif os.name == "nt":
-        from msvcrt import getwch
+        from msvcrt import getwch, kbhit
         key_codes = get_key_codes("nt")
 
         def key_get(input_info):
@@ -120,10 +268,22 @@ def init_key_input():
                 code = "extend" + getwch()
             for key_name, key_code in input_info["key_codes"].items():
                 if code == key_code:
-                    input_info["input_queue"].append(key_name)
                     return key_name
             # Normal characters and undefined actions
             return code
+
+        def key_poll(input_info, timeout=0.0):
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not kbhit():
+                if deadline is not None and time.monotonic() >= deadline:
+                    return []
+                time.sleep(WINDOWS_POLL_INTERVAL)
+            pressed = []
+            while kbhit():
+                key_name = key_get(input_info)
+                if queue_key_press(input_info, key_name):
+                    pressed.append(key_name)
+            return pressed
     else:
         print("Unsupported operating system: use Windows or Unix system")
         return None
@@ -131,10 +291,175 @@ def init_key_input():
     return {
         "key_codes": key_codes,
         "key_get": key_get,
-        "input_queue": []
+        "key_poll": key_poll,
+        "input_queue": create_input_queue(),
+        "accept": None,
+        "coalesce": frozenset()
     }
 
 
+def create_input_queue(max_size=INPUT_QUEUE_SIZE):
+    """
+    Get an empty input queue that holds at most <max_size> key presses.
+
+    Key presses are queued as tuples of the form (<key name>, <time pressed>).
+    Once the queue is full queue_key_press() rejects new presses until some are pulled,
+    so the presses kept are always the earliest ones, in the order they were made.
+
+    :param max_size: (default INPUT_QUEUE_SIZE) a positive integer representing the most presses kept
+    :precondition: max_size must be a positive integer
+    :return: a deque representing the input queue
+
+    >>> create_input_queue(2)
+    deque([], maxlen=2)
+    """
+    return deque(maxlen=max_size)
+
+
+def set_input_rules(input_info, accept=None, coalesce=()):
+    """
+    Set which key presses are queued.
+
+    <accept> is called as accept(<key name>, <previous queued key name or None>) for every press,
+    and the press is only queued if it returns True.
+    A press of a key in <coalesce> right after a queued press of the same key is redundant and not queued.
+
+    :param input_info: a dictionary representing the terminal input info created by init_key_input()
+    :param accept: (default None) a function returning whether to queue a key press, or None to queue all of them
+    :param coalesce: (default empty tuple) an iterable of strings representing the key names to coalesce
+    :precondition: input_info must be a well-formed dictionary of input info
+    :postcondition: later key presses are queued by the new rules, already queued presses are kept
+    """
+    input_info["accept"] = accept
+    input_info["coalesce"] = frozenset(coalesce)
+
+
+def reject_reversals(key_name, previous_key_name):
+    """
+    Get whether a direction key press does not point back the opposite way of the previous one.
+
+    Use as the <accept> rule of set_input_rules() so a queued turn cannot be undone into a 180° reversal.
+
+    :param key_name: a string representing the name of the pressed key
+    :param previous_key_name: a string representing the name of the previous queued key, or None
+    :return: a boolean representing whether to queue <key_name>
+
+    >>> reject_reversals("up", "left")
+    True
+    >>> reject_reversals("up", "down")
+    False
+    >>> reject_reversals("a", None)
+    True
+    """
+    return previous_key_name is None or OPPOSITE_KEYS.get(key_name) != previous_key_name
+
+
+def queue_key_press(input_info, key_name, timestamp=None):
+    """
+    Add a key press to the back of the input queue if the input rules allow it and the queue is not full.
+
+    A full queue keeps the presses it already holds and rejects the new one,
+    as dropping an earlier press would replay the later ones out of context.
+
+    :param input_info: a dictionary representing the terminal input info created by init_key_input()
+    :param key_name: a string representing the name of the pressed key
+    :param timestamp: (default None) a float representing when the key was pressed in time.monotonic() seconds,
+                      or None for now
+    :precondition: input_info must be a dictionary of input info with the keys "input_queue", "accept" and "coalesce"
+    :postcondition: the press is appended as (<key_name>, <timestamp>) unless it is rejected, redundant
+                    or the queue is full
+    :return: a boolean representing whether the press was queued
+
+    >>> input_dictionary = {"input_queue": create_input_queue(), "accept": reject_reversals, "coalesce": {"up"}}
+    >>> queue_key_press(input_dictionary, "up", 1.0)
+    True
+    >>> queue_key_press(input_dictionary, "up", 1.5)
+    False
+    >>> queue_key_press(input_dictionary, "down", 2.0)
+    False
+    >>> queue_key_press(input_dictionary, "left", 2.5)
+    True
+    >>> list(input_dictionary["input_queue"])
+    [('up', 1.0), ('left', 2.5)]
+    >>> input_dictionary["input_queue"] = create_input_queue(2)
+    >>> queue_key_press(input_dictionary, "a", 3.0), queue_key_press(input_dictionary, "b", 3.5)
+    (True, True)
+    >>> queue_key_press(input_dictionary, "c", 4.0)
+    False
+    >>> list(input_dictionary["input_queue"])
+    [('a', 3.0), ('b', 3.5)]
+    """
+    queue = input_info["input_queue"]
+    if len(queue) == queue.maxlen:
+        return False
+    previous_key_name = queue[-1][0] if queue else None
+    if key_name == previous_key_name and key_name in input_info.get("coalesce", ()):
+        return False
+    accept = input_info.get("accept")
+    if accept is not None and not accept(key_name, previous_key_name):
+        return False
+    queue.append((key_name, time.monotonic() if timestamp is None else timestamp))
+    return True
+
+
+def restore_key_input(input_info):
+    """
+    Put the terminal back in the mode it was in before init_key_input().
+
+    :param input_info: a dictionary representing the terminal input info created by init_key_input()
+    :precondition: input_info must be a well-formed dictionary of input info
+    :postcondition: the terminal echoes and buffers lines again, nothing happens on Windows or if already restored
+    """
+    saved_mode = input_info.get("saved_mode")
+    if saved_mode is None:
+        return
+    import termios
+    termios.tcsetattr(input_info["file_descriptor"], termios.TCSADRAIN, saved_mode)
+    input_info["saved_mode"] = None
+
+
+def poll_key_presses(input_info, timeout=0.0):
+    """
+    Get every key press that arrives within <timeout> seconds without blocking longer.
+
+    :param input_info: a dictionary representing the terminal input info created by init_key_input()
+    :param timeout: (default 0.0) a float representing the most seconds to wait for a key press,
+                    or None to wait until one arrives
+    :precondition: input_info must be a well-formed dictionary of input info with the key "key_poll"
+    :postcondition: the key presses are queued with queue_key_press(), and must be taken with pull_input()
+                    as a full queue rejects new presses
+    :return: a list of strings representing the key names of the queued presses, empty if there were none
+    """
+    return input_info["key_poll"](input_info, timeout)
+
+
+async def read_key_presses(input_info):
+    """
+    Wait in the running event loop until keys are pressed, without blocking other tasks.
+
+    :param input_info: a dictionary representing the terminal input info created by init_key_input()
+    :precondition: input_info must be a well-formed dictionary of input info
+    :postcondition: the key presses are queued with queue_key_press()
+    :return: a list of strings representing the key names of the queued presses
+    """
+    loop = asyncio.get_running_loop()
+    if "file_descriptor" not in input_info:
+        # msvcrt has nothing to wait on, so poll it between other tasks
+        while not (pressed := poll_key_presses(input_info)):
+            await asyncio.sleep(WINDOWS_POLL_INTERVAL)
+        return pressed
+    while True:
+        ready = loop.create_future()
+        loop.add_reader(input_info["file_descriptor"], ready.set_result, None)
+        try:
+            await ready
+        finally:
+            loop.remove_reader(input_info["file_descriptor"])
+        pressed = poll_key_presses(input_info)
+        if pressed:
+            return pressed
+
+
 def poll_key_press(input_info):
     """
     Poll the next key press.
@@ -142,21 +467,22 @@ def poll_key_press(input_info):
     :param input_info: a dictionary representing the terminal input info created by init_key_input()
     :precondition: input_info must be a well-formed dictionary of input info with the keys "key_get" and "input_queue"
     :postcondition: poll a key press via <input_info["key_get"]>
-    :postcondition: inputted key code will be appended to <input_info["input_queue"]>
+    :postcondition: inputted key code will be queued with queue_key_press()
     :return: the key code of the polled input from <input_info["key_get"]>
     """
     inputted = input_info["key_get"](input_info)
-    input_info["input_queue"].append(inputted)
+    queue_key_press(input_info, inputted)
     return inputted
 
 
-def pull_input(input_info, amount=1, flush=False):
+def pull_input(input_info, amount=1, flush=False, timestamps=False):
     """
     Pop the next <amount> inputs in the queue.
 
     :param input_info: a dictionary representing the terminal input info created by init_key_input()
     :param amount: an integer greater than or equal to -1 representing the number of inputs to pull
     :param flush: a boolean representing whether to clear the queue after getting the input
+    :param timestamps: (default False) a boolean representing whether to pull (<key name>, <time pressed>) tuples
     :precondition: input_info must be a dictionary of terminal input info with the key "input_queue"
     :precondition: amount must be an integer greater than or equal to -1
     :precondition: flush must be a boolean
@@ -167,23 +493,30 @@ def pull_input(input_info, amount=1, flush=False):
     :return: a list of string(s) representing the popped input names,
              or None if <amount> is out of range of the input queue
 
-    >>> input_dictionary = {"input_queue": []}
+    >>> input_dictionary = {"input_queue": create_input_queue()}
     >>> pull_input(input_dictionary)
 
-    >>> input_dictionary = {"input_queue": [" ", "a", "escape"]}
+    >>> input_dictionary["input_queue"].extend([(" ", 1.0), ("a", 2.0), ("escape", 3.0)])
     >>> pull_input(input_dictionary, amount=2, flush=True)
     [' ', 'a']
     >>> input_dictionary["input_queue"]
-    []
+    deque([], maxlen=64)
+    >>> input_dictionary["input_queue"].append(("up", 4.0))
+    >>> pull_input(input_dictionary, amount=-1, timestamps=True)
+    [('up', 4.0)]
     """
-    queue_length = len(input_info["input_queue"])
+    queue = input_info["input_queue"]
+    queue_length = len(queue)
     if queue_length < amount or amount == 0:
         return None
     if amount == -1:
         amount = queue_length
-    inputs = [input_info["input_queue"].pop(0) for _ in range(amount)]
+    if timestamps:
+        inputs = [queue.popleft() for _ in range(amount)]
+    else:
+        inputs = [queue.popleft()[0] for _ in range(amount)]
     if flush:
-        input_info["input_queue"].clear()
+        queue.clear()
     return inputs
 
 
@@ -4,7 +4,7 @@ Option menus.
 from collections import deque
 
 from terminal.draw import create_text_area, draw_text_box
-from terminal.input import init_key_input, pull_input
+from terminal.input import init_key_input, poll_key_press, pull_input
 from terminal.screen import clear_screen, get_screen_size
 from utils.utilities import longest_string, remove_escape_codes
 
@@ -19,6 +19,8 @@ def create_menu(column, row, *options, default=0):
         "previous_option": <function>
         "draw_menu": <function>
         "update_menu": <function>
+        "select_option": <function>
+        "get_selected_option": <function>
     }
 
     :param column: a positive integer greater than 0 representing
@@ -54,16 +56,38 @@ def create_menu(column, row, *options, default=0):
         :postcondition: update the menu
         :postcondition: draw the menu to the terminal
         """
+        choice = select_option(key_press)
+        if choice is not None:
+            return choice
+
+        draw_menu()
+        return None
+
+    def select_option(key_press):
+        """
+        Update the selected option based on the input without drawing the menu.
+
+        :precondition: the menu must be well-formed
+        :postcondition: "up" and "down" shift the selected option
+        :return: the selected option if <key_press> chose it, otherwise None
+        """
         if key_press == "up":
             previous_option()
         elif key_press == "down":
             next_option()
         elif key_press in (" ", "enter"):
             return options[selected_index]
-
-        draw_menu()
         return None
 
+    def get_selected_option():
+        """
+        Get the selected option.
+
+        :precondition: the menu must be well-formed
+        :return: a string representing the selected option
+        """
+        return options[selected_index]
+
     def draw_menu():
         """
         Draw the menu.
@@ -104,7 +128,9 @@ def create_menu(column, row, *options, default=0):
         "next_option": next_option,
         "previous_option": previous_option,
         "draw_menu": draw_menu,
-        "update_menu": update_menu}
+        "update_menu": update_menu,
+        "select_option": select_option,
+        "get_selected_option": get_selected_option}
 
 
 def get_centered_menu_position(*options):
@@ -136,7 +162,7 @@ def main():
     clear_screen()
     test_menu["draw_menu"]()
     while True:
-        if key_input["key_get"](key_input) in ("escape", "tab"):
+        if poll_key_press(key_input) in ("escape", "tab"):
             return
         inputted = pull_input(key_input, flush=True)[0]
         selected = test_menu["update_menu"](inputted)
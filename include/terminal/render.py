@@ -0,0 +1,229 @@
+"""
+Double-buffered drawing to the terminal.
+
+Cells are drawn into a back buffer and only the cells that differ from what is already on the screen
+(the front buffer) are written, as one string, when the frame is rendered.
+"""
+import sys
+
+from ansi_actions.cursor import cursor_set_code
+from ansi_actions.style import style, Style, STYLE_CODES
+
+BLANK_CELL = (" ", "")
+
+
+def create_frame_buffer(width, height):
+    """
+    Get a frame buffer dictionary covering a <width> by <height> area from the top left of the terminal.
+
+    A frame buffer dictionary has the form:
+    {"width": <int>, "height": <int>, "front": <list of cells>, "back": <list of cells>, "dirty": <set of ints>}
+
+    A cell is a tuple of the form (<character>, <style escape codes>),
+    and cells are stored row by row so (<column>, <row>) is at index (<row> - 1) * <width> + <column> - 1.
+
+    :param width: a positive integer greater than 0 representing the columns of the frame
+    :param height: a positive integer greater than 0 representing the rows of the frame
+    :precondition: width must be a positive integer greater than 0
+    :precondition: height must be a positive integer greater than 0
+    :postcondition: both buffers start blank, matching a cleared screen
+    :return: a dictionary representing a frame buffer
+
+    >>> frame = create_frame_buffer(3, 2)
+    >>> frame["width"], frame["height"], len(frame["back"]), frame["dirty"]
+    (3, 2, 6, set())
+    """
+    return {
+        "width": width,
+        "height": height,
+        "front": [BLANK_CELL] * (width * height),
+        "back": [BLANK_CELL] * (width * height),
+        "dirty": set()}
+
+
+def set_cell(frame, column, row, character, *styles):
+    """
+    Draw one styled character into the back buffer of <frame>.
+
+    :param frame: a dictionary representing a frame buffer created by create_frame_buffer()
+    :param column: an integer representing the 1-based column of the cell
+    :param row: an integer representing the 1-based row of the cell
+    :param character: a string of one character to draw
+    :param styles: Styles or strings representing the styles to apply to <character>
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :precondition: character must be a string of length 1
+    :postcondition: the cell is drawn on the next render if it differs from the screen
+    :postcondition: cells outside of the frame are ignored
+
+    >>> frame = create_frame_buffer(3, 2)
+    >>> set_cell(frame, 2, 2, "o", "green")
+    >>> frame["back"][4], frame["dirty"]
+    (('o', '\\x1b[32m'), {4})
+    >>> set_cell(frame, 4, 1, "x")
+    >>> frame["dirty"]
+    {4}
+    """
+    if not (0 < column <= frame["width"] and 0 < row <= frame["height"]):
+        return
+    index = (row - 1) * frame["width"] + column - 1
+    frame["back"][index] = (character, style("", *styles, reset=False) if styles else "")
+    frame["dirty"].add(index)
+
+
+def clear_cell(frame, column, row):
+    """
+    Blank one cell in the back buffer of <frame>.
+
+    :param frame: a dictionary representing a frame buffer created by create_frame_buffer()
+    :param column: an integer representing the 1-based column of the cell
+    :param row: an integer representing the 1-based row of the cell
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :postcondition: the cell is blanked on the next render if it is not blank on the screen
+
+    >>> frame = create_frame_buffer(3, 2)
+    >>> clear_cell(frame, 1, 1)
+    >>> frame["back"][0], frame["dirty"]
+    ((' ', ''), {0})
+    """
+    set_cell(frame, column, row, " ")
+
+
+def clear_frame(frame):
+    """
+    Blank every cell in the back buffer of <frame>, for redrawing everything after the view moves.
+
+    Cells that are drawn again before the next render cost nothing, since only differences reach the screen.
+
+    :param frame: a dictionary representing a frame buffer created by create_frame_buffer()
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :postcondition: every non-blank back buffer cell is blanked and marked to be drawn
+
+    >>> frame = create_frame_buffer(2, 1)
+    >>> set_cell(frame, 2, 1, "o")
+    >>> get_frame_changes(frame)
+    '\\x1b[1;2Ho'
+    >>> clear_frame(frame)
+    >>> get_frame_changes(frame)
+    '\\x1b[1;2H '
+    """
+    back = frame["back"]
+    for index, cell in enumerate(back):
+        if cell != BLANK_CELL:
+            back[index] = BLANK_CELL
+            frame["dirty"].add(index)
+
+
+def invalidate_frame(frame):
+    """
+    Forget what is on the screen so the next render redraws every cell of the back buffer.
+
+    Use after something else draws over the frame, like clearing the screen.
+
+    :param frame: a dictionary representing a frame buffer created by create_frame_buffer()
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :postcondition: the front buffer is blank, and every non-blank back buffer cell is marked to be drawn
+
+    >>> frame = create_frame_buffer(2, 1)
+    >>> set_cell(frame, 1, 1, "o")
+    >>> get_frame_changes(frame)
+    '\\x1b[1;1Ho'
+    >>> invalidate_frame(frame)
+    >>> get_frame_changes(frame)
+    '\\x1b[1;1Ho'
+    """
+    back = frame["back"]
+    frame["front"] = [BLANK_CELL] * len(back)
+    frame["dirty"] = {index for index, cell in enumerate(back) if cell != BLANK_CELL}
+
+
+def get_frame_changes(frame):
+    """
+    Get the escape codes and characters that bring the screen up to date with the back buffer.
+
+    Only changed cells are included. Cells that follow each other on a row share one cursor move,
+    and style codes are only added when the style changes.
+
+    :param frame: a dictionary representing a frame buffer created by create_frame_buffer()
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :postcondition: the front buffer matches the back buffer and no cells are left marked
+    :return: a string representing the output that draws the changes, empty if nothing changed
+
+    >>> frame = create_frame_buffer(4, 2)
+    >>> set_cell(frame, 2, 1, "a")
+    >>> set_cell(frame, 3, 1, "b")
+    >>> set_cell(frame, 1, 2, "c", "red")
+    >>> get_frame_changes(frame)
+    '\\x1b[1;2Hab\\x1b[2;1H\\x1b[31mc\\x1b[0m'
+    >>> set_cell(frame, 2, 1, "a")
+    >>> get_frame_changes(frame)
+    ''
+    """
+    dirty = frame["dirty"]
+    if not dirty:
+        return ""
+    width = frame["width"]
+    front = frame["front"]
+    back = frame["back"]
+    parts = []
+    current_style = ""
+    next_index = -1
+    for index in sorted(dirty):
+        cell = back[index]
+        if cell == front[index]:
+            continue
+        front[index] = cell
+        if index != next_index or index % width == 0:
+            parts.append(cursor_set_code(index % width + 1, index // width + 1))
+        character, cell_style = cell
+        if cell_style != current_style:
+            if current_style:
+                parts.append(STYLE_CODES[Style.RESET])
+            parts.append(cell_style)
+            current_style = cell_style
+        parts.append(character)
+        next_index = index + 1
+    if current_style:
+        parts.append(STYLE_CODES[Style.RESET])
+    dirty.clear()
+    return "".join(parts)
+
+
+def render_frame(frame, output=None):
+    """
+    Write the changes in <frame> to the terminal with one write and one flush.
+
+    :param frame: a dictionary representing a frame buffer created by create_frame_buffer()
+    :param output: (default sys.stdout) a text stream to write to
+    :precondition: frame must be a well-formed frame buffer dictionary
+    :postcondition: the changed cells are drawn and the front buffer matches the back buffer
+    :return: an integer representing the number of characters written
+    """
+    changes = get_frame_changes(frame)
+    if not changes:
+        return 0
+    if output is None:
+        output = sys.stdout
+    output.write(changes)
+    output.flush()
+    return len(changes)
+
+
+def main():
+    """
+    Drive the program.
+    """
+    from terminal.screen import clear_screen, get_screen_size
+    import time
+
+    clear_screen()
+    width, height = get_screen_size()
+    frame = create_frame_buffer(width, height)
+    for step in range(width - 1):
+        clear_cell(frame, step, height // 2)
+        set_cell(frame, step + 1, height // 2, "o", "green")
+        render_frame(frame)
+        time.sleep(0.02)
+
+
+if __name__ == '__main__':
+    main()
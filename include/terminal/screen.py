@@ -1,26 +1,62 @@
 """
 Terminal information and manipulation.
+
+The terminal size is read once and cached. Where the system sends SIGWINCH the cache is only marked stale
+when the terminal is resized, and check_screen_size() reads the new size and tells the resize listeners.
+Elsewhere check_screen_size() reads the size on every call.
 """
 import os
+import signal
+
+# Erases the whole screen and moves the cursor to the top left corner
+CLEAR_SCREEN_CODE = "\x1b[2J\x1b[H"
+
+# Cached terminal size and the functions told when it changes
+screen_state = {
+    "size": None,
+    "stale": True,
+    "listeners": [],
+    "watching": False
+}
 
 
-def clear_screen():
+def clear_screen(flush_output=True):
     """
-    Clear the terminal screen based on the operating system.
+    Clear the terminal screen with an escape sequence.
 
-    :precondition: terminal must be run from a Windows or Posix style system
-    :postcondition: clear the terminal screen based on the operating system
+    :param flush_output: (default True) a boolean representing whether to flush the output right away
+    :precondition: terminal must understand ANSI escape sequences
+    :postcondition: clear the terminal screen and move the cursor to the top left corner
     """
-    os.system("clear" if os.name == "posix" else "cls")
+    print(CLEAR_SCREEN_CODE, end="", flush=flush_output)
 
 
 def get_screen_size():
     """
     Get the dimensions of the terminal as a tuple.
 
+    The size is only read from the terminal when it is not cached or the terminal was resized.
+
     :postcondition: get a tuple representing the width and height of the terminal
     :return: a tuple of two integers representing the width and height of the terminal
     """
+    if screen_state["stale"] or screen_state["size"] is None:
+        size = read_screen_size()
+        if size is None:
+            return None
+        screen_state["size"] = size
+        screen_state["stale"] = not watch_screen_size()
+    return screen_state["size"]
+
+
+def read_screen_size():
+    """
+    Read the dimensions of the terminal as a tuple without using the cache.
+
+    :postcondition: get a tuple representing the width and height of the terminal
+    :return: a tuple of two integers representing the width and height of the terminal,
+             or None if the terminal size cannot be read
+    """
     try:
         dimensions = os.get_terminal_size()
     except OSError:
@@ -30,6 +66,79 @@ def get_screen_size():
         return (dimensions.columns, dimensions.lines)
 
 
+def watch_screen_size():
+    """
+    Mark the cached terminal size stale whenever the terminal is resized.
+
+    :postcondition: a SIGWINCH handler is installed once, if the system and thread allow it
+    :return: a boolean representing whether resizes are being watched
+    """
+    if screen_state["watching"]:
+        return True
+    if not hasattr(signal, "SIGWINCH"):
+        return False
+    try:
+        signal.signal(signal.SIGWINCH, mark_screen_size_stale)
+    except ValueError:
+        # Signal handlers can only be installed from the main thread
+        return False
+    screen_state["watching"] = True
+    return True
+
+
+def mark_screen_size_stale(*_):
+    """
+    Make the next size lookup read the terminal again.
+
+    Also the SIGWINCH handler, so it only sets a flag and leaves the reading and redrawing to the program.
+    """
+    screen_state["stale"] = True
+
+
+def add_resize_listener(listener):
+    """
+    Call <listener> with the new width and height whenever check_screen_size() finds the terminal resized.
+
+    :param listener: a function that takes two integers representing the new width and height of the terminal
+    :postcondition: <listener> is called after every resize until remove_resize_listener() is called with it
+    """
+    screen_state["listeners"].append(listener)
+    get_screen_size()
+
+
+def remove_resize_listener(listener):
+    """
+    Stop calling <listener> on resizes.
+
+    :param listener: a function passed to add_resize_listener()
+    :postcondition: <listener> is no longer called, nothing happens if it was not added
+    """
+    try:
+        screen_state["listeners"].remove(listener)
+    except ValueError:
+        pass
+
+
+def check_screen_size():
+    """
+    Update the cached terminal size and tell the resize listeners if it changed.
+
+    Cheap enough to call every frame: the terminal is only read after a resize where SIGWINCH is available.
+
+    :postcondition: every resize listener is called with the new width and height if the size changed
+    :return: a boolean representing whether the size changed
+    """
+    if not screen_state["stale"]:
+        return False
+    old_size = screen_state["size"]
+    new_size = get_screen_size()
+    if new_size is None or new_size == old_size:
+        return False
+    for listener in list(screen_state["listeners"]):
+        listener(*new_size)
+    return True
+
+
 def point_within_screen(point: tuple | list) -> tuple:
     """
     Return <point> mapped to whether the value is within the terminal.
@@ -50,10 +159,13 @@ def main():
     """
     print("Terminal columns (width) and rows (height)")
     print(get_screen_size())
-    print("Clear screen after input...")
+    add_resize_listener(lambda width, height: print(f"Resized to {width}x{height}"))
+    print("Resize the terminal, then clear screen after input...")
+    input()
+    check_screen_size()
     input()
     clear_screen()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
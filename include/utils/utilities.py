@@ -3,20 +3,36 @@ Miscellaneous tools.
 """
 import re
 from typing import Any, Dict
-from enum import Enum
+from enum import IntEnum
 
 
-class Direction(Enum):
+# Matches one ANSI escape code, compiled once for every helper below
+ANSI_ESCAPE = re.compile(r'\033(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
+class Direction(IntEnum):
     UP = 1
     DOWN = 2
     LEFT = 3
     RIGHT = 4
 
 
+# Column and row steps of every direction, indexed by Direction or its small-int code
+DX = (0, 0, 0, -1, 1)
+DY = (0, -1, 1, 0, 0)
+# Code of the opposite of every direction, indexed by Direction or its small-int code
+OPPOSITE = (0, Direction.DOWN, Direction.UP, Direction.RIGHT, Direction.LEFT)
+# Directions and their corresponding Vector2s, built once
+DIRECTION_VECTORS = {direction: (DX[direction], DY[direction]) for direction in Direction}
+
+
 def get_direction_vectors() -> Dict[int, tuple]:
     """
     Return a dictionary of Directions and their corresponding Vector2s.
 
+    The same dictionary is returned every time, so it must not be modified.
+    Code that moves every tick should index DX and DY instead.
+
     :postcondition: get a dictionary of Directions and their corresponding Vector2s
     :return: a dictionary of Directions and their corresponding Vector2s
 
@@ -27,12 +43,30 @@ def get_direction_vectors() -> Dict[int, tuple]:
     ...    Direction.RIGHT: (1, 0)}
     True
     """
-    return {
-        Direction.UP: (0, -1),
-        Direction.DOWN: (0, 1),
-        Direction.LEFT: (-1, 0),
-        Direction.RIGHT: (1, 0)
-    }
+    return DIRECTION_VECTORS
+
+
+def is_reversal(current: Direction, new: Direction) -> bool:
+    """
+    Get whether turning from <current> to <new> points straight back the other way.
+
+    Takes constant time and never builds anything, so it is safe to call in tick loops.
+
+    :param current: a Direction or its code representing the way currently being moved
+    :param new: a Direction or its code representing the way to turn to
+    :precondition: current must be a Direction or a Direction code
+    :return: a boolean representing whether <new> is the opposite of <current>
+
+    >>> is_reversal(Direction.UP, Direction.DOWN)
+    True
+    >>> is_reversal(Direction.UP, Direction.LEFT)
+    False
+    >>> is_reversal(Direction.UP, Direction.UP)
+    False
+    >>> is_reversal(4, Direction.LEFT)
+    True
+    """
+    return OPPOSITE[current] == new
 
 
 class LinkedNode:
@@ -48,6 +82,69 @@ class LinkedNode:
         return counter
 
 
+def tokenize_escape_codes(text: str) -> list:
+    """
+    Split <text> into runs of visible characters, each followed by the escape code after it.
+
+    Return in form:
+    [ (<visible run>, <code>) ]
+
+    The last token's code is an empty string, and runs are empty where codes are next to each other.
+    <text> is scanned once, so this takes linear time.
+
+    :param text: a string representing the text to split
+    :precondition: text must be a string
+    :postcondition: joining every run and code in order gives back <text>
+    :return: a list of tuples of two strings representing the visible runs and the codes after them
+
+    >>> tokenize_escape_codes("No codes")
+    [('No codes', '')]
+    >>> tokenize_escape_codes("\033[1mMany\033[5;3H codes\033[0m")
+    [('', '\\x1b[1m'), ('Many', '\\x1b[5;3H'), (' codes', '\\x1b[0m'), ('', '')]
+    """
+    tokens = []
+    start = 0
+    for matched in ANSI_ESCAPE.finditer(text):
+        tokens.append((text[start:matched.start()], matched.group(0)))
+        start = matched.end()
+    tokens.append((text[start:], ""))
+    return tokens
+
+
+def clip_escaped_text(text: str, width: int) -> tuple[str, int]:
+    """
+    Clip <text> to its first <width> visible characters, keeping the escape codes among them.
+
+    Codes right after the last kept character are kept too, so a trailing reset is not lost.
+
+    :param text: a string representing the text to clip
+    :param width: an integer larger than or equal to 0 representing the most visible characters to keep
+    :precondition: text must be a string
+    :precondition: width must be an integer larger than or equal to 0
+    :postcondition: <text> is scanned once
+    :return: a tuple of a string representing the clipped text and an integer representing its visible length
+
+    >>> clip_escaped_text("Hello, World", 5)
+    ('Hello', 5)
+    >>> clip_escaped_text("\033[1mBold\033[0m text", 4)
+    ('\\x1b[1mBold\\x1b[0m', 4)
+    >>> clip_escaped_text("\033[31mRed\033[0m", 10)
+    ('\\x1b[31mRed\\x1b[0m', 3)
+    """
+    parts = []
+    visible_length = 0
+    for visible, code in tokenize_escape_codes(text):
+        if visible_length + len(visible) > width:
+            visible = visible[:width - visible_length]
+            code = ""
+        parts.append(visible)
+        parts.append(code)
+        visible_length += len(visible)
+        if not code and visible_length >= width:
+            break
+    return "".join(parts), visible_length
+
+
 def get_escape_codes_indices(text: str) -> list:
     """
     Get all ANSI escape codes and their indices from the string.
@@ -68,11 +165,12 @@ def get_escape_codes_indices(text: str) -> list:
     >>> get_escape_codes_indices("\033[1mMany\033[5;3H codes\033[0m")
     [(0, '\\x1b[1m'), (4, '\\x1b[5;3H'), (10, '\\x1b[0m')]
     """
-    ansi_escape = re.compile(r'\033(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
     codes = []
-    while not (matched := ansi_escape.search(text)) is None:
-        codes.append((matched.start(), matched.group(0)))
-        text = text[:matched.start()] + text[matched.end():]
+    index = 0
+    for visible, code in tokenize_escape_codes(text):
+        index += len(visible)
+        if code:
+            codes.append((index, code))
     return codes
 
 
@@ -92,8 +190,7 @@ def remove_escape_codes(text: str) -> str:
     >>> remove_escape_codes("\033[1mMany\033[5;3H codes\033[0m")
     'Many codes'
     """
-    ansi_escape = re.compile(r'\033(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text)
+    return ANSI_ESCAPE.sub('', text)
 
 
 def longest_string(string_list: list | tuple) -> tuple[str, int] | None:
@@ -144,6 +241,34 @@ def sum_vectors(*vectors: tuple | list) -> tuple:
     return tuple(map(sum, zip(*vectors)))
 
 
+def clamp_view_start(position: int, view_size: int, world_size: int | None) -> int:
+    """
+    Get the first world cell of a view of <view_size> cells centred on <position>, kept inside the world.
+
+    Cameras drawing the view and servers culling what a client sees both use it, so the two agree on what is in view.
+
+    :param position: an integer representing the world cell to centre on
+    :param view_size: a positive integer representing the cells in the view
+    :param world_size: a positive integer representing the cells in the world, or None for no limit
+    :return: an integer representing the world cell shown first
+
+    >>> clamp_view_start(20, 10, 40)
+    15
+    >>> clamp_view_start(2, 10, 40)
+    1
+    >>> clamp_view_start(39, 10, 40)
+    31
+    >>> clamp_view_start(5, 80, 40)
+    1
+    >>> clamp_view_start(-20, 10, None)
+    -25
+    """
+    start = position - view_size // 2
+    if world_size is None:
+        return start
+    return min(max(1, start), max(1, world_size - view_size + 1))
+
+
 def targets_have_key(key_name: Any, *targets: dict) -> tuple:
     """
     Get a tuple of mapped booleans for whether the key exists in the target.
@@ -1,14 +1,17 @@
 from ansi_actions.style import Style, style
+from game.protocol import FrameDecoder, ProtocolError, frame_message
 
+from collections import deque
 from sys import stderr
+import select
 import socket
-import pickle
-from typing import Any
+from typing import Any, Deque, List
 
 
 class Client:
     DEFAULT_HOST_IP = "127.0.0.1"
     DEFAULT_PORT = 63337
+    RECEIVE_SIZE = 4096
 
     def __init__(self, ip: str=DEFAULT_HOST_IP, port: int=DEFAULT_PORT, debug: bool=False):
         """
@@ -25,6 +28,14 @@ class Client:
         self.addr: Tuple[str, int] = (self.server_ip,  self.port)
         self.debug: bool = debug
 
+        self.decoder: FrameDecoder = FrameDecoder()
+        self.inbox: Deque[Any] = deque()
+        # Whether the host closed the connection or sent a malformed message
+        self.closed: bool = False
+        # Traffic totals, framing included
+        self.bytes_sent: int = 0
+        self.bytes_received: int = 0
+
     def connect(self) -> str | None:
         """
         Establish a connection to the host server.
@@ -41,29 +52,85 @@ class Client:
                 print(style(f"Error while connecting: {connection_error}", Style.RED), file=stderr)
             return None
         else:
-            return self.client.recv(2048).decode()
+            return self.receive()
+
+    def receive(self) -> Any | None:
+        """
+        Wait for the next message from the host server.
+
+        :precondition: client must be connected
+        :postcondition: read from the connection until one full message has arrived
+        :postcondition: extra messages that arrived in the same read are kept for the next call
+        :return: the decoded message, or None if the connection closed or sent a malformed message
+        """
+        while not self.inbox:
+            try:
+                data = self.client.recv(Client.RECEIVE_SIZE)
+                if not data:
+                    self.closed = True
+                    return None
+                self.bytes_received += len(data)
+                self.inbox.extend(self.decoder.feed(data))
+            except (socket.error, ProtocolError) as receive_error:
+                if self.debug:
+                    print(style(f"Error while receiving: {receive_error}", Style.RED), file=stderr)
+                self.closed = True
+                return None
+        return self.inbox.popleft()
+
+    def poll(self, timeout: float=0.0) -> List[Any] | None:
+        """
+        Get every message the host server has pushed so far.
+
+        :param timeout: (default 0.0) a float representing the most seconds to wait if nothing has arrived yet
+        :precondition: client must be connected
+        :postcondition: read everything available on the connection without blocking longer than <timeout>
+        :postcondition: messages that arrived before the connection closed are still returned,
+                        and the close is reported by the next call
+        :return: a list of the decoded messages in the order they arrived,
+                 or None if the connection closed or sent a malformed message and no messages are left
+        """
+        messages = list(self.inbox)
+        self.inbox.clear()
+        if not self.closed:
+            try:
+                while select.select([self.client], [], [], 0.0 if messages else timeout)[0]:
+                    data = self.client.recv(Client.RECEIVE_SIZE)
+                    if not data:
+                        self.closed = True
+                        break
+                    self.bytes_received += len(data)
+                    messages.extend(self.decoder.feed(data))
+            except (socket.error, ValueError, ProtocolError) as receive_error:
+                if self.debug:
+                    print(style(f"Error while receiving: {receive_error}", Style.RED), file=stderr)
+                self.closed = True
+        if self.closed and not messages:
+            return None
+        return messages
 
     def send(self, data: Any, receive: bool=True) -> Any | None:
         """
         Send data to the host server.
 
-        :param data: a string representing the data to send to the host
-        :param return (default True): a boolean representing whether to wait for a reply
+        :param data: a value made of types supported by game.protocol representing the data to send to the host
+        :param receive: (default True) a boolean representing whether to wait for a reply
         :precondition: client must be initialized
-        :postcondition: send data as bytes to the host and return the decoded reply
+        :postcondition: send data as one framed message to the host and return the decoded reply
         :return: a string representing the reply from the host,
                  or None if an error occurred while connecting
         """
         try:
-            self.client.send(pickle.dumps(data))
-        except socket.error as socket_error:
+            framed = frame_message(data)
+            self.client.sendall(framed)
+            self.bytes_sent += len(framed)
+        except (socket.error, ProtocolError) as socket_error:
             if self.debug:
                 print(style(f"Error while sending: {socket_error}", Style.RED), file=stderr)
             return None
         else:
             if receive:
-                reply_in = pickle.loads(self.client.recv(2048))
-                return reply_in
+                return self.receive()
             return None
 
 
@@ -101,10 +168,15 @@ def main():
             message = input("> ")
             if not message:
                 continue
-            data = client.send(message)
-            if data is None:
+            # Inputs are one-way, snapshots are pushed by the host every tick
+            client.send(message, receive=False)
+            pushed = client.poll()
+            if pushed is None:
                 print(style("Connection lost.", Style.RED))
                 return
+            if not pushed:
+                continue
+            data = pushed[-1]
             if data == "kick":
                 break
             if not data["status"]:
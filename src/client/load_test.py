@@ -0,0 +1,366 @@
+"""
+Load generator that plays scripted bot clients against a game server on this machine.
+
+Every bot is a real Client: it connects, asks to play like the game client does,
+then sends random turns at a configurable rate and acknowledges the snapshots it applies.
+Bots ping the server to time round trips and ask it for stats to read its tick overruns and CPU time.
+When a match ends the bot reconnects, so the server stays under the same load for the whole run.
+
+Only loopback addresses are accepted, the load never leaves the machine.
+
+Run with: python -m client.load_test --bots 200 --input-rate 5 --duration 30 --serve
+"""
+import argparse
+import asyncio
+import heapq
+import ipaddress
+import multiprocessing
+import random
+import selectors
+import socket
+import time
+from typing import Any, Dict, List, Tuple
+
+from ansi_actions.style import style, Style
+from client.client_net import Client
+from game.benchmark import LATENCY_PERCENTILES, percentile
+from game.snapshot import SnapshotDecoder
+
+# Keys the bots press, at random
+BOT_KEYS = ("up", "down", "left", "right")
+# Seconds between "waiting" messages while a bot waits for its match, the echo host only starts on one
+WAITING_INTERVAL = 0.5
+# Longest wait for a spawned server to accept connections, in seconds
+SERVE_TIMEOUT = 5.0
+
+
+class Bot:
+    def __init__(self, bot_id: int, bot_random: random.Random) -> None:
+        self.bot_id = bot_id
+        self.random = bot_random
+        self.client: Client | None = None
+        self.snapshots = SnapshotDecoder()
+        self.playing = False
+        self.next_seq = 0
+        # Counts connections, so actions scheduled for an earlier one are dropped
+        self.generation = 0
+        # Traffic of the bot's earlier connections
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def connect(self, ip: str, port: int) -> float | None:
+        """
+        Open a new connection and wait for the server's greeting.
+
+        :return: a float representing the seconds the connection took to set up, or None if it failed
+        """
+        self.client = Client(ip, port)
+        self.snapshots = SnapshotDecoder()
+        self.playing = False
+        self.generation += 1
+        start = time.perf_counter()
+        if self.client.connect() is None:
+            self.disconnect()
+            return None
+        return time.perf_counter() - start
+
+    def disconnect(self) -> None:
+        if self.client is None:
+            return
+        self.bytes_sent += self.client.bytes_sent
+        self.bytes_received += self.client.bytes_received
+        self.client.client.close()
+        self.client = None
+        self.playing = False
+
+    def send_input(self) -> None:
+        self.client.send({
+            "input": self.random.choice(BOT_KEYS),
+            "seq": self.next_seq,
+            "ack": self.snapshots.tick}, receive=False)
+        self.next_seq += 1
+
+    def get_traffic(self) -> Tuple[int, int]:
+        """
+        Get the bytes sent and received over every connection the bot made.
+        """
+        if self.client is None:
+            return (self.bytes_sent, self.bytes_received)
+        return (self.bytes_sent + self.client.bytes_sent, self.bytes_received + self.client.bytes_received)
+
+
+class LoadTest:
+    def __init__(
+            self,
+            bots: int,
+            input_rate: float,
+            duration: float,
+            ip: str=Client.DEFAULT_HOST_IP,
+            port: int=Client.DEFAULT_PORT,
+            ping_interval: float=1.0,
+            stats_interval: float=2.0,
+            seed: int=0) -> None:
+        """
+        Initialize a load test of <bots> bots sending <input_rate> inputs per second each for <duration> seconds.
+
+        :param bots: a positive integer representing the number of bot clients
+        :param input_rate: a positive number representing the mean inputs per second of every playing bot
+        :param duration: a positive number representing the seconds to run for
+        :param ip: (default Client.DEFAULT_HOST_IP) a string representing a loopback address of the server
+        :param port: (default Client.DEFAULT_PORT) an integer representing the port of the server
+        :param ping_interval: (default 1.0) a positive number representing the seconds between every bot's pings
+        :param stats_interval: (default 2.0) a positive number representing the seconds between stats requests
+        :param seed: (default 0) an integer seeding the bots' inputs
+        :raise ValueError: if <ip> is not a loopback address
+        """
+        if not ipaddress.ip_address(socket.gethostbyname(ip)).is_loopback:
+            raise ValueError(f"ip must be a loopback address so the load stays on this machine, found {ip}")
+        self.ip = ip
+        self.port = port
+        self.input_rate = input_rate
+        self.duration = duration
+        self.ping_interval = ping_interval
+        self.stats_interval = stats_interval
+        seeder = random.Random(seed)
+        self.bots = [Bot(bot_id, random.Random(seeder.random())) for bot_id in range(bots)]
+
+        self.selector = selectors.DefaultSelector()
+        # Scheduled bot actions: (time due, bot id, bot connection generation, action)
+        self.schedule: List[Tuple[float, int, int, str]] = []
+        self.setup_times: List[float] = []
+        self.round_trips: List[float] = []
+        # First and last stats reply from every server process, with when they arrived
+        self.first_stats: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self.last_stats: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self.matches = 0
+        self.finished_matches = 0
+        self.failed_connections = 0
+        self.lost_connections = 0
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Connect every bot and play until the duration is over.
+
+        :return: a dictionary representing the results
+        """
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        for bot in self.bots:
+            self._connect(bot, start)
+        end = start + self.duration
+        while (now := time.perf_counter()) < end:
+            timeout = min(end, self.schedule[0][0] if self.schedule else end) - now
+            for key, _ in self.selector.select(max(0.0, timeout)):
+                self._read(key.data)
+            now = time.perf_counter()
+            while self.schedule and self.schedule[0][0] <= now:
+                _, bot_id, generation, action = heapq.heappop(self.schedule)
+                bot = self.bots[bot_id]
+                if bot.client is not None and bot.generation == generation:
+                    self._act(bot, action, now)
+        elapsed = time.perf_counter() - start
+        bot_cpu = time.process_time() - start_cpu
+        for bot in self.bots:
+            if bot.client is not None:
+                self.selector.unregister(bot.client.client)
+            bot.disconnect()
+        return self._get_results(elapsed, bot_cpu)
+
+    def _connect(self, bot: Bot, now: float) -> None:
+        setup_time = bot.connect(self.ip, self.port)
+        if setup_time is None:
+            self.failed_connections += 1
+            return
+        self.setup_times.append(setup_time)
+        self.selector.register(bot.client.client, selectors.EVENT_READ, bot)
+        self._schedule(bot, "wait", now)
+
+    def _reconnect(self, bot: Bot, now: float) -> None:
+        self.selector.unregister(bot.client.client)
+        bot.disconnect()
+        self._connect(bot, now)
+
+    def _schedule(self, bot: Bot, action: str, due: float) -> None:
+        heapq.heappush(self.schedule, (due, bot.bot_id, bot.generation, action))
+
+    def _act(self, bot: Bot, action: str, now: float) -> None:
+        match action:
+            case "wait":
+                if not bot.playing:
+                    bot.client.send("waiting", receive=False)
+                    self._schedule(bot, "wait", now + WAITING_INTERVAL)
+            case "input":
+                bot.send_input()
+                self._schedule(bot, "input", now + bot.random.expovariate(self.input_rate))
+            case "ping":
+                bot.client.send({"ping": now}, receive=False)
+                self._schedule(bot, "ping", now + self.ping_interval)
+            case "stats":
+                bot.client.send("stats", receive=False)
+                self._schedule(bot, "stats", now + self.stats_interval)
+
+    def _start_playing(self, bot: Bot, now: float) -> None:
+        bot.playing = True
+        self.matches += 1
+        self._schedule(bot, "input", now + bot.random.expovariate(self.input_rate))
+        # Spread the pings and stats requests over their intervals
+        self._schedule(bot, "ping", now + bot.random.uniform(0, self.ping_interval))
+        self._schedule(bot, "stats", now + bot.random.uniform(0, self.stats_interval))
+
+    def _read(self, bot: Bot) -> None:
+        now = time.perf_counter()
+        messages = bot.client.poll()
+        if messages is None:
+            self.lost_connections += 1
+            self._reconnect(bot, now)
+            return
+        for message in messages:
+            if message == "start_game":
+                self._start_playing(bot, now)
+            elif message == "kick":
+                self.finished_matches += 1
+                bot.client.send("acknowledged_kick", receive=False)
+                self._reconnect(bot, now)
+                return
+            elif type(message) is dict and "pong" in message:
+                self.round_trips.append(now - message["pong"])
+            elif type(message) is dict and "stats" in message:
+                stats = message["stats"]
+                self.first_stats.setdefault(stats["pid"], (now, stats))
+                self.last_stats[stats["pid"]] = (now, stats)
+            elif type(message) is dict and "tick" in message:
+                bot.snapshots.apply(message)
+
+    def _get_results(self, elapsed: float, bot_cpu: float) -> Dict[str, Any]:
+        traffic = [bot.get_traffic() for bot in self.bots]
+        server_cpu = 0.0
+        overruns = 0
+        ticks = 0
+        max_duration = 0.0
+        for pid, (last_time, last) in self.last_stats.items():
+            first_time, first = self.first_stats[pid]
+            if last_time > first_time:
+                # Stats are only sampled, so the CPU use is measured between the first and last samples
+                server_cpu += (last["cpu_time"] - first["cpu_time"]) / (last_time - first_time)
+            overruns += last.get("overruns", 0) - first.get("overruns", 0)
+            ticks += last.get("ticks", 0) - first.get("ticks", 0)
+            max_duration = max(max_duration, last.get("max_duration", 0.0))
+        return {
+            "bots": len(self.bots),
+            "elapsed": elapsed,
+            "matches": self.matches,
+            "finished_matches": self.finished_matches,
+            "failed_connections": self.failed_connections,
+            "lost_connections": self.lost_connections,
+            "setup_time": LoadTest._summarize(self.setup_times),
+            "round_trip": LoadTest._summarize(self.round_trips),
+            "server_processes": len(self.last_stats),
+            "ticks": ticks,
+            "overruns": overruns,
+            "max_tick_duration": max_duration,
+            "sent_per_second": sum(sent for sent, _ in traffic) / elapsed,
+            "received_per_second": sum(received for _, received in traffic) / elapsed,
+            # CPU seconds per second of the run, per bot
+            "server_cpu_per_client": server_cpu / len(self.bots),
+            "bot_cpu_per_client": bot_cpu / elapsed / len(self.bots)}
+
+    @staticmethod
+    def _summarize(samples: List[float]) -> Dict[str, float]:
+        if not samples:
+            return {}
+        ordered = sorted(samples)
+        summary = {f"p{percent}": percentile(ordered, percent) for percent in LATENCY_PERCENTILES}
+        summary["max"] = ordered[-1]
+        return summary
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """
+    Get a readable report of the results from LoadTest.run().
+    """
+    def milliseconds(summary: Dict[str, float]) -> str:
+        return ", ".join(f"{name} {seconds * 1e3:.2f}ms" for name, seconds in summary.items()) or "no samples"
+
+    return "\n".join((
+        f"{results['bots']} bots for {results['elapsed']:.1f}s, {results['matches']} matches started and "
+        f"{results['finished_matches']} finished, {results['failed_connections']} failed and {results['lost_connections']} lost connections",
+        f"  setup  {milliseconds(results['setup_time'])}",
+        f"  rtt    {milliseconds(results['round_trip'])}",
+        f"  server {results['server_processes']} processes, {results['ticks']} ticks, {results['overruns']} overruns, "
+        f"longest tick {results['max_tick_duration'] * 1e3:.2f}ms",
+        f"  traffic {results['sent_per_second'] / 1024:,.1f} KiB/s sent, "
+        f"{results['received_per_second'] / 1024:,.1f} KiB/s received",
+        f"  cpu    {results['server_cpu_per_client'] * 100:.3f}% server and "
+        f"{results['bot_cpu_per_client'] * 100:.3f}% bots per client"))
+
+
+def run_async_server(ip: str, port: int, room_size: int) -> None:
+    """
+    Run an event-loop game server until the process is terminated.
+    """
+    from server.async_server import AsyncGameServer
+    try:
+        asyncio.run(AsyncGameServer(ip, port, room_size).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def wait_for_server(ip: str, port: int, timeout: float=SERVE_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((ip, port), timeout=timeout).close()
+        except OSError:
+            time.sleep(0.05)
+        else:
+            return True
+    return False
+
+
+def main():
+    """
+    Drive the program.
+    """
+    parser = argparse.ArgumentParser(description="Load test a local Snake Attack server with bot clients.")
+    parser.add_argument("--bots", type=int, default=100, help="number of bot clients")
+    parser.add_argument("--input-rate", type=float, default=5.0, help="mean inputs per second of every bot")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for")
+    parser.add_argument("--ip", default=Client.DEFAULT_HOST_IP, help="loopback address of the server")
+    parser.add_argument("--port", type=int, default=Client.DEFAULT_PORT, help="port of the server")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the bots' inputs")
+    parser.add_argument("--serve", action="store_true",
+                        help="start an event-loop server in a separate process instead of using a running one")
+    parser.add_argument("--room-size", type=int, default=2, help="players per match of the started server")
+    arguments = parser.parse_args()
+
+    try:
+        load_test = LoadTest(
+                arguments.bots, arguments.input_rate, arguments.duration,
+                arguments.ip, arguments.port, seed=arguments.seed)
+    except ValueError as error:
+        print(style(str(error), Style.RED))
+        return
+
+    server = None
+    if arguments.serve:
+        server = multiprocessing.Process(
+                target=run_async_server,
+                args=(arguments.ip, arguments.port, arguments.room_size),
+                daemon=True)
+        server.start()
+        if not wait_for_server(arguments.ip, arguments.port):
+            print(style("Server did not start", Style.RED))
+            server.terminate()
+            return
+    try:
+        print(format_results(load_test.run()))
+    except KeyboardInterrupt:
+        print(style("Load test stopped.", Style.YELLOW))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Batched Snake Attack simulation on NumPy arrays, for running many snakes in many rooms at once.
+
+SnakeAttackState moves one Snake object at a time, so large free-for-all rooms, replays and training runs
+spend most of a tick in Python. BatchState keeps every snake of every room in a handful of arrays instead:
+
+    heads        columns and rows of every head, one entry per snake
+    facing       Direction values, with the tables below turning them into moves without any Enum lookups
+    bodies       one ring buffer row per snake of flat board cells, ordered from the tail slot
+    counts       segments on every cell of every room, rooms laid end to end
+
+A tick moves every head, checks walls, bodies and head-to-head hits, and advances the ring buffers
+with a few whole-array operations, so its cost barely grows with the number of snakes.
+The rules are those of SnakeAttackState.update(). Items are not simulated: grow() is there for a driver
+that hands out its own rewards.
+
+NumPy is optional, install it with: pip install snake-attack[batch]
+Run with: python -m game.batch --rooms 64 --snakes 8 --ticks 1000 --board 40x20
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ansi_actions.style import style, Style
+from game.benchmark import parse_board_size
+from game.snake_attack_host import SnakeAttackState
+from utils import utilities
+from utils.utilities import Direction
+
+# Direction codes in order
+DIRECTION_VALUES = tuple(int(direction) for direction in Direction)
+if np is not None:
+    # The direction tables of utils.utilities as arrays, so whole arrays of codes can index them
+    DX = np.array(utilities.DX, dtype=np.int32)
+    DY = np.array(utilities.DY, dtype=np.int32)
+    OPPOSITE = np.array(utilities.OPPOSITE, dtype=np.int8)
+
+
+def require_numpy() -> None:
+    """
+    :raise ImportError: if NumPy is not installed
+    """
+    if np is None:
+        raise ImportError("game.batch needs NumPy, install it with: pip install snake-attack[batch]")
+
+
+class BatchState:
+    # Segments every snake starts with, stacked on its spawn cell like Snake's initial_length
+    INITIAL_LENGTH = 3
+    # Ring buffer slots per snake before the buffers grow
+    DEFAULT_CAPACITY = 16
+
+    def __init__(
+            self,
+            rooms: int,
+            snakes_per_room: int,
+            board_size: Tuple[int, int]=SnakeAttackState.DEFAULT_BOARD_SIZE,
+            capacity: int=DEFAULT_CAPACITY) -> None:
+        """
+        Initialize <rooms> rooms of <snakes_per_room> snakes each, spawned like SnakeAttackState spawns them.
+
+        Snake <n> is number <n> % <snakes_per_room> in room <n> // <snakes_per_room>.
+
+        :param rooms: a positive integer representing the number of rooms
+        :param snakes_per_room: a positive integer representing the number of snakes in every room
+        :param board_size: (default SnakeAttackState.DEFAULT_BOARD_SIZE) a tuple of two integers
+                           representing the columns and rows of every room
+        :param capacity: (default BatchState.DEFAULT_CAPACITY) a positive integer representing
+                         the segments every snake holds before the buffers grow
+        :raise ImportError: if NumPy is not installed
+        :raise ValueError: if a room does not have a spawn row for every snake
+        """
+        require_numpy()
+        width, height = board_size
+        # Snakes spawn on every other row from row 2
+        if 2 * snakes_per_room > height:
+            raise ValueError(
+                    f"board_size needs at least {2 * snakes_per_room} rows for {snakes_per_room} snakes, found {height}")
+        self.board_size = board_size
+        self.rooms = rooms
+        self.snakes_per_room = snakes_per_room
+        self.tick = 0
+        count = rooms * snakes_per_room
+
+        self.room = np.arange(count, dtype=np.int32) // snakes_per_room
+        # First flat cell of every snake's room
+        self.room_offset = self.room * (width * height)
+        self.columns = np.full(count, 2, dtype=np.int32)
+        self.rows = 2 + 2 * (np.arange(count, dtype=np.int32) % snakes_per_room)
+        self.facing = np.full(count, Direction.RIGHT, dtype=np.int8)
+        self.old_facing = self.facing.copy()
+        self.dead = np.zeros(count, dtype=bool)
+        self.running = np.ones(rooms, dtype=bool)
+
+        self.capacity = max(capacity, BatchState.INITIAL_LENGTH)
+        spawn_cells = self.room_offset + (self.rows - 1) * width + self.columns - 1
+        self.bodies = np.repeat(spawn_cells[:, None], self.capacity, axis=1)
+        self.tails = np.zeros(count, dtype=np.int32)
+        self.lengths = np.full(count, BatchState.INITIAL_LENGTH, dtype=np.int32)
+        self.counts = np.zeros(rooms * width * height, dtype=np.int32)
+        np.add.at(self.counts, spawn_cells, BatchState.INITIAL_LENGTH)
+
+    def __len__(self) -> int:
+        return len(self.dead)
+
+    def turn(self, snakes: Any, directions: Any) -> None:
+        """
+        Point <snakes> towards <directions>, ignoring turns straight back the way a snake last moved.
+
+        This is the boundary where inputs are checked, so update() can trust every facing.
+
+        :param snakes: an integer or array of distinct integers representing the snakes to turn
+        :param directions: a Direction, integer Direction value, or array of them, one per snake
+        :raise ValueError: if a direction is not a Direction value
+        """
+        snakes = np.atleast_1d(np.asarray(snakes, dtype=np.intp))
+        directions = np.broadcast_to(np.asarray(directions, dtype=np.int8), snakes.shape)
+        if not np.isin(directions, DIRECTION_VALUES).all():
+            raise ValueError(f"directions must be Direction values {DIRECTION_VALUES}")
+        allowed = OPPOSITE[directions] != self.old_facing[snakes]
+        self.facing[snakes[allowed]] = directions[allowed]
+
+    def grow(self, snakes: Any, segments: Any=1) -> None:
+        """
+        Add <segments> segments to the butt of each living snake in <snakes>, like SnakeAttackState does.
+
+        :param snakes: an integer or array of distinct integers representing the snakes to grow
+        :param segments: (default 1) a non-negative integer or array of them, one per snake
+        """
+        snakes = np.atleast_1d(np.asarray(snakes, dtype=np.intp))
+        segments = np.broadcast_to(np.asarray(segments, dtype=np.int32), snakes.shape)
+        living = ~self.dead[snakes]
+        snakes, segments = snakes[living], segments[living]
+        if not snakes.size:
+            return
+        needed = int((self.lengths[snakes] + segments).max())
+        if needed > self.capacity:
+            self._grow_capacity(needed)
+        # New segments stack on the butt, one layer per step
+        for step in range(int(segments.max())):
+            growing = snakes[segments > step]
+            tails = (self.tails[growing] - 1) % self.capacity
+            butts = self.bodies[growing, self.tails[growing]]
+            self.bodies[growing, tails] = butts
+            self.tails[growing] = tails
+            self.lengths[growing] += 1
+            np.add.at(self.counts, butts, 1)
+
+    def update(self) -> None:
+        """
+        Move every living snake one cell and kill the ones that hit a wall, a body or another head.
+        """
+        width, height = self.board_size
+        moving = np.flatnonzero(~self.dead)
+        if moving.size:
+            tails = self.tails[moving]
+            # Butts leave their cell this tick, so heads may follow straight into them
+            butts = self.bodies[moving, tails]
+            np.subtract.at(self.counts, butts, 1)
+
+            facing = self.facing[moving]
+            columns = self.columns[moving] + DX[facing]
+            rows = self.rows[moving] + DY[facing]
+            inside = (columns >= 1) & (columns <= width) & (rows >= 1) & (rows <= height)
+            cells = self.room_offset[moving] + (rows - 1) * width + columns - 1
+            # Wall hits, then self and head-to-body hits
+            crashed = ~inside
+            inside_cells = cells[inside]
+            hit = self.counts[inside_cells] > 0
+            # Head-to-head hits
+            _, cell_indices, heads_per_cell = np.unique(inside_cells, return_inverse=True, return_counts=True)
+            crashed[inside] = hit | (heads_per_cell[cell_indices] > 1)
+
+            lost = moving[crashed]
+            if lost.size:
+                np.add.at(self.counts, butts[crashed], 1)
+                self._remove_bodies(lost)
+                self.dead[lost] = True
+
+            moved = ~crashed
+            alive = moving[moved]
+            new_cells = cells[moved]
+            self.bodies[alive, (tails[moved] + self.lengths[alive]) % self.capacity] = new_cells
+            self.tails[alive] = (tails[moved] + 1) % self.capacity
+            # No two heads share a cell after the head-to-head check
+            self.counts[new_cells] += 1
+            self.columns[alive] = columns[moved]
+            self.rows[alive] = rows[moved]
+            self.old_facing[alive] = facing[moved]
+
+            self.running &= np.bincount(self.room[~self.dead], minlength=self.rooms) > 0
+        self.tick += 1
+
+    def get_segments(self, snake: int) -> List[Tuple[int, int]]:
+        """
+        Get the positions of <snake>'s segments from butt to head, as SnakeBody iterates them.
+        """
+        width = self.board_size[0]
+        slots = (self.tails[snake] + np.arange(self.lengths[snake])) % self.capacity
+        cells = self.bodies[snake, slots] - self.room_offset[snake]
+        return [(int(cell % width) + 1, int(cell // width) + 1) for cell in cells]
+
+    def is_occupied(self, room: int, column: int, row: int) -> bool:
+        width, height = self.board_size
+        return bool(self.counts[room * width * height + (row - 1) * width + column - 1])
+
+    def _remove_bodies(self, snakes: Any) -> None:
+        offsets = np.arange(self.capacity)
+        slots = (self.tails[snakes, None] + offsets) % self.capacity
+        cells = self.bodies[snakes[:, None], slots][offsets < self.lengths[snakes, None]]
+        np.subtract.at(self.counts, cells, 1)
+
+    def _grow_capacity(self, needed: int) -> None:
+        # Unroll every ring so the tails start at slot 0, then pad with room to grow
+        capacity = max(2 * self.capacity, needed)
+        slots = (self.tails[:, None] + np.arange(self.capacity)) % self.capacity
+        unrolled = np.take_along_axis(self.bodies, slots, axis=1)
+        self.bodies = np.concatenate(
+                (unrolled, np.repeat(unrolled[:, :1], capacity - self.capacity, axis=1)), axis=1)
+        self.tails[:] = 0
+        self.capacity = capacity
+
+
+def steer(batch: BatchState, generator: Any) -> None:
+    """
+    Turn every living snake towards a free cell, mostly going straight and sometimes turning at random.
+
+    :param generator: a numpy.random.Generator deciding the turns
+    """
+    width, height = batch.board_size
+    snakes = np.flatnonzero(~batch.dead)
+    directions = np.asarray(DIRECTION_VALUES, dtype=np.int8)
+    columns = batch.columns[snakes, None] + DX[directions]
+    rows = batch.rows[snakes, None] + DY[directions]
+    inside = (columns >= 1) & (columns <= width) & (rows >= 1) & (rows <= height)
+    cells = np.where(inside, batch.room_offset[snakes, None] + (rows - 1) * width + columns - 1, 0)
+    free = inside & (batch.counts[cells] == 0) & (OPPOSITE[directions] != batch.old_facing[snakes, None])
+    # Free cells win, then going straight unless the snake turns at random this tick
+    scores = generator.random(free.shape) + 2 * free
+    straight = directions == batch.facing[snakes, None]
+    scores += straight * (generator.random((len(snakes), 1)) > 0.1)
+    batch.turn(snakes, directions[scores.argmax(axis=1)])
+
+
+def run_batch_benchmark(
+        rooms: int,
+        snakes_per_room: int,
+        ticks: int,
+        board_size: Tuple[int, int]=SnakeAttackState.DEFAULT_BOARD_SIZE,
+        seed: int=0) -> Dict[str, Any]:
+    """
+    Time <ticks> ticks of <rooms> rooms of <snakes_per_room> bot snakes.
+
+    :return: a dictionary representing the results
+    """
+    batch = BatchState(rooms, snakes_per_room, board_size)
+    generator = np.random.default_rng(seed)
+    simulated = 0.0
+    snake_ticks = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        steer(batch, generator)
+        snake_ticks += int((~batch.dead).sum())
+        tick_start = time.perf_counter()
+        batch.update()
+        simulated += time.perf_counter() - tick_start
+    elapsed = time.perf_counter() - start
+    return {
+        "rooms": rooms,
+        "snakes": len(batch),
+        "ticks": ticks,
+        "board_size": board_size,
+        "alive": int((~batch.dead).sum()),
+        "ticks_per_second": ticks / simulated,
+        "snake_ticks_per_second": snake_ticks / simulated,
+        "wall_ticks_per_second": ticks / elapsed}
+
+
+def main():
+    """
+    Drive the program.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the batched Snake Attack simulation.")
+    parser.add_argument("--rooms", type=int, default=64, help="rooms simulated together")
+    parser.add_argument("--snakes", type=int, default=8, help="snakes in every room")
+    parser.add_argument("--ticks", type=int, default=1000, help="ticks to run")
+    parser.add_argument("--board", type=parse_board_size, default=SnakeAttackState.DEFAULT_BOARD_SIZE,
+                        help="board size as <columns>x<rows>")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the bots")
+    arguments = parser.parse_args()
+
+    try:
+        results = run_batch_benchmark(
+                arguments.rooms, arguments.snakes, arguments.ticks, arguments.board, arguments.seed)
+    except (ImportError, ValueError) as error:
+        print(style(str(error), Style.RED))
+        return
+    print(
+        f"{results['rooms']} rooms, {results['snakes']} snakes, {results['ticks']} ticks on "
+        f"{results['board_size'][0]}x{results['board_size'][1]} ({results['alive']} alive at the end)")
+    print(
+        f"  {results['ticks_per_second']:,.0f} ticks/s, {results['snake_ticks_per_second']:,.0f} snake moves/s"
+        f" ({results['wall_ticks_per_second']:,.0f} ticks/s with bots)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Headless benchmark of the Snake Attack simulation.
+
+Runs SnakeAttackState for a number of ticks without a terminal or network and reports
+ticks per second, per-tick latency percentiles and the memory allocated per tick.
+Snakes are steered by a simple bot that turns towards a free cell, so they live long enough to be measured.
+
+Run with: python -m game.benchmark --snakes 8 --ticks 2000 --board 40x20
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+from ansi_actions.style import style, Style
+from game.replay import ReplayRecorder
+from game.snake_attack_host import SnakeAttackState
+from utils.utilities import DX, DY, Direction, is_reversal
+
+# Percentiles of the per-tick latency included in every report
+LATENCY_PERCENTILES = (50, 90, 99)
+# Key press names the bots send for each direction, matching Player.DEFAULT_KEY_MAP
+DIRECTION_KEYS = {
+    Direction.UP: "up",
+    Direction.DOWN: "down",
+    Direction.LEFT: "left",
+    Direction.RIGHT: "right"}
+
+
+def create_state(snakes: int, board_size: Tuple[int, int], seed: int=0) -> SnakeAttackState:
+    """
+    Get a fresh simulation with <snakes> players on a board of <board_size>, seeded with <seed>.
+
+    :raise ValueError: if the board does not have a spawn row for every snake
+    """
+    # Snakes spawn on every other row from row 2
+    if 2 * snakes > board_size[1]:
+        raise ValueError(f"board_size needs at least {2 * snakes} rows for {snakes} snakes, found {board_size[1]}")
+    return SnakeAttackState(*range(snakes), board_size=board_size, seed=seed)
+
+
+def steer(state: SnakeAttackState, bot_random: random.Random) -> None:
+    """
+    Send every living snake a key press that keeps it heading for a free cell no other snake is heading for.
+
+    Snakes mostly go straight and sometimes turn at random, so they cover the board instead of circling.
+    """
+    claimed = set()
+    for player_id, snake in state.snakes.items():
+        if snake.dead:
+            continue
+        head = snake.get_head()
+        directions = [direction for direction in DIRECTION_KEYS if not is_reversal(snake.old_facing, direction)]
+        bot_random.shuffle(directions)
+        if bot_random.random() > 0.1:
+            directions.remove(snake.facing)
+            directions.insert(0, snake.facing)
+        for direction in directions:
+            cell = (head[0] + DX[direction], head[1] + DY[direction])
+            if cell not in claimed and state.occupant(*cell) == state.occupancy.EMPTY:
+                claimed.add(cell)
+                if direction != snake.facing:
+                    state.player_update(player_id, DIRECTION_KEYS[direction])
+                break
+
+
+def run_ticks(state: SnakeAttackState, ticks: int, bot_random: random.Random) -> List[float]:
+    """
+    Run <ticks> simulation ticks, steering the bots between them.
+
+    :return: a list of floats representing the seconds each SnakeAttackState.update() took
+    """
+    latencies = []
+    for _ in range(ticks):
+        steer(state, bot_random)
+        start = time.perf_counter()
+        state.update()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Get the value below which <percent> percent of <sorted_values> fall, by the nearest-rank method.
+
+    :precondition: sorted_values must be a non-empty list sorted in ascending order
+    """
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def measure_allocations(state: SnakeAttackState, ticks: int, bot_random: random.Random) -> Dict[str, float]:
+    """
+    Trace the memory allocated by <ticks> simulation ticks.
+
+    Tracing slows every allocation down, so this runs separately from the timed ticks.
+
+    :return: a dictionary with the mean "peak_bytes" allocated within a tick,
+             and the "retained_bytes" and "retained_blocks" per tick still held after all of them
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peak_total = 0
+    for _ in range(ticks):
+        steer(state, bot_random)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        state.update()
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    snapshot_filter = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    differences = after.filter_traces(snapshot_filter).compare_to(before.filter_traces(snapshot_filter), "filename")
+    return {
+        "peak_bytes": peak_total / ticks,
+        "retained_bytes": sum(difference.size_diff for difference in differences) / ticks,
+        "retained_blocks": sum(difference.count_diff for difference in differences) / ticks}
+
+
+def run_benchmark(
+        snakes: int,
+        ticks: int,
+        board_size: Tuple[int, int]=SnakeAttackState.DEFAULT_BOARD_SIZE,
+        seed: int=0,
+        trace_memory: bool=True,
+        replay_path: str | None=None) -> Dict[str, Any]:
+    """
+    Benchmark <ticks> ticks of <snakes> snakes on a board of <board_size>.
+
+    :param snakes: a positive integer representing the number of players
+    :param ticks: a positive integer representing the number of ticks to time
+    :param board_size: (default SnakeAttackState.DEFAULT_BOARD_SIZE) a tuple of two integers
+                       representing the columns and rows of the board
+    :param seed: (default 0) an integer seeding the bots, so runs with the same arguments play the same game
+    :param trace_memory: (default True) a boolean representing whether to also measure allocations,
+                         in a second run of the same game
+    :param replay_path: (default None) a string representing a file to record the timed run to,
+                        or None to not record it
+    :return: a dictionary representing the results
+    """
+    state = create_state(snakes, board_size, seed)
+    if replay_path is not None:
+        replay_file = open(replay_path, "wb")
+        recorder = ReplayRecorder(replay_file, state)
+    start = time.perf_counter()
+    latencies = run_ticks(state, ticks, random.Random(seed))
+    elapsed = time.perf_counter() - start
+    if replay_path is not None:
+        recorder.close(state.tick)
+        replay_file.close()
+    ordered = sorted(latencies)
+
+    results = {
+        "snakes": snakes,
+        "ticks": ticks,
+        "board_size": board_size,
+        "alive": sum(not snake.dead for snake in state.snakes.values()),
+        "ticks_per_second": ticks / sum(latencies),
+        # Includes the bots, the time a server would also spend applying inputs
+        "wall_ticks_per_second": ticks / elapsed,
+        "latency": {f"p{percent}": percentile(ordered, percent) for percent in LATENCY_PERCENTILES}}
+    results["latency"]["max"] = ordered[-1]
+    if trace_memory:
+        results["allocations"] = measure_allocations(
+                create_state(snakes, board_size, seed), ticks, random.Random(seed))
+    return results
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """
+    Get a readable report of the results from run_benchmark().
+    """
+    lines = [
+        f"{results['snakes']} snakes, {results['ticks']} ticks on {results['board_size'][0]}x{results['board_size'][1]}"
+        f" ({results['alive']} alive at the end)",
+        f"  {results['ticks_per_second']:,.0f} ticks/s ({results['wall_ticks_per_second']:,.0f} ticks/s with bots)",
+        "  latency " + ", ".join(
+            f"{name} {seconds * 1e6:.1f}us" for name, seconds in results["latency"].items())]
+    if "allocations" in results:
+        allocations = results["allocations"]
+        lines.append(
+            f"  allocations {allocations['peak_bytes']:,.0f} B peak/tick, "
+            f"{allocations['retained_bytes']:,.1f} B and {allocations['retained_blocks']:.2f} blocks retained/tick")
+    return "\n".join(lines)
+
+
+def parse_board_size(text: str) -> Tuple[int, int]:
+    columns, _, rows = text.lower().partition("x")
+    return (int(columns), int(rows))
+
+
+def main():
+    """
+    Drive the program.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the headless Snake Attack simulation.")
+    parser.add_argument("--snakes", type=int, nargs="+", default=[2, 8],
+                        help="numbers of snakes to benchmark")
+    parser.add_argument("--ticks", type=int, default=2000, help="ticks to run for every case")
+    parser.add_argument("--board", type=parse_board_size, nargs="+",
+                        default=[SnakeAttackState.DEFAULT_BOARD_SIZE],
+                        help="board sizes as <columns>x<rows>")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the bots")
+    parser.add_argument("--no-memory", action="store_true", help="skip measuring allocations")
+    parser.add_argument("--record", help="file to record a replay of the last case to, see game.replay")
+    arguments = parser.parse_args()
+
+    for board_size in arguments.board:
+        for snakes in arguments.snakes:
+            try:
+                results = run_benchmark(
+                        snakes, arguments.ticks, board_size, arguments.seed, not arguments.no_memory, arguments.record)
+            except ValueError as error:
+                print(style(str(error), Style.RED))
+            else:
+                print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from array import array
+from typing import Iterable, Tuple
+
+from game.food import FreeCells
+from game.interest import InterestGrid
+
+
+class OccupancyGrid:
+    """
+    Index of which snake occupies every cell of the board.
+
+    Cells are 1-based to match terminal positions: columns 1 to <width> and rows 1 to <height>.
+    The grid is kept up to date with head-insert and butt-remove deltas,
+    so checking a cell never walks a snake's body.
+    If <free_cells> is given, every cell that fills or empties is passed on to it,
+    and if <interest> is given, so is the snake that filled or emptied it.
+    """
+    EMPTY = -1
+
+    __slots__ = ("width", "height", "_owners", "_counts", "free_cells", "interest")
+
+    def __init__(
+            self,
+            width: int,
+            height: int,
+            free_cells: FreeCells | None=None,
+            interest: InterestGrid | None=None) -> None:
+        """
+        Initialize an empty grid for a <width> by <height> board.
+
+        :param width: a positive integer representing the number of columns on the board
+        :param height: a positive integer representing the number of rows on the board
+        :param free_cells: (default None) a FreeCells over the same board with every cell free,
+                           kept mirroring the empty cells, or None
+        :param interest: (default None) an empty InterestGrid over the same board,
+                         kept indexing the snakes for culling snapshots, or None
+        """
+        self.width: int = width
+        self.height: int = height
+        self._owners: array = array("i", (OccupancyGrid.EMPTY,)) * (width * height)
+        # Snakes spawn with their segments stacked on one cell, so count them
+        self._counts: array = array("I", (0,)) * (width * height)
+        self.free_cells: FreeCells | None = free_cells
+        self.interest: InterestGrid | None = interest
+
+    def in_bounds(self, column: int, row: int) -> bool:
+        return 0 < column <= self.width and 0 < row <= self.height
+
+    def owner(self, column: int, row: int) -> int:
+        """
+        Get the id of the snake occupying (<column>, <row>).
+
+        :precondition: (<column>, <row>) must be in bounds
+        :return: an integer representing the occupying snake's id, or OccupancyGrid.EMPTY if the cell is free
+        """
+        return self._owners[(row - 1) * self.width + column - 1]
+
+    def is_occupied(self, column: int, row: int) -> bool:
+        return self._counts[(row - 1) * self.width + column - 1] > 0
+
+    def add(self, column: int, row: int, owner: int) -> None:
+        index = (row - 1) * self.width + column - 1
+        self._owners[index] = owner
+        self._counts[index] += 1
+        if self._counts[index] == 1:
+            if self.free_cells is not None:
+                self.free_cells.remove(column, row)
+            if self.interest is not None:
+                self.interest.add(column, row, owner)
+
+    def remove(self, column: int, row: int) -> None:
+        index = (row - 1) * self.width + column - 1
+        self._counts[index] -= 1
+        if not self._counts[index]:
+            if self.interest is not None:
+                self.interest.remove(column, row, self._owners[index])
+            self._owners[index] = OccupancyGrid.EMPTY
+            if self.free_cells is not None:
+                self.free_cells.add(column, row)
+
+    def add_cells(self, cells: Iterable[Tuple[int, int]], owner: int) -> None:
+        for column, row in cells:
+            if self.in_bounds(column, row):
+                self.add(column, row, owner)
+
+    def remove_cells(self, cells: Iterable[Tuple[int, int]]) -> None:
+        for column, row in cells:
+            if self.in_bounds(column, row):
+                self.remove(column, row)
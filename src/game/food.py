@@ -0,0 +1,164 @@
+"""
+Food and power-up items, spawned on uniformly random free cells.
+
+The free cells of the board are kept in a dense array with a slot index per cell, so adding, removing and
+sampling a free cell are all O(1) however full the board is. The occupancy grid reports every cell that
+fills or empties as snakes move, which keeps the set in step with the same head and butt deltas.
+Cells holding an item are not free either, so items never stack or spawn under a snake.
+"""
+import random
+from array import array
+from typing import Dict, Iterator, Tuple
+
+# Segments a snake grows by when it eats each kind of item
+ITEM_GROWTH = {
+    "food": 1,
+    "feast": 3}
+# Relative chance of each kind of item being spawned
+ITEM_WEIGHTS = {
+    "food": 9,
+    "feast": 1}
+
+
+class FreeCells:
+    """
+    Set of board cells with O(1) add, remove, membership and uniform random sampling.
+
+    Cells are 1-based to match OccupancyGrid. Free cells are packed at the front of one array,
+    and removing a cell moves the last free cell into its slot.
+    """
+    NOT_FREE = -1
+
+    __slots__ = ("width", "height", "_cells", "_slots", "_count")
+
+    def __init__(self, width: int, height: int, full: bool=True) -> None:
+        """
+        Initialize the set for a <width> by <height> board.
+
+        :param full: (default True) a boolean representing whether every cell starts free
+        """
+        self.width: int = width
+        self.height: int = height
+        size = width * height
+        if full:
+            self._cells: array = array("i", range(size))
+            self._slots: array = array("i", range(size))
+            self._count: int = size
+        else:
+            self._cells = array("i", (0,)) * size
+            self._slots = array("i", (FreeCells.NOT_FREE,)) * size
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        return self._slots[(cell[1] - 1) * self.width + cell[0] - 1] != FreeCells.NOT_FREE
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        width = self.width
+        for index in self._cells[:self._count]:
+            yield (index % width + 1, index // width + 1)
+
+    def add(self, column: int, row: int) -> None:
+        """
+        Mark (<column>, <row>) free, nothing happens if it already is.
+        """
+        index = (row - 1) * self.width + column - 1
+        if self._slots[index] != FreeCells.NOT_FREE:
+            return
+        self._cells[self._count] = index
+        self._slots[index] = self._count
+        self._count += 1
+
+    def remove(self, column: int, row: int) -> None:
+        """
+        Mark (<column>, <row>) taken, nothing happens if it already is.
+        """
+        index = (row - 1) * self.width + column - 1
+        slot = self._slots[index]
+        if slot == FreeCells.NOT_FREE:
+            return
+        self._count -= 1
+        last = self._cells[self._count]
+        self._cells[slot] = last
+        self._slots[last] = slot
+        self._slots[index] = FreeCells.NOT_FREE
+
+    def sample(self, chooser: random.Random) -> Tuple[int, int] | None:
+        """
+        Get a uniformly random free cell without removing it.
+
+        :param chooser: a random.Random to draw from, so seeded games stay reproducible
+        :return: a tuple of two integers representing the column and row of the cell, or None if none are free
+        """
+        if not self._count:
+            return None
+        index = self._cells[chooser.randrange(self._count)]
+        return (index % self.width + 1, index // self.width + 1)
+
+
+class ItemField:
+    """
+    The items lying on the board, kept topped up to a target count.
+    """
+    def __init__(self, free_cells: FreeCells, chooser: random.Random, target: int) -> None:
+        """
+        Initialize an empty field.
+
+        :param free_cells: a FreeCells kept up to date with the snakes on the board
+        :param chooser: a random.Random deciding where and what items spawn
+        :param target: a non-negative integer representing how many items to keep on the board
+        """
+        self.free_cells = free_cells
+        self.random = chooser
+        self.target = target
+        self.items: Dict[Tuple[int, int], str] = {}
+        # Counts spawns and pickups so snapshots can tell if the items changed since a tick
+        self.changes = 0
+        self._kinds = tuple(ITEM_WEIGHTS)
+        self._weights = tuple(ITEM_WEIGHTS.values())
+
+    def spawn(self) -> int:
+        """
+        Spawn items on random free cells until there are <target> of them or the board is full.
+
+        :return: an integer representing the number of items spawned
+        """
+        spawned = 0
+        while len(self.items) < self.target:
+            cell = self.free_cells.sample(self.random)
+            if cell is None:
+                break
+            self.free_cells.remove(*cell)
+            self.items[cell] = self.random.choices(self._kinds, self._weights)[0]
+            spawned += 1
+        if spawned:
+            self.changes += 1
+        return spawned
+
+    def take(self, cell: Tuple[int, int]) -> str | None:
+        """
+        Pick up the item on <cell>.
+
+        The cell is not made free again, since whatever picked the item up is standing on it.
+
+        :return: a string representing the kind of item picked up, or None if there was none
+        """
+        kind = self.items.pop(cell, None)
+        if kind is not None:
+            self.changes += 1
+        return kind
+
+    def get_positions(self, bounds: Tuple[int, int, int, int] | None=None) -> Dict[str, list]:
+        """
+        Get the positions of the items grouped by kind, which the protocol packs compactly.
+
+        :param bounds: (default None) a tuple of four integers representing the inclusive left, top, right and
+                       bottom cells to keep items from, or None to get every item
+        """
+        positions = {}
+        for cell, kind in self.items.items():
+            if bounds is None or (bounds[0] <= cell[0] <= bounds[2] and bounds[1] <= cell[1] <= bounds[3]):
+                positions.setdefault(kind, []).append(cell)
+        return positions
@@ -0,0 +1,94 @@
+"""
+Interest management: which parts of the board each client gets told about.
+
+Snakes are indexed in a uniform grid of buckets a few cells wide, kept up to date by the occupancy grid
+as cells fill and empty. A client's view is its reported terminal size centred on its own head, the same
+window the client's camera shows, plus a margin so snakes are already known as they come into sight.
+Finding what a client sees only reads the buckets under that view, so the work and the snapshot size
+follow the size of the terminal rather than the size of the board.
+"""
+from typing import Dict, List, Set, Tuple
+
+from utils.utilities import clamp_view_start
+
+# Cells added around every side of a view, so entities arrive a little before they are on screen
+VIEW_MARGIN = 4
+
+
+class InterestGrid:
+    """
+    Uniform grid of square buckets, each counting the cells every entity holds in it.
+
+    Cells are 1-based to match OccupancyGrid.
+    """
+    CELL_SIZE = 8
+
+    __slots__ = ("cell_size", "columns", "rows", "buckets")
+
+    def __init__(self, width: int, height: int, cell_size: int=CELL_SIZE) -> None:
+        """
+        Initialize an empty grid over a <width> by <height> board.
+
+        :param cell_size: (default InterestGrid.CELL_SIZE) a positive integer representing the width and height
+                          of a bucket in board cells
+        """
+        self.cell_size: int = cell_size
+        self.columns: int = -(-width // cell_size)
+        self.rows: int = -(-height // cell_size)
+        self.buckets: List[Dict[int, int]] = [{} for _ in range(self.columns * self.rows)]
+
+    def add(self, column: int, row: int, entity: int) -> None:
+        bucket = self.buckets[(row - 1) // self.cell_size * self.columns + (column - 1) // self.cell_size]
+        bucket[entity] = bucket.get(entity, 0) + 1
+
+    def remove(self, column: int, row: int, entity: int) -> None:
+        bucket = self.buckets[(row - 1) // self.cell_size * self.columns + (column - 1) // self.cell_size]
+        count = bucket.get(entity, 0) - 1
+        if count > 0:
+            bucket[entity] = count
+        else:
+            bucket.pop(entity, None)
+
+    def query(self, bounds: Tuple[int, int, int, int]) -> Set[int]:
+        """
+        Get the entities with a cell in a bucket that overlaps <bounds>.
+
+        Buckets are coarser than cells, so entities just outside <bounds> may be included too.
+
+        :param bounds: a tuple of four integers representing the inclusive left, top, right and bottom cells
+        :return: a set of the entities found
+        """
+        left, top, right, bottom = bounds
+        first_column = max(0, (left - 1) // self.cell_size)
+        last_column = min(self.columns - 1, (right - 1) // self.cell_size)
+        first_row = max(0, (top - 1) // self.cell_size)
+        last_row = min(self.rows - 1, (bottom - 1) // self.cell_size)
+        found = set()
+        for bucket_row in range(first_row, last_row + 1):
+            start = bucket_row * self.columns
+            for bucket in self.buckets[start + first_column:start + last_column + 1]:
+                found.update(bucket)
+        return found
+
+
+def get_view_bounds(
+        center: Tuple[int, int],
+        view_size: Tuple[int, int],
+        board_size: Tuple[int, int],
+        margin: int=VIEW_MARGIN) -> Tuple[int, int, int, int]:
+    """
+    Get the board cells a client sees, with its view centred on <center> but kept on the board.
+
+    :param center: a tuple of two integers representing the column and row to centre on
+    :param view_size: a tuple of two positive integers representing the columns and rows of the view
+    :param board_size: a tuple of two integers representing the columns and rows of the board
+    :param margin: (default VIEW_MARGIN) a non-negative integer representing the cells added on every side
+    :return: a tuple of four integers representing the inclusive left, top, right and bottom cells
+    """
+    bounds = []
+    for position, view, board in zip(center, view_size, board_size):
+        # Same clamping as the client's camera, so both agree on what is in view
+        start = clamp_view_start(position, view, board)
+        bounds.append((start - margin, start + view - 1 + margin))
+    (left, right), (top, bottom) = bounds
+    return (left, top, right, bottom)
@@ -0,0 +1,171 @@
+"""
+Client-side prediction of the local player's snake.
+
+Key presses are applied to a local copy of the snake as soon as they happen and are numbered
+so the server can report the last one it applied. Each authoritative snapshot is checked against
+what was predicted for its tick: if they agree the prediction is kept, and if not the snake is reset to
+the server's copy and the inputs the server has not applied yet are replayed on top of it.
+Only the cells that differ between the old and the corrected snake need to be redrawn.
+
+The predicted tick runs ahead of the last snapshot by about the one-way latency, so an input is predicted
+for the tick the server will apply it at. Whenever the server applies an input on a different tick than
+predicted, the next rollback shifts the predicted timeline by the difference.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from utils.utilities import Direction, is_reversal
+
+from game.player import Player
+from game.snake import Snake, SnakeBody
+
+
+class SnakePredictor:
+    # Ticks of predicted heads kept for checking snapshots against
+    HISTORY_LENGTH = 128
+
+    def __init__(
+            self,
+            key_map: Dict[str, Any]=None,
+            history_length: int=HISTORY_LENGTH) -> None:
+        """
+        Initialize a predictor that waits for the first snapshot of the player's snake.
+
+        :param key_map: (default Player.DEFAULT_KEY_MAP) a dictionary of key names and the actions the server maps them to
+        :param history_length: (default SnakePredictor.HISTORY_LENGTH) a positive integer representing
+                               the most predicted ticks kept for reconciliation
+        """
+        self.key_map = key_map or Player.DEFAULT_KEY_MAP
+        self.snake: Snake | None = None
+        self.tick: int | None = None
+        self.next_seq: int = 0
+        # Inputs the server has not applied yet: (seq, tick applied locally, action)
+        self.pending: Deque[Tuple[int, int, Any]] = deque()
+        # Predicted (tick, head, length) after each local tick
+        self.history: Deque[Tuple[int, Tuple[int, int], int]] = deque(maxlen=history_length)
+        # Ticks between when the server applied the last settled input and when it was predicted
+        self.tick_offset: int = 0
+        self.rollbacks: int = 0
+
+    def input(self, key_press: str) -> int:
+        """
+        Number a key press and apply it to the predicted snake right away.
+
+        :param key_press: a string representing the name of the pressed key
+        :postcondition: movement and growth are predicted, other keys are only numbered
+        :return: an integer representing the sequence number to send with <key_press>
+        """
+        seq = self.next_seq
+        self.next_seq += 1
+        action = self.key_map.get(key_press)
+        if self.snake is None or self.snake.dead:
+            return seq
+        if isinstance(action, Direction) and is_reversal(self.snake.old_facing, action):
+            # The server ignores reversals too
+            return seq
+        if SnakePredictor._is_predicted(action):
+            SnakePredictor._apply(self.snake, action)
+            self.pending.append((seq, self.tick, action))
+        return seq
+
+    def step(self) -> Tuple[Tuple[int, int], Tuple[int, int]] | None:
+        """
+        Advance the predicted snake by one tick.
+
+        :return: a tuple of the new head position and the removed butt position,
+                 or None if there is nothing to predict yet or the snake is dead
+        """
+        if self.snake is None or self.snake.dead:
+            return None
+        moved = self.snake.step()
+        self.tick += 1
+        self.history.append((self.tick, moved[0], len(self.snake.get_segments())))
+        return moved
+
+    def reconcile(
+            self,
+            tick: int,
+            server_snake: Dict[str, Any],
+            input_seq: int | None) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Check the prediction against the server's copy of the snake at <tick>.
+
+        :param tick: an integer representing the tick of the snapshot
+        :param server_snake: a dictionary with "segments", "facing" and "dead" representing the server's snake
+        :param input_seq: an integer representing the last input the server applied, or None if it has applied none
+        :postcondition: inputs up to <input_seq> are no longer pending
+        :postcondition: if the prediction for <tick> does not match, the snake is rebuilt from <server_snake>
+                        and the pending inputs are replayed up to the current predicted tick
+        :return: a tuple of two lists of positions representing the cells to erase and the cells to draw
+        """
+        if input_seq is not None:
+            while self.pending and self.pending[0][0] <= input_seq:
+                _, predicted_tick, _ = self.pending.popleft()
+                # The server applied it before stepping to <tick> at the latest
+                self.tick_offset = tick - 1 - predicted_tick
+        segments = server_snake["segments"]
+        if self.snake is not None and self._matches(tick, segments, server_snake["dead"]):
+            return [], []
+
+        old_cells = set(self.snake.get_segments()) if self.snake is not None else set()
+        self._rollback(tick, server_snake)
+        new_cells = set(self.snake.get_segments())
+        return list(old_cells - new_cells), list(new_cells - old_cells)
+
+    def _matches(self, tick: int, segments: List[Tuple[int, int]], dead: bool) -> bool:
+        if dead or self.snake.dead:
+            # Nothing is predicted for a dead snake, so only its death needs to reach the client
+            return dead and self.snake.dead
+        if not segments or not self.history:
+            return False
+        index = tick - self.history[0][0]
+        if not 0 <= index < len(self.history):
+            return False
+        _, head, length = self.history[index]
+        return head == tuple(segments[-1]) and length == len(segments)
+
+    def _rollback(self, tick: int, server_snake: Dict[str, Any]) -> None:
+        self.rollbacks += 1
+        segments = iter(server_snake["segments"])
+        body = SnakeBody(tuple(next(segments)), capacity=len(server_snake["segments"]))
+        for column, row in segments:
+            body.push_head(column, row)
+        snake = Snake(body.head(), body=body)
+        snake.set_facing(Direction(server_snake["facing"]))
+        snake.dead = server_snake["dead"]
+
+        offset = self.tick_offset
+        self.tick_offset = 0
+        predicted_tick = max(tick, (self.tick if self.tick is not None else tick) + offset)
+        self.snake = snake
+        self.tick = tick
+        self.history.clear()
+        self.history.append((tick, snake.get_head(), len(body)))
+        if snake.dead:
+            self.pending.clear()
+            return
+
+        # Move pending inputs onto the shifted timeline,
+        # those that now fall before <tick> take effect straight away
+        self.pending = deque((seq, max(tick, applied_tick + offset), action)
+                             for seq, applied_tick, action in self.pending)
+        pending = iter(self.pending)
+        replay = next(pending, None)
+        while True:
+            while replay is not None and replay[1] <= self.tick:
+                SnakePredictor._apply(snake, replay[2])
+                replay = next(pending, None)
+            if self.tick >= predicted_tick:
+                break
+            self.step()
+
+    @staticmethod
+    def _is_predicted(action: Any) -> bool:
+        return action == "grow" or isinstance(action, Direction)
+
+    @staticmethod
+    def _apply(snake: Snake, action: Any) -> None:
+        if action == "grow":
+            snake.add_segment()
+        elif not is_reversal(snake.old_facing, action):
+            snake.set_facing(action)
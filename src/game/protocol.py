@@ -0,0 +1,323 @@
+"""
+Framed binary messages shared by the client and the server.
+
+Every message on the wire is a 4-byte big-endian payload length followed by the payload.
+Payloads use a small tagged encoding for None, booleans, integers, floats, strings, bytes,
+lists, tuples and dictionaries. Lists of (column, row) pairs, like snake segments, are packed as
+16-bit integer pairs. Enums are sent as their value. Decoding never runs code from the peer.
+"""
+import os
+import struct
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 1 << 20
+
+_FLOAT = struct.Struct("!d")
+_POSITION_LIMIT = 1 << 15
+# Longest varint accepted, enough for any 64-bit length or integer
+_MAX_VARINT_BYTES = 10
+# Deepest nesting of lists, tuples and dictionaries accepted, so a peer cannot exhaust the stack
+MAX_DEPTH = 32
+
+_NONE = b"N"
+_TRUE = b"T"
+_FALSE = b"F"
+_INT = b"i"
+_FLOAT_TAG = b"f"
+_STR = b"s"
+_BYTES = b"b"
+_LIST = b"l"
+_TUPLE = b"t"
+_DICT = b"d"
+_POSITIONS = b"p"
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, index: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    for _ in range(_MAX_VARINT_BYTES):
+        try:
+            byte = data[index]
+        except IndexError:
+            raise ProtocolError("truncated varint") from None
+        index += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, index
+        shift += 7
+    raise ProtocolError(f"varint longer than {_MAX_VARINT_BYTES} bytes")
+
+
+def _is_position_list(value: list | tuple) -> bool:
+    if not value:
+        return False
+    for item in value:
+        if not (type(item) is tuple and len(item) == 2
+                and type(item[0]) is int and type(item[1]) is int
+                and -_POSITION_LIMIT <= item[0] < _POSITION_LIMIT
+                and -_POSITION_LIMIT <= item[1] < _POSITION_LIMIT):
+            return False
+    return True
+
+
+def _encode_into(out: bytearray, value: Any) -> None:
+    value_type = type(value)
+    if value is None:
+        out += _NONE
+    elif value is True:
+        out += _TRUE
+    elif value is False:
+        out += _FALSE
+    elif value_type is int:
+        out += _INT
+        # Zigzag so small negative numbers stay short
+        _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif value_type is float:
+        out += _FLOAT_TAG
+        out += _FLOAT.pack(value)
+    elif value_type is str:
+        encoded = value.encode("utf-8")
+        out += _STR
+        _write_varint(out, len(encoded))
+        out += encoded
+    elif value_type in (bytes, bytearray):
+        out += _BYTES
+        _write_varint(out, len(value))
+        out += value
+    elif value_type in (list, tuple):
+        if _is_position_list(value):
+            out += _POSITIONS
+            _write_varint(out, len(value))
+            out += struct.pack(f"!{len(value) * 2}h", *(coordinate for pair in value for coordinate in pair))
+            return
+        out += _LIST if value_type is list else _TUPLE
+        _write_varint(out, len(value))
+        for item in value:
+            _encode_into(out, item)
+    elif value_type is dict:
+        out += _DICT
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _encode_into(out, key)
+            _encode_into(out, item)
+    elif isinstance(value, Enum):
+        _encode_into(out, value.value)
+    elif isinstance(value, Iterable):
+        _encode_into(out, list(value))
+    else:
+        raise ProtocolError(f"cannot encode {value_type.__name__}: {value!r}")
+
+
+def _decode_from(data: bytes, index: int, depth: int=0) -> tuple[Any, int]:
+    tag = data[index:index + 1]
+    if not tag:
+        raise ProtocolError("truncated payload")
+    index += 1
+    if tag == _NONE:
+        return None, index
+    if tag == _TRUE:
+        return True, index
+    if tag == _FALSE:
+        return False, index
+    if tag == _INT:
+        zigzag, index = _read_varint(data, index)
+        return (zigzag >> 1) ^ -(zigzag & 1), index
+    if tag == _FLOAT_TAG:
+        if index + _FLOAT.size > len(data):
+            raise ProtocolError("truncated float")
+        return _FLOAT.unpack_from(data, index)[0], index + _FLOAT.size
+    if tag in (_STR, _BYTES):
+        length, index = _read_varint(data, index)
+        if index + length > len(data):
+            raise ProtocolError("truncated string")
+        raw = bytes(data[index:index + length])
+        if tag == _BYTES:
+            return raw, index + length
+        try:
+            return raw.decode("utf-8"), index + length
+        except UnicodeDecodeError as error:
+            raise ProtocolError(f"invalid UTF-8 string: {error.reason}") from None
+    if tag in (_LIST, _TUPLE, _DICT) and depth >= MAX_DEPTH:
+        raise ProtocolError(f"nested deeper than {MAX_DEPTH} levels")
+    if tag in (_LIST, _TUPLE):
+        length, index = _read_varint(data, index)
+        items = []
+        for _ in range(length):
+            item, index = _decode_from(data, index, depth + 1)
+            items.append(item)
+        return (items if tag == _LIST else tuple(items)), index
+    if tag == _DICT:
+        length, index = _read_varint(data, index)
+        mapping = {}
+        for _ in range(length):
+            key, index = _decode_from(data, index, depth + 1)
+            try:
+                hash(key)
+            except TypeError:
+                raise ProtocolError(f"unhashable dictionary key of type {type(key).__name__}") from None
+            mapping[key], index = _decode_from(data, index, depth + 1)
+        return mapping, index
+    if tag == _POSITIONS:
+        length, index = _read_varint(data, index)
+        end = index + length * 4
+        if end > len(data):
+            raise ProtocolError("truncated positions")
+        flat = struct.unpack_from(f"!{length * 2}h", data, index)
+        return list(zip(flat[::2], flat[1::2])), end
+    raise ProtocolError(f"unknown tag {tag!r}")
+
+
+def encode_message(value: Any) -> bytes:
+    """
+    Encode <value> as a message payload without the frame header.
+
+    :param value: a value made of None, booleans, integers, floats, strings, bytes, Enums,
+                  lists, tuples and dictionaries
+    :raise ProtocolError: if <value> contains an unsupported type
+    :return: bytes representing the encoded payload
+    """
+    out = bytearray()
+    _encode_into(out, value)
+    return bytes(out)
+
+
+def decode_message(payload: bytes) -> Any:
+    """
+    Decode a message payload made by encode_message().
+
+    Payloads come from untrusted peers, so anything malformed raises ProtocolError and nothing else.
+
+    :raise ProtocolError: if <payload> is malformed
+    :return: the decoded value
+
+    >>> decode_message(encode_message({"input": "up", "segments": [(1, 2), (3, 4)]}))
+    {'input': 'up', 'segments': [(1, 2), (3, 4)]}
+    >>> decode_message(b"s\\x01\\xff")
+    Traceback (most recent call last):
+    ...
+    game.protocol.ProtocolError: invalid UTF-8 string: invalid start byte
+    >>> decode_message(b"d\\x01l\\x00N")
+    Traceback (most recent call last):
+    ...
+    game.protocol.ProtocolError: unhashable dictionary key of type list
+    >>> decode_message(b"d\\x01t\\x01l\\x00N")
+    Traceback (most recent call last):
+    ...
+    game.protocol.ProtocolError: unhashable dictionary key of type tuple
+    >>> decode_message(b"l\\x01" * 10000 + b"N")
+    Traceback (most recent call last):
+    ...
+    game.protocol.ProtocolError: nested deeper than 32 levels
+    >>> decode_message(b"i" + b"\\xff" * 100)
+    Traceback (most recent call last):
+    ...
+    game.protocol.ProtocolError: varint longer than 10 bytes
+    """
+    value, index = _decode_from(payload, 0)
+    if index != len(payload):
+        raise ProtocolError("trailing bytes after message")
+    return value
+
+
+def frame_message(value: Any) -> bytes:
+    """
+    Encode <value> as one length-prefixed frame ready to send.
+    """
+    payload = encode_message(value)
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"message of {len(payload)} bytes exceeds {MAX_FRAME_SIZE}")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def pack_messages(*values: Any) -> bytes:
+    """
+    Frame every value in <values> into one buffer so they can go out in a single send.
+    """
+    return b"".join(map(frame_message, values))
+
+
+def get_control_reply(message: Any, get_stats: Callable[[], Dict[str, Any]] | None=None) -> Any | None:
+    """
+    Get the reply to a ping or stats request, which servers answer straight away at any point of a match.
+
+    {"ping": <value>} is answered with {"pong": <value>}, so the sender can time the round trip.
+    "stats" is answered with {"stats": <dictionary>} holding the server's "pid", its process "cpu_time"
+    in seconds and everything <get_stats> returns, like the tick clock's overrun statistics.
+
+    :param message: a decoded message from a client
+    :param get_stats: (default None) a function returning a dictionary of statistics to add to stats replies
+    :return: the reply, or None if <message> is not a ping or stats request
+    """
+    if type(message) is dict and "ping" in message:
+        return {"pong": message["ping"]}
+    if message == "stats":
+        stats = {"pid": os.getpid(), "cpu_time": time.process_time()}
+        if get_stats is not None:
+            stats.update(get_stats())
+        return {"stats": stats}
+    return None
+
+
+class FrameDecoder:
+    """
+    Reassemble messages from a byte stream that may split or merge frames anywhere.
+    """
+    __slots__ = ("_buffer",)
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Any]:
+        """
+        Add received bytes and decode every frame they complete.
+
+        :param data: bytes representing the next chunk read from the stream
+        :raise ProtocolError: if a frame is too large or malformed
+        :return: a list of the decoded messages, in order, which is empty if no frame is complete yet
+        """
+        buffer = self._buffer
+        buffer += data
+        messages = []
+        start = 0
+        while len(buffer) - start >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, start)
+            if length > MAX_FRAME_SIZE:
+                raise ProtocolError(f"frame of {length} bytes exceeds {MAX_FRAME_SIZE}")
+            end = start + FRAME_HEADER.size + length
+            if end > len(buffer):
+                break
+            messages.append(decode_message(bytes(buffer[start + FRAME_HEADER.size:end])))
+            start = end
+        if start:
+            del buffer[:start]
+        return messages
+
+    def pending(self) -> int:
+        """
+        Get the number of buffered bytes that do not make a full frame yet.
+        """
+        return len(self._buffer)
+
+    def take_pending(self) -> bytes:
+        """
+        Remove and return the buffered bytes that do not make a full frame yet.
+
+        :postcondition: the decoder is empty, so another decoder can continue the stream
+        """
+        pending = bytes(self._buffer)
+        self._buffer.clear()
+        return pending
@@ -0,0 +1,220 @@
+"""
+Replays of Snake Attack matches: recording, and headless playback with seeking.
+
+The simulation only depends on its players, board, seed, item count and inputs, so a replay stores nothing else.
+A replay is an append-only stream of game.protocol frames:
+
+    {"replay": <version>, "players": [<player id>, ...], "board_size": (<columns>, <rows>), "seed": <int>,
+     "item_count": <items kept on the board>}
+    (<ticks since the last record>, <player id>, <input>)    an input applied before that tick's update
+    (<ticks since the last record>, <player id>)             the player left
+    {"end": <tick>}                                          written when the recording is closed
+
+Tick deltas keep every record a few bytes long, and a replay cut short by a crash still plays up to its last input.
+Playback keeps a copy of the state every <checkpoint_interval> ticks, so seeking backwards
+only re-simulates from the nearest checkpoint instead of from the start.
+
+Run with: python -m game.replay <replay file> [--seek <tick>]
+"""
+import argparse
+import bisect
+import copy
+import time
+from typing import Any, BinaryIO, Dict, List, Tuple
+
+from ansi_actions.style import style, Style
+from game.protocol import FrameDecoder, ProtocolError, frame_message
+from game.snake_attack_host import SnakeAttackState
+
+REPLAY_VERSION = 1
+# Bytes read from a replay file at a time
+READ_SIZE = 1 << 16
+
+
+class ReplayRecorder:
+    def __init__(self, output: BinaryIO, state: SnakeAttackState) -> None:
+        """
+        Start recording the inputs of <state> to <output>.
+
+        :param output: a binary stream to append the replay to
+        :param state: a SnakeAttackState that has not ticked yet
+        :postcondition: the header is written and <state> logs every input to this recorder
+        """
+        self.output = output
+        self.last_tick = state.tick
+        output.write(frame_message({
+            "replay": REPLAY_VERSION,
+            "players": list(state.players),
+            "board_size": tuple(state.board_size),
+            "seed": state.seed,
+            "item_count": state.items.target}))
+        state.recorder = self
+
+    def record_input(self, tick: int, player_id: int, data: Any) -> None:
+        self._write((tick - self.last_tick, player_id, data))
+        self.last_tick = tick
+
+    def record_leave(self, tick: int, player_id: int) -> None:
+        self._write((tick - self.last_tick, player_id))
+        self.last_tick = tick
+
+    def close(self, tick: int) -> None:
+        """
+        Mark the end of the match at <tick> and flush the replay.
+        """
+        self.output.write(frame_message({"end": tick}))
+        self.output.flush()
+
+    def _write(self, record: Tuple) -> None:
+        try:
+            self.output.write(frame_message(record))
+        except ProtocolError:
+            # Inputs the protocol cannot send never reached the simulation from a client either
+            pass
+
+
+def read_replay(replay_file: BinaryIO) -> Tuple[Dict[str, Any], List[Tuple]]:
+    """
+    Read a replay written by ReplayRecorder.
+
+    :param replay_file: a binary stream positioned at the start of a replay
+    :raise ProtocolError: if the stream is not a replay or is malformed
+    :return: a tuple of the header dictionary, with "end" set if the replay was closed,
+             and a list of events (<tick>, <player id>, <input>) or (<tick>, <player id>) in order
+    """
+    decoder = FrameDecoder()
+    records = []
+    while data := replay_file.read(READ_SIZE):
+        records.extend(decoder.feed(data))
+    if not records or type(records[0]) is not dict or records[0].get("replay") != REPLAY_VERSION:
+        raise ProtocolError("not a replay of a supported version")
+
+    header = dict(records[0])
+    events = []
+    tick = 0
+    for record in records[1:]:
+        if type(record) is dict:
+            header["end"] = record.get("end")
+            continue
+        tick += record[0]
+        events.append((tick,) + tuple(record[1:]))
+    return header, events
+
+
+class ReplayPlayer:
+    # Ticks between state checkpoints
+    CHECKPOINT_INTERVAL = 256
+
+    def __init__(
+            self,
+            header: Dict[str, Any],
+            events: List[Tuple],
+            checkpoint_interval: int=CHECKPOINT_INTERVAL) -> None:
+        """
+        Initialize playback of a replay from read_replay() at tick 0.
+
+        :param header: a dictionary representing the replay header
+        :param events: a list of events in tick order
+        :param checkpoint_interval: (default ReplayPlayer.CHECKPOINT_INTERVAL) a positive integer representing
+                                    the ticks between kept copies of the state
+        """
+        self.header = header
+        self.events = events
+        self.event_ticks = [event[0] for event in events]
+        self.checkpoint_interval = checkpoint_interval
+        # Replays recorded before the item count was stored used the default
+        self.state = SnakeAttackState(
+                *header["players"],
+                board_size=tuple(header["board_size"]),
+                seed=header["seed"],
+                item_count=header.get("item_count"))
+        self.next_event = 0
+        self.checkpoints: Dict[int, SnakeAttackState] = {0: copy.deepcopy(self.state)}
+
+    def end_tick(self) -> int:
+        """
+        Get the tick the match ended on, or the tick of the last input if the replay was not closed.
+        """
+        end = self.header.get("end")
+        if end is not None:
+            return end
+        return self.event_ticks[-1] + 1 if self.event_ticks else 0
+
+    def step(self) -> None:
+        """
+        Apply the inputs of the current tick and simulate it.
+
+        :postcondition: the state is one tick further and is copied if a checkpoint is due
+        """
+        state = self.state
+        events = self.events
+        while self.next_event < len(events) and events[self.next_event][0] <= state.tick:
+            event = events[self.next_event]
+            if len(event) == 3:
+                state.player_update(event[1], event[2])
+            else:
+                state.remove_player(event[1])
+            self.next_event += 1
+        state.update()
+        if state.tick % self.checkpoint_interval == 0 and state.tick not in self.checkpoints:
+            self.checkpoints[state.tick] = copy.deepcopy(state)
+
+    def seek(self, tick: int) -> SnakeAttackState:
+        """
+        Play to <tick>, going back to the latest checkpoint at or before it if <tick> has already passed.
+
+        :param tick: a non-negative integer representing the tick to stop at
+        :return: the SnakeAttackState at <tick>
+        """
+        if tick < self.state.tick:
+            checkpoint = max(checkpoint_tick for checkpoint_tick in self.checkpoints if checkpoint_tick <= tick)
+            self.state = copy.deepcopy(self.checkpoints[checkpoint])
+            # Events of the checkpoint's own tick are applied before its update, so they are still to come
+            self.next_event = bisect.bisect_left(self.event_ticks, checkpoint)
+        while self.state.tick < tick:
+            self.step()
+        return self.state
+
+    def play(self) -> float:
+        """
+        Play to the end as fast as possible.
+
+        :return: a float representing the ticks simulated per second
+        """
+        start_tick = self.state.tick
+        start = time.perf_counter()
+        self.seek(self.end_tick())
+        elapsed = time.perf_counter() - start
+        return (self.state.tick - start_tick) / elapsed if elapsed else float("inf")
+
+
+def load_replay(path: str, checkpoint_interval: int=ReplayPlayer.CHECKPOINT_INTERVAL) -> ReplayPlayer:
+    with open(path, "rb") as replay_file:
+        return ReplayPlayer(*read_replay(replay_file), checkpoint_interval=checkpoint_interval)
+
+
+def main():
+    """
+    Drive the program.
+    """
+    parser = argparse.ArgumentParser(description="Play a Snake Attack replay headless.")
+    parser.add_argument("path", help="replay file to play")
+    parser.add_argument("--seek", type=int, help="tick to stop at and print the state of")
+    arguments = parser.parse_args()
+
+    try:
+        player = load_replay(arguments.path)
+    except (OSError, ProtocolError) as error:
+        print(style(f"Cannot read replay: {error}", Style.RED))
+        return
+    if arguments.seek is not None:
+        print(player.seek(arguments.seek).get_state())
+        return
+    ticks_per_second = player.play()
+    print(f"{len(player.header['players'])} players, {player.state.tick} ticks, seed {player.header['seed']}")
+    print(f"  {ticks_per_second:,.0f} ticks/s")
+    print(f"  {sum(not snake.dead for snake in player.state.snakes.values())} snakes alive at the end")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,9 @@ from game.scenes.scene import Scene, SCENES
 
 class FourOhFour(Scene):
     def __init__(self) -> None:
+        self.layout()
+
+    def layout(self) -> None:
         scene_not_found_message = "404 Scene not found"
         instructions_message = "Press any key to return to main menu"
         self.instructions: Dict[str, Any] = create_text_area(
@@ -20,13 +23,17 @@ class FourOhFour(Scene):
             style(instructions_message,
                   Style.YELLOW, Style.RAPID_BLINK))
 
-        self.just_entered = True
-
-    def update(self, key_press: str) -> Scene | None:
+    def start(self) -> None:
         clear_screen()
-        draw_text_box(text_area=self.instructions, flush_output=True)
-        if self.just_entered:
-            self.just_entered = False
+        self.dirty = True
+
+    def update(self, key_press: str | None, dt: float) -> Scene | None:
+        if key_press is None:
             return None
         return SCENES.MainMenu
 
+    def resize(self, width: int, height: int) -> None:
+        self.layout()
+
+    def render(self) -> None:
+        draw_text_box(text_area=self.instructions, flush_output=True)
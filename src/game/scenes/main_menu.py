@@ -17,20 +17,28 @@ class MainMenu(Scene):
         "SETTINGS",
         "QUIT")
     def __init__(self) -> None:
+        self.layout(*get_screen_size())
+
+    def layout(self, width: int, height: int, selected: str=OPTIONS[0]) -> None:
         self.menu: Dict[str, callable] = create_menu(
-            2, (get_screen_size()[1] - len(MainMenu.OPTIONS) - 2),
-            *MainMenu.OPTIONS)
+            2, (height - len(MainMenu.OPTIONS) - 2),
+            *MainMenu.OPTIONS,
+            default=MainMenu.OPTIONS.index(selected))
 
         self.title: Dict[str, Any] = create_text_area(
-            column=2, row=(get_screen_size()[1] - len(MainMenu.OPTIONS) - 4),
+            column=2, row=(height - len(MainMenu.OPTIONS) - 4),
             width=13, height=1,
             text=style("Snake Attack!",
                   Style.GREEN, Style.UNDERLINE, Style.BOLD, Style.SLOW_BLINK))
 
-    def update(self, key_press: str) -> Scene | None:
+    def start(self) -> None:
         clear_screen()
-        draw_text_box(text_area=self.title)
-        choice = self.menu["update_menu"](key_press)
+        self.dirty = True
+
+    def update(self, key_press: str | None, dt: float) -> Scene | None:
+        if key_press is None:
+            return None
+        choice = self.menu["select_option"](key_press)
         match choice:
             case "START":
                 return SCENES.SnakeAttackPlay
@@ -39,5 +47,12 @@ class MainMenu(Scene):
             case "QUIT":
                 return SCENES.QuitGame
             case _:
+                self.dirty = True
                 return None
 
+    def resize(self, width: int, height: int) -> None:
+        self.layout(width, height, self.menu["get_selected_option"]())
+
+    def render(self) -> None:
+        draw_text_box(text_area=self.title)
+        self.menu["draw_menu"]()
@@ -1,13 +1,38 @@
 from enum import Enum, auto
 
 class Scene:
+    """
+    A screen of the game run by Game.
+
+    start() runs once when the scene becomes current, then every frame update() runs once per key press,
+    or once with None when no key was pressed, and render() draws the scene if it is marked dirty.
+    After the terminal is resized the screen is cleared, resize() runs and the scene is rendered again.
+    """
+    # Keys whose repeated presses are queued once while the scene runs, see terminal.input.set_input_rules()
+    COALESCE_KEYS = ()
+    # Whether the scene only changes on key presses, so the game can sleep until one arrives
+    IDLE_UNTIL_INPUT = True
+    # Function deciding which key presses to queue while the scene runs, or None to queue all of them
+    accept_key = None
+    # Whether the scene needs to be rendered, cleared after every render
+    dirty = True
+
     def __init__(self):
         pass
 
     def start(self):
         pass
 
-    def update(self):
+    def update(self, key_press, dt):
+        pass
+
+    def render(self):
+        pass
+
+    def resize(self, width, height):
+        """
+        Lay the scene out again for a terminal of <width> by <height>, the screen has been cleared.
+        """
         pass
 
     def end(self):
@@ -1,24 +1,63 @@
 # General
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import socket
 
 # tGame
 from ansi_actions.style import style, Style
 from terminal.draw import create_text_area, draw_text_box
-from terminal.screen import clear_screen
+from terminal.input import OPPOSITE_KEYS, reject_reversals
+from terminal.camera import clear_world_cell, create_camera, follow, resize_camera, set_world_cell
+from terminal.render import clear_frame, create_frame_buffer, invalidate_frame, render_frame
+from terminal.screen import clear_screen, get_screen_size
+from utils.utilities import Direction, is_reversal
 
 # Snake attack
 from client.client_net import Client
 from game.scenes.scene import Scene, SCENES
-from game.snake import draw
+from game.prediction import SnakePredictor
+from game.snake import draw, erase
+from game.snapshot import SnapshotDecoder
+from game.tick_clock import TickClock
 
 class SnakeAttackPlay(Scene):
+    # Must match the host's tick rate for predicted moves to line up with the server's
+    TICK_RATE = 20
+    # Frame size when the terminal size cannot be read
+    DEFAULT_FRAME_SIZE = (80, 24)
+    # Pressing a direction the snake already turns to again does nothing
+    COALESCE_KEYS = tuple(OPPOSITE_KEYS)
+    # Snapshots arrive and predicted ticks are due without any key press
+    IDLE_UNTIL_INPUT = False
+    # Seconds between messages sent without a key press, which only acknowledge snapshots
+    ACK_INTERVAL = 0.25
+    # Character and colour each kind of item is drawn with
+    ITEM_GLYPHS = {
+        "food": ("*", "yellow"),
+        "feast": ("@", "magenta")}
+
     def __init__(self):
         self.client = Client()
         self.game_state = None
+        self.snapshots = SnapshotDecoder()
+        self.predictor = SnakePredictor()
+        self.local_clock = TickClock(SnakeAttackPlay.TICK_RATE)
+        self.frame = create_frame_buffer(*(get_screen_size() or SnakeAttackPlay.DEFAULT_FRAME_SIZE))
+        # Follows the player's head across boards larger than the terminal
+        self.camera = create_camera(self.frame["width"], self.frame["height"])
+        # Cells drawn for each of the other players' snakes
+        self.drawn_snakes: Dict[Any, set] = {}
+        # Kind of item drawn on each cell
+        self.drawn_items: Dict[Tuple[int, int], str] = {}
+        # View size last sent to the host, which only sends what is in or near it
+        self.reported_view: Tuple[int, int] | None = None
+        # Snapshot tick last acknowledged to the host, and seconds since a message was sent
+        self.acked_tick: int | None = None
+        self.since_sent = 0.0
 
     def start(self) -> Scene | None:
         clear_screen()
+        invalidate_frame(self.frame)
+        self.dirty = True
         try:
             data = self.client.connect()
             self.client.send("waiting")
@@ -28,19 +67,128 @@ class SnakeAttackPlay(Scene):
         else:
             return
 
-    def update(self, key_press: str) -> Scene | None:
-        data = self.client.send(key_press)
-        if data is None:
+    def update(self, key_press: str | None, dt: float) -> Scene | None:
+        # Inputs are one-way and applied locally right away, the host pushes snapshots after every tick
+        message = {}
+        if key_press is not None:
+            message["input"] = key_press
+            message["seq"] = self.predictor.input(key_press)
+        self.since_sent += dt
+        idle_due = self.since_sent >= SnakeAttackPlay.ACK_INTERVAL
+        view = (self.frame["width"], self.frame["height"])
+        # Repeated until snapshots arrive, in case the host got it before the game started
+        if view != self.reported_view or (self.snapshots.tick is None and idle_due):
+            message["view"] = view
+            self.reported_view = view
+        # Acks ride along with other messages, and are otherwise only sent now and then once the tick moved on
+        if message or (idle_due and self.snapshots.tick != self.acked_tick):
+            message["ack"] = self.acked_tick = self.snapshots.tick
+            self.since_sent = 0.0
+            self.client.send(message, receive=False)
+        pushed = self.client.poll()
+        if pushed is None:
             # TODO: Connection Lost
             return SCENES.FourOhFour
-        if data == "kick":
-            self.client.send("acknowledged_kick", receive=False)
-            return SCENES.MainMenu
-        self.game_state = data
+        for data in pushed:
+            if data == "kick":
+                self.client.send("acknowledged_kick", receive=False)
+                return SCENES.MainMenu
+            if type(data) is dict and self.snapshots.apply(data):
+                self.game_state = self.snapshots.get_state()
+                self.camera["world_width"], self.camera["world_height"] = self.snapshots.board_size or (None, None)
+                self.reconcile()
         if not self.game_state:
             return
+        self.draw_items(self.game_state["items"])
+        self.predict()
         if type(self.game_state) is dict:
-            draw(self.game_state["snake"]["segments"])
+            for player_id, snake in self.game_state["snakes"].items():
+                if player_id != self.snapshots.player_id:
+                    self.draw_other_snake(player_id, snake["segments"])
+            # Snakes that left the view are no longer sent
+            for player_id in self.drawn_snakes.keys() - self.game_state["snakes"].keys():
+                erase(self.drawn_snakes.pop(player_id), self.frame, self.camera)
+        if self.predictor.snake is not None and follow(self.camera, *self.predictor.snake.get_head()):
+            self.redraw()
+        self.dirty = bool(self.frame["dirty"])
+
+    def resize(self, width: int, height: int) -> None:
+        self.frame = create_frame_buffer(width, height)
+        resize_camera(self.camera, width, height)
+        if self.predictor.snake is not None:
+            follow(self.camera, *self.predictor.snake.get_head())
+        self.redraw()
+
+    def redraw(self) -> None:
+        """
+        Draw everything again after the camera moved, only the cells that end up different reach the screen.
+        """
+        clear_frame(self.frame)
+        if self.predictor.snake is not None:
+            draw(self.predictor.snake, self.frame, self.camera)
+        for cells in self.drawn_snakes.values():
+            draw(cells, self.frame, self.camera)
+        self.drawn_items = {}
+        if self.game_state:
+            self.draw_items(self.game_state["items"])
+
+    def render(self) -> None:
+        render_frame(self.frame)
+
+    def accept_key(self, key_name: str, previous_key_name: str | None) -> bool:
+        """
+        Drop direction presses that would turn the snake straight back into itself.
 
+        A press is checked against the queued press before it, or against the way the snake last moved.
+        """
+        if previous_key_name is not None:
+            return reject_reversals(key_name, previous_key_name)
+        snake = self.predictor.snake
+        direction = self.predictor.key_map.get(key_name)
+        if snake is None or not isinstance(direction, Direction):
+            return True
+        return not is_reversal(snake.old_facing, direction)
 
+    def draw_other_snake(self, player_id: Any, segments) -> None:
+        cells = set(segments)
+        drawn = self.drawn_snakes.get(player_id, set())
+        erase(drawn - cells, self.frame, self.camera)
+        draw(cells - drawn, self.frame, self.camera)
+        self.drawn_snakes[player_id] = cells
 
+    def draw_items(self, items: Dict[str, list]) -> None:
+        cells = {tuple(cell): kind for kind, positions in items.items() for cell in positions}
+        if cells == self.drawn_items:
+            return
+        # A picked up item is under the snake that ate it, which draws over it itself
+        snake_cells = set(self.predictor.snake.get_segments()) if self.predictor.snake is not None else set()
+        for drawn in self.drawn_snakes.values():
+            snake_cells |= drawn
+        for cell in self.drawn_items.keys() - cells.keys() - snake_cells:
+            clear_world_cell(self.frame, self.camera, *cell)
+        for cell, kind in cells.items():
+            if self.drawn_items.get(cell) != kind:
+                set_world_cell(self.frame, self.camera, *cell, *SnakeAttackPlay.ITEM_GLYPHS.get(kind, ("?", "white")))
+        self.drawn_items = cells
+
+    def reconcile(self) -> None:
+        own_snake = self.game_state["snakes"].get(self.snapshots.player_id)
+        if own_snake is None:
+            return
+        if self.local_clock.next_tick_time is None:
+            self.local_clock.start()
+        erased, drawn = self.predictor.reconcile(self.snapshots.tick, own_snake, self.snapshots.input_seq)
+        erase(erased, self.frame, self.camera)
+        draw(drawn, self.frame, self.camera)
+
+    def predict(self) -> None:
+        if self.local_clock.next_tick_time is None:
+            return
+        for _ in range(self.local_clock.due_ticks()):
+            moved = self.predictor.step()
+            if moved is None:
+                break
+            head, butt = moved
+            if butt != self.predictor.snake.get_segments().butt():
+                erase((butt,), self.frame, self.camera)
+            draw((head,), self.frame, self.camera)
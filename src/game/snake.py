@@ -1,104 +1,235 @@
 from ansi_actions.style import style
 from ansi_actions import cursor
-from terminal.screen import clear_screen
-from terminal.input import init_key_input, get_key_codes, poll_key_press, pull_input
-from utils.utilities import LinkedNode, Direction, get_direction_vectors
-
-from typing import Dict, Tuple, Set, Any
-from enum import Enum
-import threading
-import time
+from terminal.input import init_key_input, poll_key_presses, pull_input, restore_key_input
+from terminal.camera import clear_world_cell, set_world_cell, world_to_screen
+from terminal.render import clear_cell, create_frame_buffer, render_frame, set_cell
+from terminal.screen import clear_screen, get_screen_size
+from utils.utilities import DX, DY, Direction, is_reversal
 
+from game.tick_clock import TickClock
 
-class Segment(LinkedNode):
-    def __init__(self, position: Tuple[int, int], next_node: "Segment"=None) -> None:
-        super().__init__(position, next_node)
-
-    def get_position(self) -> Tuple[int, int]:
-        return self.value
+from array import array
+from typing import Dict, Tuple, Any, Iterable, Iterator
+from enum import Enum
 
-    def set_position(self, new_position: Tuple[int, int]) -> None:
-        if not (type(new_position) is tuple and len(new_position) == 2):
-            raise TypeError(style("new_position must be a Vector2 (Tuple[int, int]), "
-                            f"found {type(new_position)}: {new_position}", "red"))
-        self.value = new_position
 
-    def move(self, direction: Direction) -> None:
-        if direction not in Direction:
-            raise TypeError(style(f"direction be a Direction, found {direction}", "red"))
-        displacement = get_direction_vectors()[direction]
-        current_position = self.get_position()
-        self.set_position((
-                current_position[0] + displacement[0], # x position
-                current_position[1] + displacement[1])) # y position
+class SnakeBody:
+    """
+    Circular buffer of a snake's segment positions, ordered from the butt to the head.
+
+    Columns and rows are packed into two parallel integer arrays.
+    Moving overwrites one slot and advances the head and tail indices,
+    and the capacity doubles when full so growing is amortized O(1).
+
+    Every segment also has an absolute index that counts up from the butt:
+    new heads take the next index after the head and segments added at the butt take the one before it.
+    Snapshots use these indices to tell which segments a client already has.
+    """
+    DEFAULT_CAPACITY = 16
+
+    __slots__ = ("_columns", "_rows", "_capacity", "_tail", "_length", "butt_index", "peak_butt_index")
+
+    def __init__(self, position: Tuple[int, int], length: int=1, capacity: int=DEFAULT_CAPACITY) -> None:
+        """
+        Initialize a body of <length> segments stacked on <position>.
+
+        :param position: a tuple of two integers representing the column and row of every initial segment
+        :param length: (default 1) a positive integer representing the initial number of segments
+        :param capacity: (default SnakeBody.DEFAULT_CAPACITY) a positive integer representing
+                         the number of segments that fit before the buffer grows
+        """
+        capacity = max(capacity, length, 1)
+        self._columns: array = array("i", (position[0],)) * capacity
+        self._rows: array = array("i", (position[1],)) * capacity
+        self._capacity: int = capacity
+        self._tail: int = 0
+        self._length: int = length
+        self.butt_index: int = 0
+        # Highest butt index since the last reset_peak(), indices below it may have been reused
+        self.peak_butt_index: int = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        columns, rows, capacity = self._columns, self._rows, self._capacity
+        index = self._tail
+        for _ in range(self._length):
+            yield (columns[index], rows[index])
+            index += 1
+            if index == capacity:
+                index = 0
+
+    def __getitem__(self, offset: int) -> Tuple[int, int]:
+        """
+        Get the position <offset> segments from the butt, or from the head if <offset> is negative.
+        """
+        if offset < 0:
+            offset += self._length
+        if not 0 <= offset < self._length:
+            raise IndexError("SnakeBody index out of range")
+        index = (self._tail + offset) % self._capacity
+        return (self._columns[index], self._rows[index])
+
+    def head(self) -> Tuple[int, int]:
+        index = (self._tail + self._length - 1) % self._capacity
+        return (self._columns[index], self._rows[index])
+
+    def butt(self) -> Tuple[int, int]:
+        return (self._columns[self._tail], self._rows[self._tail])
+
+    def push_head(self, column: int, row: int) -> None:
+        if self._length == self._capacity:
+            self._grow()
+        index = (self._tail + self._length) % self._capacity
+        self._columns[index] = column
+        self._rows[index] = row
+        self._length += 1
+
+    def push_butt(self, column: int, row: int) -> None:
+        if self._length == self._capacity:
+            self._grow()
+        self._tail = (self._tail - 1) % self._capacity
+        self._columns[self._tail] = column
+        self._rows[self._tail] = row
+        self._length += 1
+        self.butt_index -= 1
+
+    def pop_butt(self) -> Tuple[int, int]:
+        if not self._length:
+            raise IndexError("pop from empty SnakeBody")
+        position = (self._columns[self._tail], self._rows[self._tail])
+        self._tail = (self._tail + 1) % self._capacity
+        self._length -= 1
+        self._bump_butt_index()
+        return position
+
+    def advance(self, column: int, row: int) -> Tuple[int, int]:
+        """
+        Move the body one step by dropping the butt and adding a head at (<column>, <row>).
+
+        :param column: an integer representing the column of the new head
+        :param row: an integer representing the row of the new head
+        :precondition: the body must have at least one segment
+        :postcondition: the length of the body is unchanged
+        :return: a tuple of two integers representing the position of the removed butt
+        """
+        tail = self._tail
+        position = (self._columns[tail], self._rows[tail])
+        # The freed butt slot is exactly where the new head goes when the buffer is full,
+        # and otherwise the next free slot after the head
+        index = (tail + self._length) % self._capacity
+        self._columns[index] = column
+        self._rows[index] = row
+        self._tail = (tail + 1) % self._capacity
+        self._bump_butt_index()
+        return position
+
+    def end_index(self) -> int:
+        """
+        Get the absolute index the next head will take, one past the current head.
+        """
+        return self.butt_index + self._length
+
+    def positions_between(self, start: int, stop: int) -> list:
+        """
+        Get the positions of the segments with absolute indices from <start> up to but not including <stop>.
+
+        :precondition: butt_index <= start <= stop <= end_index()
+        :return: a list of tuples of two integers representing the positions, from butt to head
+        """
+        offset = start - self.butt_index
+        return [self[offset + index] for index in range(stop - start)]
+
+    def reset_peak(self) -> None:
+        self.peak_butt_index = self.butt_index
+
+    def _bump_butt_index(self) -> None:
+        self.butt_index += 1
+        if self.butt_index > self.peak_butt_index:
+            self.peak_butt_index = self.butt_index
+
+    def _grow(self) -> None:
+        tail = self._tail
+        padding = array("i", (0,)) * self._capacity
+        self._columns = self._columns[tail:] + self._columns[:tail] + padding
+        self._rows = self._rows[tail:] + self._rows[:tail] + padding
+        self._tail = 0
+        self._capacity *= 2
 
 
 class Snake:
-    def __init__(self, position: Tuple[int, int], butt_segment: Segment=None, initial_length: int=3) -> None:
+    def __init__(self, position: Tuple[int, int], body: SnakeBody=None, initial_length: int=3) -> None:
         # Segments init
-        if not butt_segment:
-            self.butt = Segment(position=position, next_node=None)
-            for segment in range(initial_length - 1):
-                self.add_segment()
+        if not body:
+            self.body = SnakeBody(position, length=initial_length)
         else:
-            self.butt = butt_segment
+            self.body = body
 
-        # Initial direction of head
-        self.facing = Direction.RIGHT
+        # Initial direction of head, kept as a plain Direction code so moving only does integer arithmetic
+        self.facing = int(Direction.RIGHT)
         self.old_facing = self.facing
+        # Counts direction changes so snapshots can tell if the facing changed since a tick
+        self.facing_changes = 0
 
         # Initial state
         self.dead = False
 
-    def get_segments(self):
-        segments = []
-        segment = self.butt
-        while segment is not None:
-            segments.append(segment)
-            segment = segment.next
-        return segments
+    def get_segments(self) -> SnakeBody:
+        """
+        Get the snake's segment positions from butt to head.
+
+        The body itself is returned, so iterating over it does not copy the segments.
+        """
+        return self.body
+
+    def get_head(self) -> Tuple[int, int]:
+        return self.body.head()
 
     def add_segment(self) -> None:
-        new_butt = Segment(self.butt.get_position(), self.butt)
-        self.butt = new_butt
+        self.body.push_butt(*self.body.butt())
 
-    def set_facing(self, direction: Direction):
-        self.facing = direction
+    def set_facing(self, direction: Direction | int) -> None:
+        """
+        Point the snake towards <direction>.
 
-    def move(self) -> None:
-        positions: Set[Tuple[int, int]] = {}
-        segment: Segment = self.butt
+        This is where directions are checked, so next_head() and step() can trust the facing.
 
-        # Clear butt
-        cursor.cursor_set(*segment.get_position())
-        print(" ", end="")
-        while True:
+        :param direction: a Direction or its code
+        :raise ValueError: if <direction> is not a Direction or a Direction code
+        """
+        direction = int(Direction(direction))
+        if direction != self.facing:
+            self.facing_changes += 1
+        self.facing = direction
 
-            # Snake body handling
-            if segment.next != None:
-                segment.set_position(segment.next.get_position())
-                segment = segment.next
-                continue
+    def next_head(self) -> Tuple[int, int]:
+        facing = self.facing
+        head = self.body.head()
+        return (head[0] + DX[facing], # x position
+                head[1] + DY[facing]) # y position
 
-            # Snake head handling
-            segment.move(self.facing)
-            self.old_facing = self.facing
+    def step(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        Move the snake one cell in the direction it is facing.
 
-            # Check collide
-            # TODO: move to main game loop
-            if segment.get_position() in positions:
-                self.dead = True
-            break
-        # Clear Head
-        cursor.cursor_set(*segment.get_position())
-        print(" ", end="")
-        print(end="", flush=True)
+        Nothing is drawn, so the simulation runs without a terminal: draw() and erase() do the rendering.
+        Collisions are not checked here, see SnakeAttackState.update().
+
+        :postcondition: the head advances one cell and the butt is dropped
+        :return: a tuple of the new head position and the removed butt position
+        """
+        head = self.next_head()
+        butt = self.body.advance(*head)
+        self.old_facing = self.facing
+        return (head, butt)
 
 
 def convert_snake_to_json_dict(snake: Snake) -> Dict[str, Any]:
     return {
-            "segments": list(map(lambda segment: segment.get_position(), snake.get_segments())),
-            "facing": snake.facing}
+            "segments": list(snake.get_segments()),
+            "facing": snake.facing,
+            "dead": snake.dead}
 
 
 key_map: Dict[str, str] = {
@@ -111,95 +242,98 @@ key_map: Dict[str, str] = {
 }
 
 
-def draw(snake: Snake | list) -> None:
+def draw(
+        snake: Snake | Iterable,
+        frame: Dict[str, Any] | None=None,
+        camera: Dict[str, Any] | None=None) -> None:
+    """
+    Draw the segments of <snake>.
+
+    With a <frame> the segments go into its back buffer and reach the screen on the next render_frame(),
+    otherwise they are written straight away in one write.
+    With a <camera> the segments are board positions seen through it, and ones out of view are skipped.
+    """
     if type(snake) is Snake:
-        segments = map(lambda x: x.get_position(), snake.get_segments())
+        segments = snake.get_segments()
     else:
-        segments = map(lambda pos: pos, snake)
-    for seg in segments:
-        cursor.cursor_set(seg[0], seg[1])
-        print(style("o", "green"), end="")
-    print("", end="", flush=True)
-
-
-quit_game = threading.Event()
-choice = None
-key_in = init_key_input()
-
-
-def tick_snake(snake):
-    global choice
-    while not quit_game.is_set():
-        time.sleep(0.2)
-        snake.move()
-        draw(snake)
-
-
-def handle_game(snake):
-    while not quit_game.is_set():
-        choice = pull_input(key_in, flush=(len(key_in["input_queue"]) > 2))
-        if choice:
-            choice = choice[0]
-        try:
-            choice = key_map[choice]
-        except KeyError:
-            continue
-        # Handle input
-        if choice == None:
-            continue
-        if choice == "q":
-            break
-        if choice == "grow":
-            snake.add_segment()
-            continue
-
-        # Handle updates
-        current_facing = get_direction_vectors()[snake.old_facing]
-        next_facing = get_direction_vectors()[choice]
-        if not any([current_facing[0] + next_facing[0], current_facing[1] + next_facing[1]]):
-            continue
-
-        # Update snake
-        snake.facing = choice
-        if snake.dead:
-            print(style("Dead", "red"))
-            break
-    quit_game.set()
-
-
-def handle_input():
-    global choice
-    while not quit_game.is_set():
-        pressed = poll_key_press(key_in)
-        try:
-            choice = key_map[pressed]
-        except KeyError:
-            continue
-        if choice == "q":
-            break
-    quit_game.set()
+        segments = snake
+    if frame is not None:
+        if camera is not None:
+            for column, row in segments:
+                set_world_cell(frame, camera, column, row, "o", "green")
+            return
+        for column, row in segments:
+            set_cell(frame, column, row, "o", "green")
+        return
+    if camera is not None:
+        positions = (world_to_screen(camera, column, row) for column, row in segments)
+        segments = [position for position in positions if position is not None]
+    segment = style("o", "green")
+    print("".join(cursor.cursor_set_code(column, row) + segment for column, row in segments), end="", flush=True)
+
+
+def erase(segments: Iterable, frame: Dict[str, Any], camera: Dict[str, Any] | None=None) -> None:
+    """
+    Blank the cells of <segments> in the back buffer of <frame>, seen through <camera> if there is one.
+    """
+    if camera is not None:
+        for column, row in segments:
+            clear_world_cell(frame, camera, column, row)
+        return
+    for column, row in segments:
+        clear_cell(frame, column, row)
+
+
+# Ticks per second of the stand-alone demo
+DEMO_TICK_RATE = 5
+
+
+def handle_key(snake: Snake, pressed: str) -> bool:
+    """
+    Apply one key press to the demo snake.
+
+    :return: a boolean representing whether to keep playing
+    """
+    choice = key_map.get(pressed)
+    if choice is None:
+        return True
+    if choice == "q":
+        return False
+    if choice == "grow":
+        snake.add_segment()
+        return True
+
+    # Ignore turning straight back into the body
+    if not is_reversal(snake.old_facing, choice):
+        snake.set_facing(choice)
+    return True
 
 
 def main():
-    snake = Snake((2, 2))
+    """
+    Drive the program.
 
-    # Start threads for input and game logic
-    threads = []
-
-    t = threading.Thread(target=handle_input)
-    threads.append(t)
-    t = threading.Thread(target=handle_game, args=(snake,))
-    threads.append(t)
-    t = threading.Thread(target=tick_snake, args=(snake,))
-    threads.append(t)
+    Keys are read without blocking until the next tick is due, so input and movement share one loop.
+    """
+    key_in = init_key_input()
+    snake = Snake((2, 2))
+    clock = TickClock(DEMO_TICK_RATE)
+    frame = create_frame_buffer(*get_screen_size())
 
     clear_screen()
-    for t in threads:
-        t.start()
-
-    # Wait for all threads to finish
-    for t in threads:
-        t.join()
+    clock.start()
+    running = True
+    while running and not snake.dead:
+        poll_key_presses(key_in, clock.time_until_next())
+        # Pull every queued press, a full queue rejects new ones
+        for pressed in pull_input(key_in, amount=-1):
+            running = running and handle_key(snake, pressed)
+        for _ in range(clock.due_ticks()):
+            _, butt = snake.step()
+            erase((butt,), frame)
+            draw(snake, frame)
+        render_frame(frame)
+    restore_key_input(key_in)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
+import time
+from typing import Dict
+
 from ansi_actions.style import style, Style
 from terminal.menu import create_menu, get_centered_menu_position
 from terminal.draw import create_text_area, draw_text_box
-from terminal.screen import get_screen_size, clear_screen
-from terminal.input import init_key_input, poll_key_press
+from terminal.screen import get_screen_size, clear_screen, add_resize_listener, check_screen_size
+from terminal.input import init_key_input, poll_key_presses, pull_input, set_input_rules
 from client.client_net import Client
 
 from game.scenes.scene import Scene, SCENES
@@ -12,6 +15,11 @@ from game.scenes.root import QuitGame
 from game.scenes.snake_attack import SnakeAttackPlay
 
 class Game:
+    # Most frames rendered per second, scenes that only change on key presses render less often
+    FRAME_RATE = 30
+    # Longest sleep of scenes waiting for a key press, so terminal resizes are still noticed
+    RESIZE_CHECK_INTERVAL = 0.25
+
     SCENES: Dict[int, Scene] = {
         SCENES.MainMenu: MainMenu,
         SCENES.FourOhFour: FourOhFour,
@@ -21,31 +29,80 @@ class Game:
     }
 
     def __init__(self):
-        self.current_scene = Game.SCENES[SCENES.MainMenu]()
         self.running = True
 
         self.key_input = init_key_input()
         self.pressed = []
+        self.last_update = time.monotonic()
+        add_resize_listener(self.resize_scene)
+        self.set_scene(Game.SCENES[SCENES.MainMenu]())
 
     def start_loop(self):
+        frame_time = 1 / Game.FRAME_RATE
         while self.running:
-            # Get input
-            pressed = poll_key_press(self.key_input)
-            if pressed == "q":
-                break
-            # Scene handling
-            self.current_scene.start()
-            next_scene = self.current_scene.update(pressed)
-            if not next_scene:
-                continue
-            self.current_scene.end()
-            if next_scene == SCENES.QuitGame:
-                break
-            elif next_scene in Game.SCENES.keys():
-                self.current_scene = Game.SCENES[next_scene]()
+            frame_start = time.monotonic()
+            check_screen_size()
+            # Scenes still update once when no key was pressed
+            for pressed in pull_input(self.key_input, amount=-1) or [None]:
+                if pressed == "q":
+                    self.running = False
+                    break
+                self.update_scene(pressed)
+                if not self.running:
+                    break
             else:
-                self.current_scene = Game.SCENES[SCENES.FourOhFour]()
+                self.render_scene()
+                self.wait_for_input(frame_start + frame_time)
+
+    def wait_for_input(self, next_frame: float) -> None:
+        """
+        Sleep until the next frame is due or a key is pressed.
+
+        Scenes that only change on key presses sleep until one arrives or it is time to check for resizes.
+        """
+        if self.current_scene.IDLE_UNTIL_INPUT and not self.current_scene.dirty:
+            timeout = Game.RESIZE_CHECK_INTERVAL
+        else:
+            timeout = max(0.0, next_frame - time.monotonic())
+        poll_key_presses(self.key_input, timeout)
+
+    def update_scene(self, pressed: str | None) -> None:
+        now = time.monotonic()
+        dt = now - self.last_update
+        self.last_update = now
+        next_scene = self.current_scene.update(pressed, dt)
+        if next_scene:
+            self.change_scene(next_scene)
+
+    def resize_scene(self, width: int, height: int) -> None:
+        # Whatever was drawn for the old size is left in the wrong place
+        clear_screen(flush_output=False)
+        self.current_scene.resize(width, height)
+        self.current_scene.dirty = True
+
+    def render_scene(self) -> None:
+        if not self.current_scene.dirty:
+            return
+        self.current_scene.render()
+        self.current_scene.dirty = False
+
+    def change_scene(self, next_scene: SCENES) -> None:
+        self.current_scene.end()
+        if next_scene == SCENES.QuitGame:
+            self.running = False
+        elif next_scene in Game.SCENES.keys():
+            self.set_scene(Game.SCENES[next_scene]())
+        else:
+            self.set_scene(Game.SCENES[SCENES.FourOhFour]())
 
+    def set_scene(self, scene: Scene) -> None:
+        self.current_scene = scene
+        set_input_rules(self.key_input, scene.accept_key, scene.COALESCE_KEYS)
+        self.last_update = time.monotonic()
+        # Scenes start once, and can send the game on to another scene straight away
+        next_scene = scene.start()
+        if next_scene:
+            self.change_scene(next_scene)
 
 def main():
     clear_screen()
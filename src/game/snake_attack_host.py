@@ -1,49 +1,216 @@
+import random
 import threading
-from typing import Any, Dict
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, Tuple
 
-from utils.utilities import Direction
+from utils.utilities import Direction, is_reversal
 
+from game.collision import OccupancyGrid
+from game.food import FreeCells, ITEM_GROWTH, ItemField
+from game.interest import InterestGrid
 from game.snake import Snake, convert_snake_to_json_dict
 from game.player import Player
 
 
 class SnakeAttackState:
-    def __init__(self, player_one_id: int, player_two_id: int):
-        self.snake = Snake((2, 2))
-        self.p_one = Player(player_one_id)
-        self.p_two = Player(player_two_id)
+    DEFAULT_BOARD_SIZE = (40, 20)
+    # Ticks of snake records kept for building snapshot deltas
+    HISTORY_LENGTH = 64
+    # Items kept on the board for every player, unless a count is given
+    ITEMS_PER_PLAYER = 1
+
+    def __init__(
+            self,
+            *player_ids: int,
+            board_size: Tuple[int, int]=DEFAULT_BOARD_SIZE,
+            seed: int | None=None,
+            item_count: int | None=None):
+        self.board_size = board_size
+        # Every random choice comes from here, so a match replays the same from its seed and inputs
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.random = random.Random(self.seed)
+        # Logs inputs for replays when set, see game.replay.ReplayRecorder
+        self.recorder = None
+        self.occupancy = OccupancyGrid(
+                *board_size, free_cells=FreeCells(*board_size), interest=InterestGrid(*board_size))
+        self.players: Dict[int, Player] = {}
+        self.snakes: Dict[int, Snake] = {}
+        for spawn_index, player_id in enumerate(player_ids):
+            self.players[player_id] = Player(player_id)
+            self.snakes[player_id] = Snake((2, 2 + spawn_index * 2))
+            self.occupancy.add_cells(self.snakes[player_id].get_segments(), player_id)
+        if item_count is None:
+            item_count = SnakeAttackState.ITEMS_PER_PLAYER * len(player_ids)
+        self.items = ItemField(self.occupancy.free_cells, self.random, item_count)
+        self.items.spawn()
         self.thread_lock = threading.Lock()
         self.running = True
+        # Sequence number of the last input applied for each player, for client prediction
+        self.input_seqs: Dict[int, int] = {}
+
+        self.tick = 0
+        # Entries of (tick, records per snake, item changes)
+        self.history: Deque[Tuple[int, Dict[int, tuple], int]] = deque(maxlen=SnakeAttackState.HISTORY_LENGTH)
+        self._record_tick()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Copies and checkpoints get their own lock and do not log to the original's recorder
+        state = self.__dict__.copy()
+        del state["thread_lock"]
+        state["recorder"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.thread_lock = threading.Lock()
 
     def get_state(self) -> Dict[str, Any]:
         return {
-            "snake": convert_snake_to_json_dict(self.snake),
+            "snakes": {
+                player_id: convert_snake_to_json_dict(snake)
+                for player_id, snake in self.snakes.items()},
+            "items": self.items.get_positions(),
             "status": self.running}
 
+    def get_history_index(self, tick: int | None) -> int | None:
+        """
+        Get where the records for <tick> are in the history.
+
+        :precondition: thread_lock must be held
+        :return: an integer representing the index of <tick> in history, or None if it is not kept
+        """
+        if tick is None or not self.history:
+            return None
+        index = tick - self.history[0][0]
+        if not 0 <= index < len(self.history):
+            return None
+        return index
+
+    def _record_tick(self) -> None:
+        # Record per snake: (butt index, end index, peak butt index, facing changes, dead)
+        records = {}
+        for player_id, snake in self.snakes.items():
+            body = snake.get_segments()
+            records[player_id] = (
+                body.butt_index, body.end_index(), body.peak_butt_index, snake.facing_changes, snake.dead)
+            body.reset_peak()
+        self.history.append((self.tick, records, self.items.changes))
+
+    def occupant(self, column: int, row: int) -> int | None:
+        """
+        Get who occupies a board cell.
+
+        :return: an integer representing the id of the snake on (<column>, <row>),
+                 OccupancyGrid.EMPTY if the cell is free, or None if the cell is outside the board
+        """
+        if not self.occupancy.in_bounds(column, row):
+            return None
+        return self.occupancy.owner(column, row)
+
     def update(self):
-        self.snake.move()
+        """
+        Move every living snake one cell, killing the ones that crash.
 
-    def try_player_update(self, p_id: int, data: Any) -> None:
-        update_thread = threading.Thread(
-                target=self.player_update,
-                args=(p_id, data))
-        update_thread.start()
-        return update_thread
+        A snake that crashes leaves the board even if a head moved into its butt's cell this tick:
 
-    def player_update(self, p_id: int, data: Any) -> None:
+        >>> state = SnakeAttackState(0, 1, board_size=(5, 6), seed=0, item_count=0)
+        >>> state.player_update(1, "a")
+        >>> for key in ("down", "left", "down", "right"):
+        ...     state.player_update(0, key)
+        ...     state.update()
+        >>> state.snakes[0].get_head(), state.snakes[1].dead
+        ((2, 4), True)
+        >>> state.occupancy.owner(2, 4)
+        0
+        >>> state.occupancy.interest.query((1, 1, 5, 6))
+        {0}
+        """
         with self.thread_lock:
-            if p_id == 0:
-                value = self.p_one.key_map.get(data)
-                if value == "quit":
-                    self.running = False
-                else:
-                    try:
-                        new_direction = Direction(value)
-                    except ValueError:
-                        # TODO: raise something bc invalid input
-                        pass
-                    else:
-                        self.snake.set_facing(new_direction)
+            occupancy = self.occupancy
+            moving = [(player_id, snake) for player_id, snake in self.snakes.items() if not snake.dead]
+
+            # Butts leave their cell this tick, so heads may follow straight into them
+            next_heads: Dict[int, Tuple[int, int]] = {}
+            for player_id, snake in moving:
+                next_heads[player_id] = snake.next_head()
+                occupancy.remove(*snake.get_segments().butt())
+
+            head_cells: Dict[Tuple[int, int], int] = {}
+            crashed = set()
+            for player_id, head in next_heads.items():
+                if not occupancy.in_bounds(*head) or occupancy.is_occupied(*head):
+                    # Wall, self or head-to-body hit
+                    crashed.add(player_id)
+                if head in head_cells:
+                    # Head-to-head hit
+                    crashed.add(player_id)
+                    crashed.add(head_cells[head])
+                head_cells[head] = player_id
+
+            for player_id, snake in moving:
+                if player_id in crashed:
+                    snake.dead = True
+                    # The butt segment already left its cell above, and another head may have taken it since
+                    occupancy.remove_cells(islice(snake.get_segments(), 1, None))
+                    continue
+                head, _ = snake.step()
+                occupancy.add(*head, player_id)
+                item = self.items.take(head)
+                if item is not None:
+                    self._grow(player_id, snake, ITEM_GROWTH[item])
+            self.items.spawn()
+
+            if self.snakes and all(snake.dead for snake in self.snakes.values()):
+                self.running = False
 
+            self.tick += 1
+            self._record_tick()
 
+    def _grow(self, player_id: int, snake: Snake, segments: int) -> None:
+        # New segments stack on the butt and unstack as the snake moves
+        for _ in range(segments):
+            snake.add_segment()
+            self.occupancy.add(*snake.get_segments().butt(), player_id)
 
+    def remove_player(self, p_id: int) -> None:
+        """
+        Take a player who left out of the game, killing their snake.
+        """
+        with self.thread_lock:
+            if self.players.pop(p_id, None) is None:
+                return
+            if self.recorder is not None:
+                self.recorder.record_leave(self.tick, p_id)
+            snake = self.snakes[p_id]
+            if not snake.dead:
+                snake.dead = True
+                self.occupancy.remove_cells(snake.get_segments())
+            if all(snake.dead for snake in self.snakes.values()):
+                self.running = False
+
+    def player_update(self, p_id: int, data: Any, seq: int | None=None) -> None:
+        with self.thread_lock:
+            if p_id not in self.players:
+                return
+            if type(seq) is int:
+                self.input_seqs[p_id] = seq
+            if self.recorder is not None:
+                self.recorder.record_input(self.tick, p_id, data)
+            value = self.players[p_id].key_map.get(data)
+            snake = self.snakes[p_id]
+            if value == "quit":
+                self.running = False
+            elif value == "grow":
+                if not snake.dead:
+                    self._grow(p_id, snake, 1)
+            else:
+                try:
+                    new_direction = Direction(value)
+                except ValueError:
+                    # TODO: raise something bc invalid input
+                    pass
+                else:
+                    # A 180° turn would run the head into the neck
+                    if not is_reversal(snake.old_facing, new_direction):
+                        snake.set_facing(new_direction)
@@ -0,0 +1,317 @@
+"""
+Delta-compressed game state snapshots.
+
+The server keeps the last tick each client acknowledged and only sends what changed since then:
+new heads, segments added at or rewritten near the butt, direction changes and deaths.
+Segments are matched by their absolute SnakeBody index, so a delta costs O(ticks since the ack)
+no matter how long the snake is. A full keyframe is sent periodically and whenever the
+acknowledged tick is too old to build a delta from.
+
+Keyframe: {"tick": <int>, "keyframe": True, "status": <bool>, "board": [<columns>, <rows>], "items": {<kind>: [...]},
+           "snakes": {<id>: {"b": <butt index>, "segments": [...], "facing": <int>, "dead": <bool>}}}
+
+Delta: {"tick": <int>, "base": <acknowledged tick>, "status": <bool>, ("items": {<kind>: [...]}),
+        "snakes": {<id>: {"b": <butt index>, "e": <end index>, "butt": [...], "head": [...],
+                          ("facing": <int>), ("dead": <bool>)}},
+        ("hidden": [<id>, ...])}
+
+Items are few, so they are sent whole whenever they changed since the acknowledged tick.
+
+A client that reports its view size only gets the snakes and items in or near its view, see game.interest.
+The client may hold any snapshot sent since its ack, so a snake is only sent as a delta if every one of them
+had it, is otherwise sent whole, and is listed in "hidden" for the client to drop once none of them would.
+
+Snapshots made for a player also carry ("seq": <int>), the sequence number of the last input
+the server applied for them, so the client knows which predicted inputs are settled.
+Their keyframes carry ("player": <id>) so the client knows which snake is its own.
+"""
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, FrozenSet, List, Tuple
+
+from game.interest import get_view_bounds
+
+# Snake ids and item positions a culled snapshot held, None for a snapshot of the whole board
+Visible = Tuple[FrozenSet[int], Dict[str, list]] | None
+
+
+class SnapshotEncoder:
+    KEYFRAME_INTERVAL = 100
+
+    def __init__(self, keyframe_interval: int=KEYFRAME_INTERVAL) -> None:
+        """
+        Initialize the snapshot encoder for one client.
+
+        :param keyframe_interval: (default SnapshotEncoder.KEYFRAME_INTERVAL) a positive integer representing
+                                  the most ticks between full keyframes
+        """
+        self.keyframe_interval: int = keyframe_interval
+        self.acked_tick: int | None = None
+        self.last_keyframe_tick: int | None = None
+        # Columns and rows of the client's view, or None to send the whole board
+        self.view_size: Tuple[int, int] | None = None
+        # What every snapshot since the acknowledged one held, by tick
+        self.sent: Dict[int, Visible] = {}
+
+    def acknowledge(self, tick: int | None) -> None:
+        """
+        Record that the client has applied the snapshot for <tick>.
+        """
+        if type(tick) is int and (self.acked_tick is None or tick > self.acked_tick):
+            self.acked_tick = tick
+            # Ticks are added in order, so the ones older than the ack are at the front
+            while self.sent and next(iter(self.sent)) < tick:
+                del self.sent[next(iter(self.sent))]
+
+    def set_view(self, view_size: Any) -> None:
+        """
+        Cull the snapshots from now on to a view of <view_size> around the client's snake.
+
+        :param view_size: a list or tuple of two positive integers representing the columns and rows
+                          the client shows, anything else is ignored
+        """
+        if (type(view_size) in (list, tuple) and len(view_size) == 2
+                and all(type(size) is int and size > 0 for size in view_size)):
+            self.view_size = (view_size[0], view_size[1])
+
+    def encode(self, state: "SnakeAttackState", player_id: int | None=None) -> Dict[str, Any]:
+        """
+        Get the snapshot to send this client for the current <state>.
+
+        :param state: a SnakeAttackState representing the game to encode
+        :param player_id: (default None) an integer representing the client's player id,
+                          to include the sequence number of their last applied input
+        :postcondition: a keyframe is sent if the client has no usable acknowledged tick,
+                        or if the last keyframe is <keyframe_interval> or more ticks old
+        :return: a dictionary representing a keyframe or a delta from the acknowledged tick
+        """
+        with state.thread_lock:
+            visible = self._get_visible(state, player_id)
+            base_index = state.get_history_index(self.acked_tick)
+            # Deltas need to know what the acknowledged snapshot held
+            if (base_index is None or self.acked_tick not in self.sent or self.last_keyframe_tick is None
+                    or state.tick - self.last_keyframe_tick >= self.keyframe_interval):
+                self.last_keyframe_tick = state.tick
+                snapshot = encode_keyframe(state, visible)
+                if player_id is not None:
+                    snapshot["player"] = player_id
+            else:
+                sent = [held for tick, held in self.sent.items() if tick >= self.acked_tick]
+                snapshot = encode_delta(state, base_index, visible, sent)
+            if player_id in state.input_seqs:
+                snapshot["seq"] = state.input_seqs[player_id]
+            self.sent[state.tick] = visible
+            if len(self.sent) > state.HISTORY_LENGTH:
+                # The client is too far behind for deltas anyway
+                del self.sent[next(iter(self.sent))]
+            return snapshot
+
+    def _get_visible(self, state: "SnakeAttackState", player_id: int | None) -> Visible:
+        if self.view_size is None or player_id not in state.snakes:
+            return None
+        bounds = get_view_bounds(state.snakes[player_id].get_head(), self.view_size, state.board_size)
+        snake_ids = state.occupancy.interest.query(bounds)
+        # The client always follows its own snake, dead or alive
+        snake_ids.add(player_id)
+        return (frozenset(snake_ids), state.items.get_positions(bounds))
+
+
+def encode_keyframe(state: "SnakeAttackState", visible: Visible=None) -> Dict[str, Any]:
+    """
+    Encode all of <state>, or only the snakes and items in <visible> if it is not None.
+    """
+    snake_ids = state.snakes if visible is None else visible[0]
+    return {
+        "tick": state.tick,
+        "keyframe": True,
+        "status": state.running,
+        "board": state.board_size,
+        "items": state.items.get_positions() if visible is None else visible[1],
+        "snakes": {
+            player_id: {
+                "b": state.snakes[player_id].get_segments().butt_index,
+                "segments": list(state.snakes[player_id].get_segments()),
+                "facing": state.snakes[player_id].facing,
+                "dead": state.snakes[player_id].dead}
+            for player_id in snake_ids}}
+
+
+def encode_delta(
+        state: "SnakeAttackState",
+        base_index: int,
+        visible: Visible=None,
+        sent: List[Visible] | None=None) -> Dict[str, Any]:
+    """
+    Encode the changes from the history entry at <base_index> to the current <state>.
+
+    :param visible: (default None) what this snapshot holds, or None for the whole board
+    :param sent: (default None) what every snapshot from the base tick on held, oldest first,
+                 or None if they all held the whole board
+    :precondition: state.thread_lock must be held
+    :precondition: base_index must be a valid index of state.history
+    :return: a dictionary representing the delta snapshot
+    """
+    base_tick, base_records, base_item_changes = state.history[base_index]
+    later_records = [records for _, records, _ in islice(state.history, base_index + 1, None)]
+    snake_ids = state.snakes if visible is None else visible[0]
+    # Snakes the client has in every snapshot since the base, and in any of them
+    held_always = set(base_records)
+    held_any = set()
+    for held in sent or ():
+        snake_ids_held = base_records.keys() if held is None else held[0]
+        held_always &= snake_ids_held
+        held_any |= snake_ids_held
+    culled_before = any(held is not None for held in sent or ())
+    snakes = {}
+    for player_id in snake_ids:
+        snake = state.snakes[player_id]
+        body = snake.get_segments()
+        if player_id not in base_records or player_id not in held_always:
+            snakes[player_id] = {
+                "b": body.butt_index,
+                "segments": list(body),
+                "facing": snake.facing,
+                "dead": snake.dead}
+            continue
+        base_butt, base_end, _, base_facing_changes, base_dead = base_records[player_id]
+
+        # Segments at or past the highest butt index since the base were never popped and re-added
+        keep_from = max(base_butt, body.peak_butt_index)
+        for records in later_records:
+            record = records.get(player_id)
+            if record:
+                keep_from = max(keep_from, record[2])
+
+        butt_index = body.butt_index
+        end_index = body.end_index()
+        head_from = min(max(keep_from, base_end), end_index)
+        delta = {
+            "b": butt_index,
+            "e": end_index,
+            "butt": body.positions_between(butt_index, min(keep_from, end_index)),
+            "head": body.positions_between(head_from, end_index)}
+        if snake.facing_changes != base_facing_changes:
+            delta["facing"] = snake.facing
+        if snake.dead != base_dead:
+            delta["dead"] = snake.dead
+        snakes[player_id] = delta
+    delta = {
+        "tick": state.tick,
+        "base": base_tick,
+        "status": state.running,
+        "snakes": snakes}
+    hidden = [player_id for player_id in held_any if player_id not in snake_ids]
+    if hidden:
+        delta["hidden"] = hidden
+    if visible is not None:
+        if not sent or any(held is None or held[1] != visible[1] for held in sent):
+            delta["items"] = visible[1]
+    elif culled_before or state.items.changes != base_item_changes:
+        delta["items"] = state.items.get_positions()
+    return delta
+
+
+class SnapshotDecoder:
+    """
+    Client side copy of the game state, rebuilt from keyframes and deltas.
+    """
+    def __init__(self) -> None:
+        self.tick: int | None = None
+        self.status: bool = True
+        # Sequence number of the last input the server applied for this client
+        self.input_seq: int | None = None
+        self.player_id: Any = None
+        self.snakes: Dict[Any, Dict[str, Any]] = {}
+        # Cells of the items on the board by kind
+        self.items: Dict[str, list] = {}
+        # Columns and rows of the board, sent with every keyframe
+        self.board_size: Tuple[int, int] | None = None
+
+    def apply(self, snapshot: Dict[str, Any]) -> bool:
+        """
+        Apply a keyframe or delta from the server.
+
+        :param snapshot: a dictionary representing a snapshot made by SnapshotEncoder
+        :postcondition: the snapshot is ignored if it is older than the current copy or
+                        if it is a delta that does not line up with the segments held here
+        :return: a boolean representing whether the snapshot was applied
+        """
+        tick = snapshot.get("tick")
+        if self.tick is not None and tick < self.tick:
+            return False
+        if snapshot.get("keyframe"):
+            self.player_id = snapshot.get("player", self.player_id)
+            if "board" in snapshot:
+                self.board_size = tuple(snapshot["board"])
+            self.snakes = {
+                player_id: SnapshotDecoder._new_snake(snake)
+                for player_id, snake in snapshot["snakes"].items()}
+        else:
+            if self.tick is None or self.tick < snapshot["base"]:
+                return False
+            # Check every snake before touching any so a bad delta leaves the copy intact
+            for player_id, delta in snapshot["snakes"].items():
+                if "segments" not in delta and not self._fits(player_id, delta):
+                    return False
+            for player_id, delta in snapshot["snakes"].items():
+                if "segments" in delta:
+                    self.snakes[player_id] = SnapshotDecoder._new_snake(delta)
+                else:
+                    self._apply_delta(self.snakes[player_id], delta)
+            for player_id in snapshot.get("hidden", ()):
+                self.snakes.pop(player_id, None)
+        self.tick = tick
+        self.status = snapshot["status"]
+        if "items" in snapshot:
+            self.items = snapshot["items"]
+        if "seq" in snapshot:
+            self.input_seq = snapshot["seq"]
+        return True
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Get the current copy in the same form as SnakeAttackState.get_state().
+        """
+        return {
+            "snakes": {
+                player_id: {
+                    "segments": snake["segments"],
+                    "facing": snake["facing"],
+                    "dead": snake["dead"]}
+                for player_id, snake in self.snakes.items()},
+            "items": self.items,
+            "status": self.status}
+
+    def _fits(self, player_id: Any, delta: Dict[str, Any]) -> bool:
+        snake = self.snakes.get(player_id)
+        if snake is None:
+            return False
+        keep_start = delta["b"] + len(delta["butt"])
+        keep_stop = delta["e"] - len(delta["head"])
+        return snake["b"] <= keep_start and keep_stop <= snake["b"] + len(snake["segments"])
+
+    @staticmethod
+    def _apply_delta(snake: Dict[str, Any], delta: Dict[str, Any]) -> None:
+        segments: Deque = snake["segments"]
+        keep_start = delta["b"] + len(delta["butt"])
+        keep_stop = delta["e"] - len(delta["head"])
+        old_end = snake["b"] + len(segments)
+        for _ in range(keep_start - snake["b"]):
+            segments.popleft()
+        for _ in range(old_end - keep_stop):
+            segments.pop()
+        segments.extendleft(reversed(delta["butt"]))
+        segments.extend(delta["head"])
+        snake["b"] = delta["b"]
+        if "facing" in delta:
+            snake["facing"] = delta["facing"]
+        if "dead" in delta:
+            snake["dead"] = delta["dead"]
+
+    @staticmethod
+    def _new_snake(keyframe_snake: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "b": keyframe_snake["b"],
+            "segments": deque(keyframe_snake["segments"]),
+            "facing": keyframe_snake["facing"],
+            "dead": keyframe_snake["dead"]}
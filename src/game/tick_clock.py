@@ -0,0 +1,146 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict
+
+
+class TickClock:
+    """
+    Fixed-timestep schedule for the game simulation.
+
+    Tick deadlines are laid out on a monotonic clock from the moment the clock starts,
+    so a slow tick makes the following sleeps shorter instead of pushing every later tick back.
+    When the simulation falls behind, at most <max_catch_up> ticks are run back to back
+    and the rest of the backlog is skipped.
+    """
+    DEFAULT_TICK_RATE = 20
+    DEFAULT_MAX_CATCH_UP = 5
+
+    def __init__(
+            self,
+            tick_rate: float=DEFAULT_TICK_RATE,
+            max_catch_up: int=DEFAULT_MAX_CATCH_UP,
+            clock: Callable[[], float]=time.monotonic) -> None:
+        """
+        Initialize a stopped tick clock.
+
+        :param tick_rate: (default TickClock.DEFAULT_TICK_RATE) a positive number representing ticks per second in Hz
+        :param max_catch_up: (default TickClock.DEFAULT_MAX_CATCH_UP) a positive integer representing
+                             the most ticks to run in a row when behind schedule
+        :param clock: (default time.monotonic) a function returning the current time in seconds
+        """
+        if tick_rate <= 0:
+            raise ValueError(f"tick_rate must be positive, found {tick_rate}")
+        self.tick_rate: float = tick_rate
+        self.period: float = 1 / tick_rate
+        self.max_catch_up: int = max_catch_up
+        self.clock: Callable[[], float] = clock
+
+        self.tick: int = 0
+        self.next_tick_time: float | None = None
+
+        # Overrun statistics
+        self.overruns: int = 0
+        self.late_ticks: int = 0
+        self.skipped_ticks: int = 0
+        self.last_duration: float = 0.0
+        self.max_duration: float = 0.0
+        self.total_duration: float = 0.0
+        self.max_lateness: float = 0.0
+
+    def start(self) -> None:
+        """
+        Start the schedule with the first tick due right away.
+        """
+        self.next_tick_time = self.clock()
+
+    def due_ticks(self) -> int:
+        """
+        Get how many ticks should run now and move the schedule past them.
+
+        :precondition: the clock must be started
+        :postcondition: the schedule advances by the returned number of ticks plus any skipped ticks
+        :return: an integer from 0 to <max_catch_up> representing the number of ticks to run now
+        """
+        now = self.clock()
+        lateness = now - self.next_tick_time
+        if lateness < 0:
+            return 0
+        due = int(lateness // self.period) + 1
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.late_ticks += due - 1
+        # Skipped ticks stay on the original grid of deadlines instead of shifting it
+        self.next_tick_time += due * self.period
+        if due > self.max_catch_up:
+            self.skipped_ticks += due - self.max_catch_up
+            due = self.max_catch_up
+        return due
+
+    def time_until_next(self) -> float:
+        """
+        Get the seconds left until the next tick is due, or 0 if it is already due.
+        """
+        return max(0.0, self.next_tick_time - self.clock())
+
+    def record_tick(self, duration: float) -> None:
+        """
+        Record how long one tick took to run.
+
+        :param duration: a float representing the seconds spent running the tick
+        :postcondition: the tick counts as an overrun if it took longer than the tick period
+        """
+        self.tick += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        if duration > self.period:
+            self.overruns += 1
+
+    def run(
+            self,
+            step: Callable[[], Any],
+            running: Callable[[], bool],
+            sleep: Callable[[float], Any]=time.sleep) -> None:
+        """
+        Run <step> at the tick rate until <running> returns False.
+
+        :param step: a function representing one simulation tick
+        :param running: a function returning whether to keep ticking
+        :param sleep: (default time.sleep) a function that blocks for a number of seconds
+        """
+        self.start()
+        while self._run_due_ticks(step, running):
+            sleep(self.time_until_next())
+
+    async def run_async(self, step: Callable[[], Any], running: Callable[[], bool]) -> None:
+        """
+        Run <step> at the tick rate until <running> returns False, yielding to the event loop between ticks.
+
+        :param step: a function representing one simulation tick
+        :param running: a function returning whether to keep ticking
+        """
+        self.start()
+        while self._run_due_ticks(step, running):
+            await asyncio.sleep(self.time_until_next())
+
+    def _run_due_ticks(self, step: Callable[[], Any], running: Callable[[], bool]) -> bool:
+        if not running():
+            return False
+        for _ in range(self.due_ticks()):
+            started = self.clock()
+            step()
+            self.record_tick(self.clock() - started)
+            if not running():
+                return False
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tick_rate": self.tick_rate,
+            "ticks": self.tick,
+            "overruns": self.overruns,
+            "late_ticks": self.late_ticks,
+            "skipped_ticks": self.skipped_ticks,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "mean_duration": self.total_duration / self.tick if self.tick else 0.0,
+            "max_lateness": self.max_lateness}
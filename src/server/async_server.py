@@ -0,0 +1,259 @@
+"""
+Event-loop game server.
+
+One reader task per connection feeds framed messages to the connection's room,
+and one shared tick task advances every running room and pushes its snapshots.
+Writes go through the transports' buffers, so a slow client never blocks a tick.
+"""
+import asyncio
+import os
+from typing import Any, Dict, Tuple
+
+from ansi_actions.style import style, Style
+from game.protocol import FrameDecoder, ProtocolError, frame_message, get_control_reply
+from game.replay import ReplayRecorder
+from game.snake_attack_host import SnakeAttackState
+from game.snapshot import SnapshotEncoder
+from game.tick_clock import TickClock
+
+HOST_IP = "127.0.0.1"
+PORT = 63337
+RECEIVE_SIZE = 4096
+
+
+class AsyncClientConnection:
+    # Drop clients that stop reading instead of buffering for them forever
+    MAX_WRITE_BUFFER = 1 << 20
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_id: int) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.client_id = client_id
+        self.connected = True
+        self.decoder = FrameDecoder()
+        self.snapshots = SnapshotEncoder()
+
+    def send(self, value: Any) -> None:
+        """
+        Queue a framed message for the client without waiting for it to be written.
+
+        :postcondition: the client is closed if its unsent backlog grows past MAX_WRITE_BUFFER
+        """
+        if not self.connected:
+            return
+        self.writer.write(frame_message(value))
+        if self.writer.transport.get_write_buffer_size() > AsyncClientConnection.MAX_WRITE_BUFFER:
+            self.close()
+
+    def close(self) -> None:
+        if self.connected:
+            self.connected = False
+            self.writer.close()
+
+
+class AsyncRoom:
+    # Seconds a kicked client has to acknowledge before it is closed anyway
+    KICK_TIMEOUT = 1.0
+
+    def __init__(
+            self,
+            room_id: int,
+            size: int,
+            board_size: Tuple[int, int]=SnakeAttackState.DEFAULT_BOARD_SIZE,
+            replay_path: str | None=None) -> None:
+        """
+        Initialize an empty room that starts its match once <size> clients have joined.
+
+        The match is recorded to <replay_path> if one is given, see game.replay.
+        """
+        self.room_id = room_id
+        self.size = size
+        self.board_size = board_size
+        self.replay_path = replay_path
+        self.recorder: ReplayRecorder | None = None
+        self.connections: Dict[int, AsyncClientConnection] = {}
+        self.state: SnakeAttackState | None = None
+        self.finished = False
+
+    def is_full(self) -> bool:
+        return len(self.connections) >= self.size
+
+    def is_running(self) -> bool:
+        return self.state is not None and not self.finished
+
+    def join(self, connection: AsyncClientConnection) -> None:
+        self.connections[connection.client_id] = connection
+        if self.is_full():
+            self.start()
+
+    def start(self) -> None:
+        self.state = SnakeAttackState(*self.connections.keys(), board_size=self.board_size)
+        if self.replay_path is not None:
+            self.recorder = ReplayRecorder(open(self.replay_path, "wb"), self.state)
+        for connection in self.connections.values():
+            connection.send("start_game")
+
+    def leave(self, connection: AsyncClientConnection) -> None:
+        self.connections.pop(connection.client_id, None)
+        if self.state is not None:
+            self.state.remove_player(connection.client_id)
+        elif not self.connections:
+            self.finished = True
+
+    def handle_message(self, connection: AsyncClientConnection, message: Any) -> None:
+        if self.finished:
+            # Kicked clients only have their acknowledgement left to send
+            if message == "acknowledged_kick":
+                connection.close()
+            return
+        if self.state is None:
+            connection.send(f"{len(self.connections)}/{self.size} connected")
+            return
+        # Messages are {"input": <key>, "seq": <input number>, "ack": <last applied snapshot tick>,
+        # "view": [<columns>, <rows>]}, any of which may be missing
+        seq = None
+        if type(message) is dict:
+            connection.snapshots.acknowledge(message.get("ack"))
+            if "view" in message:
+                connection.snapshots.set_view(message["view"])
+            seq = message.get("seq")
+            message = message.get("input")
+        if message is not None:
+            self.state.player_update(connection.client_id, message, seq)
+
+    def tick(self) -> None:
+        self.state.update()
+        for connection in list(self.connections.values()):
+            connection.send(connection.snapshots.encode(self.state, connection.client_id))
+        if not self.state.running:
+            self.finish()
+
+    def finish(self) -> None:
+        self.finished = True
+        if self.recorder is not None:
+            # Players leave after the end, which is not part of the match
+            self.state.recorder = None
+            self.recorder.close(self.state.tick)
+            self.recorder.output.close()
+        loop = asyncio.get_running_loop()
+        for connection in self.connections.values():
+            # Closed once the client acknowledges, like the threaded host's kick handshake
+            connection.send("kick")
+            loop.call_later(AsyncRoom.KICK_TIMEOUT, connection.close)
+
+
+class AsyncGameServer:
+    ROOM_SIZE = 2
+    TICK_RATE = 20
+
+    def __init__(
+            self,
+            ip: str=HOST_IP,
+            port: int=PORT,
+            room_size: int=ROOM_SIZE,
+            tick_rate: float=TICK_RATE,
+            replay_directory: str | None=None) -> None:
+        """
+        Initialize an event-loop server that groups clients into rooms of <room_size> in join order.
+
+        :param ip: (default HOST_IP) a string representing the address to listen on
+        :param port: (default PORT) an integer representing the port to listen on
+        :param room_size: (default AsyncGameServer.ROOM_SIZE) a positive integer representing players per match
+        :param tick_rate: (default AsyncGameServer.TICK_RATE) a positive number representing simulation ticks per second
+        :param replay_directory: (default None) a string representing an existing directory to record
+                                 every match to as room-<room id>.replay, or None to not record them
+        """
+        self.ip = ip
+        self.port = port
+        self.room_size = room_size
+        self.tick_clock = TickClock(tick_rate)
+        self.replay_directory = replay_directory
+        self.rooms: Dict[int, AsyncRoom] = {}
+        self.waiting_room: AsyncRoom | None = None
+        self.next_client_id = 0
+        self.next_room_id = 0
+        self.running = False
+
+    async def serve(self) -> None:
+        """
+        Accept clients and run the shared tick task until stop() is called.
+        """
+        server = await asyncio.start_server(self._handle_connection, self.ip, self.port)
+        print(f"Listening on {self.ip}:{self.port}...")
+        async with server:
+            await self.run()
+
+    async def run(self) -> None:
+        """
+        Run the shared tick task until stop() is called, without accepting clients.
+        """
+        self.running = True
+        await self.tick_clock.run_async(self.tick, lambda: self.running)
+
+    def stop(self) -> None:
+        self.running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.tick_clock.get_stats()
+        stats["rooms"] = len(self.rooms)
+        return stats
+
+    def tick(self) -> None:
+        for room_id, room in list(self.rooms.items()):
+            if room.is_running():
+                room.tick()
+            if room.finished:
+                del self.rooms[room_id]
+
+    def _assign_room(self, connection: AsyncClientConnection) -> AsyncRoom:
+        if self.waiting_room is None or self.waiting_room.is_full() or self.waiting_room.finished:
+            replay_path = None
+            if self.replay_directory is not None:
+                replay_path = os.path.join(self.replay_directory, f"room-{self.next_room_id}.replay")
+            self.waiting_room = AsyncRoom(self.next_room_id, self.room_size, replay_path=replay_path)
+            self.rooms[self.next_room_id] = self.waiting_room
+            self.next_room_id += 1
+        room = self.waiting_room
+        room.join(connection)
+        return room
+
+    async def run_connection(self, connection: AsyncClientConnection, room: AsyncRoom) -> None:
+        """
+        Feed messages from <connection> to <room> until the client disconnects.
+
+        :postcondition: the client leaves <room> and is closed once it disconnects
+        """
+        try:
+            while connection.connected:
+                data = await connection.reader.read(RECEIVE_SIZE)
+                if not data:
+                    break
+                for message in connection.decoder.feed(data):
+                    reply = get_control_reply(message, self.get_stats)
+                    if reply is not None:
+                        connection.send(reply)
+                    else:
+                        room.handle_message(connection, message)
+        except (OSError, ProtocolError):
+            pass
+        finally:
+            room.leave(connection)
+            connection.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = AsyncClientConnection(reader, writer, self.next_client_id)
+        self.next_client_id += 1
+        connection.send(f"You connected to {self.ip}:{self.port}")
+        await self.run_connection(connection, self._assign_room(connection))
+
+
+def main():
+    server = AsyncGameServer()
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print(style("Server stopped.", Style.YELLOW))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,31 @@
 import time 
+import signal
 import socket
-import pickle
+from collections import deque
 from threading import Thread, Lock
-from typing import Callable, Any, Dict
+from typing import Callable, Any, Deque, Dict
 
 from ansi_actions.cursor import cursor_set, cursor_shift, set_cursor_visibility
 from ansi_actions.style import style, Style
 from terminal.screen import clear_screen, get_screen_size
+from game.protocol import FrameDecoder, ProtocolError, frame_message, get_control_reply, pack_messages
+from game.snapshot import SnapshotEncoder
 
+from metrics import COUNT_BOUNDS, Metrics
 from snake_attack_server import SnakeAttackHost
 
 HOST_IP = "127.0.0.1"
 PORT = 63337
+RECEIVE_SIZE = 4096
+# Seconds between disconnect checks
+CHECK_INTERVAL = 0.1
+# Seconds between metrics dumps while a game runs
+METRICS_DUMP_INTERVAL = 10.0
+# Ticks of sent snapshots remembered for timing round trips from client acks
+SENT_TICKS_LENGTH = 64
+
+# Shared by every handler and the game host, dumped as JSON lines and sent in stats replies
+metrics = Metrics()
 
 
 class ClientConnection:
@@ -22,6 +36,10 @@ class ClientConnection:
         self.client_id = client_id
         self.reply_in = b"None"
         self.reply_out = b"None"
+        self.decoder = FrameDecoder()
+        self.inbox: Deque[Any] = deque()
+        # The host thread pushes snapshots while the handler thread replies
+        self.send_lock = Lock()
 
     def is_active(self) -> bool:
         return self.connected and bool(self.reply_in)
@@ -33,26 +51,39 @@ class ClientConnection:
         self.connection.close()
         self.set_disconnected()
 
-    def send(self, value: str | bytes) -> None:
-        if (type(value) is str):
-            value = str.encode(value)
-        self.connection.send(value)
-        self.reply_out = value
-
-    def sendall(self, value: str | bytes) -> None:
-        if (type(value) is str):
-            value = str.encode(value)
-        self.connection.sendall(value)
-        self.reply_out = value
-
-    def receive(self, size: int, as_string: bool=True) -> str:
-        self.reply_in = self.connection.recv(size)
-        if not self.reply_in:
-            self.set_disconnected
-        if as_string:
-            return self.reply_in.decode("utf-8")
-        else:
-            return self.reply_in
+    def send(self, value: Any) -> None:
+        self.send_framed(frame_message(value))
+
+    def send_framed(self, framed: bytes) -> None:
+        with self.send_lock:
+            self.connection.sendall(framed)
+        self.reply_out = framed
+        metrics.increment("bytes_sent", len(framed))
+
+    def send_many(self, *values: Any) -> None:
+        # One buffer and one syscall for every message
+        self.send_framed(pack_messages(*values))
+
+    def receive(self) -> Any:
+        """
+        Block until the next full message arrives from the client.
+
+        :postcondition: the client is marked disconnected if the connection closed or sent a malformed message
+        :return: the decoded message, or None if the client disconnected
+        """
+        while not self.inbox:
+            try:
+                self.reply_in = self.connection.recv(RECEIVE_SIZE)
+                self.inbox.extend(self.decoder.feed(self.reply_in))
+                metrics.increment("bytes_received", len(self.reply_in))
+                # Messages that arrived together and wait to be handled one by one
+                metrics.observe("inbox_depth", len(self.inbox), COUNT_BOUNDS)
+            except (OSError, ProtocolError):
+                self.reply_in = b""
+            if not self.reply_in:
+                self.set_disconnected()
+                return None
+        return self.inbox.popleft()
 
     @staticmethod
     def wait_for_client(
@@ -69,6 +100,12 @@ class ClientHandler:
         self.thread = None
         self.running = False
 
+        # Set once the client has been told the game started and can take pushed snapshots
+        self.subscribed = False
+        self.snapshots = SnapshotEncoder()
+        # (tick, time sent) of recent snapshots, the client's acks time the round trip
+        self.sent_ticks: Deque[tuple] = deque(maxlen=SENT_TICKS_LENGTH)
+
     def set_client(self, client: ClientConnection) -> bool:
         if client is None or \
                 not type(client) is ClientConnection or \
@@ -98,43 +135,93 @@ class ClientHandler:
     def handle_kick(self) -> int:
         print(f"Kicking client {self.client.client_id}...")
         while self.running:
-            print("doing kick")
-            data = self.client.receive(2048, as_string=False)
-            if not data or pickle.loads(data) == "acknowledged_kick":
+            data = self.client.receive()
+            if not data or data == "acknowledged_kick":
                 print(f"Kicked client {self.client.client_id}...")
                 self.client.close()
                 self.running = False
                 break
-            self.client.sendall(pickle.dumps("kick"))
+            self.client.send("kick")
 
     def handle_waiting(self, clients: Dict[int, Dict[str, Any]]) -> int:
         print(f"Client: {self.client.client_id} connected.")
         while self.running:
             # Recieve client data (bytes)
-            data = self.client.receive(2048, as_string=False)
+            data = self.client.receive()
             if not self.client.is_active():
                 print(f"Client {self.client.client_id} disconnected")
                 return 2
-            self.client.sendall(pickle.dumps(f"{len(clients)}/2 connected"))
+            reply = get_control_reply(data)
+            self.client.send(reply if reply is not None else f"{len(clients)}/2 connected")
 
-    def handle_game_as_snake(self, game) -> int:
+    def handle_game_as_snake(self, game, get_stats: Callable[[], Dict[str, Any]] | None=None) -> int:
         print(f"Starting game, Player: {self.client.client_id} connected.")
-        data = self.client.receive(2048, as_string=False)
-        self.client.send(pickle.dumps("start_game"))
+        data = self.client.receive()
+        self.client.send("start_game")
+        self.subscribed = True
+        # Inputs are one-way, the host pushes a snapshot after every tick
         while self.running:
             # Recieve client data (bytes)
-            data = self.client.receive(2048, as_string=False)
+            data = self.client.receive()
             if not self.client.is_active():
                 print(f"Client {self.client.client_id} disconnected")
+                self.subscribed = False
                 return 2
-            data = pickle.loads(data)
-            print(f"Received '{data}' from {self.client.client_id}")
-
-            game.try_player_update(self.client.client_id, data).join()
-            self.client.sendall(pickle.dumps(game.get_state()))
+            metrics.increment("messages_received")
+
+            reply = get_control_reply(data, get_stats)
+            if reply is not None:
+                self.client.send(reply)
+                continue
+            # Messages are {"input": <key>, "seq": <input number>, "ack": <last applied snapshot tick>,
+            # "view": [<columns>, <rows>]}, any of which may be missing
+            seq = None
+            if type(data) is dict:
+                self.snapshots.acknowledge(data.get("ack"))
+                if "view" in data:
+                    self.snapshots.set_view(data["view"])
+                self.time_round_trip(data.get("ack"))
+                seq = data.get("seq")
+                data = data.get("input")
+            if data is not None:
+                game.player_update(self.client.client_id, data, seq)
+        self.subscribed = False
         print("Left normally")
         return 0
 
+    def push_snapshot(self, game) -> None:
+        """
+        Send the client a snapshot of <game> if it is in the game.
+
+        :postcondition: the client is marked disconnected if the send fails
+        """
+        if not (self.subscribed and self.client.is_active()):
+            return
+        with metrics.time("serialize"):
+            framed = frame_message(self.snapshots.encode(game, self.client.client_id))
+        try:
+            with metrics.time("send"):
+                self.client.send_framed(framed)
+        except OSError:
+            self.client.set_disconnected()
+            return
+        self.sent_ticks.append((game.tick, time.perf_counter()))
+
+    def time_round_trip(self, tick: int | None) -> None:
+        """
+        Record the round trip time of the snapshot for <tick> if this is the first ack of it.
+        """
+        now = time.perf_counter()
+        sent_ticks = self.sent_ticks
+        try:
+            # The host thread appends while this runs, so only ever look at the oldest entry
+            while sent_ticks[0][0] < tick:
+                sent_ticks.popleft()
+            if sent_ticks[0][0] == tick:
+                metrics.observe(f"rtt.client_{self.client.client_id}", now - sent_ticks.popleft()[1])
+        except (IndexError, TypeError):
+            pass
+
 
 # Start main
 
@@ -157,6 +244,7 @@ def check_disconnects(clients: Dict[int, Dict[str, Any]]) -> None:
                 to_remove.add(client_id)
         for client_id in to_remove:
             update_client_status(clients, client_id, False)
+        time.sleep(CHECK_INTERVAL)
 
 def update_client_status(
         clients: Dict[int, Dict[str, Any]],
@@ -231,7 +319,8 @@ def main():
         #cursor_shift("left", get_screen_size()[0])
         print(style("Starting...", Style.GREEN))
 
-        game_host = SnakeAttackHost(clients)
+        game_host = SnakeAttackHost(clients, metrics=metrics)
+        metrics.start_dumping(METRICS_DUMP_INTERVAL)
         try:
             game_host.start_game()
         except Exception as e:
@@ -242,6 +331,8 @@ def main():
             return e
         
         game_host.clean_up()
+        metrics.stop_dumping()
+        metrics.dump()
 
         stop_server = True
         t.join()
@@ -257,6 +348,9 @@ def main():
 if __name__ == "__main__":
     clear_screen()
     set_cursor_visibility(False)
+    if hasattr(signal, "SIGUSR1"):
+        # kill -USR1 <pid> turns the sampling profiler on, and again to turn it off and dump its results
+        metrics.install_profiler_signal(signal.SIGUSR1)
     print("Attempting to start server...")
     error = main()
     print(error)
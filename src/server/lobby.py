@@ -0,0 +1,318 @@
+"""
+Lobby and matchmaker that shards matches across worker processes.
+
+The lobby accepts any number of clients, answers them while they wait and groups them into rooms.
+Each full room is handed to the least busy worker process by passing the client sockets' file descriptors
+over a Unix socket, so no game traffic goes through the lobby afterwards. The socket is a sequenced packet
+socket, so it reads as closed as soon as a worker exits and the lobby stops handing rooms to it.
+Every worker runs the event-loop server core for all of its rooms.
+"""
+import asyncio
+import multiprocessing
+import os
+import selectors
+import socket
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from ansi_actions.style import style, Style
+from game.protocol import FrameDecoder, ProtocolError, decode_message, encode_message, frame_message, get_control_reply
+from game.snake_attack_host import SnakeAttackState
+
+from async_server import AsyncClientConnection, AsyncGameServer, AsyncRoom, HOST_IP, PORT, RECEIVE_SIZE
+
+# Largest packet used for hand-offs and room reports between the lobby and workers
+CHANNEL_MESSAGE_SIZE = 1 << 16
+
+
+class WaitingClient:
+    __slots__ = ("connection", "client_id", "decoder")
+
+    def __init__(self, connection: socket.socket, client_id: int) -> None:
+        self.connection = connection
+        self.client_id = client_id
+        self.decoder = FrameDecoder()
+
+
+class RoomWorker(AsyncGameServer):
+    """
+    Worker process side: adopts handed-off client sockets into rooms and runs them.
+    """
+    # Most sockets one hand-off can carry
+    MAX_ROOM_SIZE = 64
+
+    def __init__(self, channel: socket.socket, tick_rate: float, board_size: Tuple[int, int]) -> None:
+        super().__init__(tick_rate=tick_rate)
+        self.channel = channel
+        self.board_size = board_size
+
+    async def run(self) -> None:
+        self.channel.setblocking(False)
+        asyncio.get_running_loop().add_reader(self.channel.fileno(), self._receive_hand_off)
+        await super().run()
+
+    def tick(self) -> None:
+        for room_id, room in list(self.rooms.items()):
+            if room.is_running():
+                room.tick()
+            if room.finished:
+                del self.rooms[room_id]
+                self._report({"finished": room_id})
+
+    def _report(self, message: Dict[str, Any]) -> None:
+        try:
+            self.channel.send(encode_message(message))
+        except OSError:
+            self.stop()
+
+    def _receive_hand_off(self) -> None:
+        try:
+            message, fds, _, _ = socket.recv_fds(self.channel, CHANNEL_MESSAGE_SIZE, RoomWorker.MAX_ROOM_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            message, fds = b"", []
+        if not message:
+            # The lobby has gone away
+            self.stop()
+            return
+        hand_off = decode_message(message)
+        room = AsyncRoom(hand_off["room"], len(fds), self.board_size)
+        self.rooms[room.room_id] = room
+        for fd, (client_id, pending) in zip(fds, hand_off["clients"]):
+            asyncio.create_task(self._adopt(room, fd, client_id, pending))
+
+    async def _adopt(self, room: AsyncRoom, fd: int, client_id: int, pending: bytes) -> None:
+        reader, writer = await asyncio.open_connection(sock=socket.socket(fileno=fd))
+        connection = AsyncClientConnection(reader, writer, client_id)
+        # Bytes of a message the lobby had only partly received
+        connection.decoder.feed(pending)
+        room.join(connection)
+        await self.run_connection(connection, room)
+
+
+def run_room_worker(channel: socket.socket, tick_rate: float, board_size: Tuple[int, int]) -> None:
+    """
+    Run a worker process until the lobby closes its channel.
+    """
+    try:
+        asyncio.run(RoomWorker(channel, tick_rate, board_size).run())
+    except KeyboardInterrupt:
+        pass
+
+
+class Lobby:
+    ROOM_SIZE = 2
+    TICK_RATE = 20
+
+    def __init__(
+            self,
+            ip: str=HOST_IP,
+            port: int=PORT,
+            room_size: int=ROOM_SIZE,
+            workers: int | None=None,
+            tick_rate: float=TICK_RATE,
+            board_size: Tuple[int, int]=SnakeAttackState.DEFAULT_BOARD_SIZE) -> None:
+        """
+        Initialize a lobby that groups clients into rooms of <room_size> and runs them on <workers> processes.
+
+        :param ip: (default HOST_IP) a string representing the address to listen on
+        :param port: (default PORT) an integer representing the port to listen on
+        :param room_size: (default Lobby.ROOM_SIZE) an integer from 1 to RoomWorker.MAX_ROOM_SIZE
+                          representing players per match
+        :param workers: (default None) a positive integer representing the number of worker processes,
+                        or None for one per CPU core
+        :param tick_rate: (default Lobby.TICK_RATE) a positive number representing simulation ticks per second
+        :param board_size: (default SnakeAttackState.DEFAULT_BOARD_SIZE) a tuple of two integers
+                           representing the columns and rows of every match's board
+        """
+        if not 0 < room_size <= RoomWorker.MAX_ROOM_SIZE:
+            raise ValueError(f"room_size must be from 1 to {RoomWorker.MAX_ROOM_SIZE}, found {room_size}")
+        self.ip = ip
+        self.port = port
+        self.room_size = room_size
+        self.worker_count = workers or os.cpu_count() or 1
+        self.tick_rate = tick_rate
+        self.board_size = board_size
+
+        self.selector = selectors.DefaultSelector()
+        self.waiting: Deque[WaitingClient] = deque()
+        self.processes: List[multiprocessing.Process] = []
+        self.channels: List[socket.socket] = []
+        # Rooms running on each worker, used to pick the least busy one
+        self.worker_rooms: List[set] = []
+        self.next_client_id = 0
+        self.next_room_id = 0
+        self.running = False
+
+    def serve(self) -> None:
+        """
+        Start the workers and accept clients until stop() is called or the process is interrupted.
+        """
+        if not hasattr(socket, "send_fds"):
+            print(style("Lobby needs a POSIX system to pass sockets to workers, use async_server instead", Style.RED))
+            return
+        self._start_workers()
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind((self.ip, self.port))
+            server.listen(socket.SOMAXCONN)
+            server.setblocking(False)
+            self.selector.register(server, selectors.EVENT_READ, self._accept)
+            print(f"Lobby listening on {self.ip}:{self.port} with {self.worker_count} workers...")
+            self.running = True
+            try:
+                while self.running:
+                    for key, _ in self.selector.select(timeout=1):
+                        key.data(key.fileobj)
+            finally:
+                self._stop_workers()
+
+    def stop(self) -> None:
+        self.running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "waiting": len(self.waiting),
+            "workers": len(self.channels),
+            "rooms": sum(map(len, self.worker_rooms))}
+
+    def _start_workers(self) -> None:
+        for _ in range(self.worker_count):
+            lobby_end, worker_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            process = multiprocessing.Process(
+                    target=run_room_worker,
+                    args=(worker_end, self.tick_rate, self.board_size),
+                    daemon=True)
+            process.start()
+            worker_end.close()
+            self.processes.append(process)
+            self.channels.append(lobby_end)
+            self.worker_rooms.append(set())
+            self.selector.register(lobby_end, selectors.EVENT_READ, self._read_worker)
+
+    def _stop_workers(self) -> None:
+        for channel in self.channels:
+            channel.close()
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+
+    def _accept(self, server: socket.socket) -> None:
+        try:
+            connection, _ = server.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(True)
+        client = WaitingClient(connection, self.next_client_id)
+        self.next_client_id += 1
+        try:
+            connection.sendall(frame_message(f"You connected to {self.ip}:{self.port}"))
+        except OSError:
+            connection.close()
+            return
+        self.waiting.append(client)
+        self._watch_waiting(client)
+        if len(self.waiting) >= self.room_size:
+            self._hand_off([self.waiting.popleft() for _ in range(self.room_size)])
+
+    def _watch_waiting(self, client: WaitingClient) -> None:
+        self.selector.register(client.connection, selectors.EVENT_READ, lambda _: self._read_waiting(client))
+
+    def _read_waiting(self, client: WaitingClient) -> None:
+        if client.connection.fileno() == -1:
+            # Handed off earlier in the same batch of selector events
+            return
+        try:
+            data = client.connection.recv(RECEIVE_SIZE)
+            messages = client.decoder.feed(data) if data else None
+        except (OSError, ProtocolError):
+            messages = None
+        if messages is None:
+            self._drop_waiting(client)
+            return
+        if messages:
+            replies = [get_control_reply(message, self.get_stats) for message in messages]
+            try:
+                client.connection.sendall(b"".join(
+                    frame_message(reply if reply is not None else f"{len(self.waiting)}/{self.room_size} waiting")
+                    for reply in replies))
+            except OSError:
+                self._drop_waiting(client)
+
+    def _drop_waiting(self, client: WaitingClient) -> None:
+        self.selector.unregister(client.connection)
+        client.connection.close()
+        try:
+            self.waiting.remove(client)
+        except ValueError:
+            pass
+
+    def _read_worker(self, channel: socket.socket) -> None:
+        try:
+            report = channel.recv(CHANNEL_MESSAGE_SIZE)
+        except OSError:
+            report = b""
+        worker = self.channels.index(channel)
+        if not report:
+            self._drop_worker(worker)
+            return
+        self.worker_rooms[worker].discard(decode_message(report).get("finished"))
+
+    def _drop_worker(self, worker: int) -> None:
+        """
+        Forget the worker at index <worker> after its process has exited.
+        """
+        channel = self.channels.pop(worker)
+        process = self.processes.pop(worker)
+        self.worker_rooms.pop(worker)
+        self.selector.unregister(channel)
+        channel.close()
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+        print(style(f"Worker process {process.pid} stopped, {len(self.channels)} left", Style.RED))
+
+    def _hand_off(self, clients: List[WaitingClient]) -> None:
+        for client in clients:
+            self.selector.unregister(client.connection)
+        # Any partly received message is passed on so the worker's decoder stays in step
+        pending = [client.decoder.take_pending() for client in clients]
+        fds = [client.connection.fileno() for client in clients]
+        while self.channels:
+            worker = min(range(len(self.channels)), key=lambda index: len(self.worker_rooms[index]))
+            hand_off = encode_message({
+                "room": self.next_room_id,
+                "clients": [[client.client_id, data] for client, data in zip(clients, pending)]})
+            try:
+                socket.send_fds(self.channels[worker], [hand_off], fds)
+            except OSError:
+                # The worker exited after the lobby last heard from it
+                self._drop_worker(worker)
+                continue
+            # The worker now holds its own copies of the sockets
+            for client in clients:
+                client.connection.close()
+            self.worker_rooms[worker].add(self.next_room_id)
+            self.next_room_id += 1
+            return
+        # Nowhere to run the room, so the clients wait again at the front of the queue
+        for client, data in zip(clients, pending):
+            client.decoder.feed(data)
+            self._watch_waiting(client)
+        self.waiting.extendleft(reversed(clients))
+        print(style("No workers left to run rooms", Style.RED))
+        self.stop()
+
+
+def main():
+    lobby = Lobby()
+    try:
+        lobby.serve()
+    except KeyboardInterrupt:
+        print(style("Lobby stopped.", Style.YELLOW))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Counters, histograms and an optional sampling profiler for the game servers.
+
+Histograms keep counts in fixed buckets, so recording a value is O(log buckets) and never allocates,
+and percentiles are read back from the buckets with the bucket's upper bound as the estimate.
+A server reports snapshot() through its stats reply, or dumps it as one JSON line at a fixed interval.
+"""
+import bisect
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, TextIO
+
+# Bucket upper bounds for durations in seconds: 1 microsecond doubling up to about 8 seconds
+TIME_BOUNDS = tuple(1e-6 * 2 ** exponent for exponent in range(24))
+# Bucket upper bounds for sizes and queue depths: 0, then powers of two up to 65536
+COUNT_BOUNDS = (0,) + tuple(2 ** exponent for exponent in range(17))
+# Percentiles included in every histogram summary
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+
+class Histogram:
+    __slots__ = ("bounds", "buckets", "count", "total", "minimum", "maximum")
+
+    def __init__(self, bounds: Sequence[float]=TIME_BOUNDS) -> None:
+        """
+        Initialize an empty histogram.
+
+        :param bounds: (default TIME_BOUNDS) ascending numbers representing the upper bound of every bucket,
+                       values above the last bound go in one extra bucket
+        """
+        self.bounds = bounds
+        self.buckets: List[int] = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimate the value below which <percent> percent of the observations fall.
+
+        :precondition: at least one value must have been observed
+        :return: a float representing the upper bound of the bucket holding the percentile,
+                 limited to the largest observed value
+        """
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                if index == len(self.bounds):
+                    return self.maximum
+                return min(self.bounds[index], self.maximum)
+        return self.maximum
+
+    def summarize(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0}
+        summary = {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.minimum,
+            "max": self.maximum}
+        for percent in SUMMARY_PERCENTILES:
+            summary[f"p{percent}"] = self.percentile(percent)
+        return summary
+
+
+class Metrics:
+    """
+    Thread-safe registry of named counters and histograms.
+    """
+    def __init__(self) -> None:
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.profiler: SamplingProfiler | None = None
+        self._dump_thread: threading.Thread | None = None
+        self._dumping = False
+
+    def increment(self, name: str, amount: int=1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float, bounds: Sequence[float]=TIME_BOUNDS) -> None:
+        """
+        Record <value> in the histogram called <name>, which is made with <bounds> the first time.
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(bounds)
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """
+        Record how long the body of the with statement takes in the histogram called <name>.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get every counter and a summary of every histogram.
+        """
+        with self.lock:
+            snapshot = {
+                "time": time.time(),
+                "uptime": time.time() - self.started,
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.summarize() for name, histogram in self.histograms.items()}}
+        if self.profiler is not None:
+            # The running profile, or the last one after it was stopped
+            snapshot["profile"] = self.profiler.top()
+        return snapshot
+
+    def dump(self, output: TextIO | None=None) -> None:
+        """
+        Write snapshot() to <output> (default sys.stdout) as one line of JSON.
+        """
+        output = output or sys.stdout
+        output.write(json.dumps(self.snapshot()) + "\n")
+        output.flush()
+
+    def start_dumping(self, interval: float, output: TextIO | None=None) -> None:
+        """
+        Dump the metrics every <interval> seconds from a background thread until stop_dumping() is called.
+        """
+        if self._dump_thread is not None:
+            return
+        self._dumping = True
+
+        def dump_loop() -> None:
+            while self._dumping:
+                time.sleep(interval)
+                if self._dumping:
+                    self.dump(output)
+
+        self._dump_thread = threading.Thread(target=dump_loop, daemon=True)
+        self._dump_thread.start()
+
+    def stop_dumping(self) -> None:
+        self._dumping = False
+        self._dump_thread = None
+
+    def toggle_profiler(self) -> bool:
+        """
+        Start the sampling profiler if it is off, or stop it and dump what it found if it is on.
+
+        Must not be called from a signal handler, use install_profiler_signal() for that.
+
+        :return: a boolean representing whether the profiler is now running
+        """
+        if self.profiler is not None and self.profiler.running:
+            self.profiler.stop()
+            self.dump()
+            return False
+        self.profiler = SamplingProfiler()
+        self.profiler.start()
+        return True
+
+    def install_profiler_signal(self, signal_number: int) -> None:
+        """
+        Toggle the sampling profiler every time the process receives <signal_number>.
+
+        The handler runs on the main thread between any two bytecodes, possibly while it holds the lock
+        in observe(), so the handler only sets an event and a background thread toggles and dumps.
+        """
+        requested = threading.Event()
+
+        def toggle_loop() -> None:
+            while True:
+                requested.wait()
+                requested.clear()
+                self.toggle_profiler()
+
+        threading.Thread(target=toggle_loop, daemon=True).start()
+        signal.signal(signal_number, lambda *_: requested.set())
+
+
+class SamplingProfiler:
+    """
+    Profiler that periodically records where every other thread is running.
+
+    Nothing is traced between samples, so it costs about the same whether the server is busy or idle
+    and can be turned on while the server runs.
+    """
+    DEFAULT_INTERVAL = 0.005
+    # Stack frames kept per sample, from the innermost
+    STACK_DEPTH = 4
+
+    def __init__(self, interval: float=DEFAULT_INTERVAL) -> None:
+        """
+        :param interval: (default SamplingProfiler.DEFAULT_INTERVAL) a positive number representing
+                         the seconds between samples
+        """
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        # Held while the sampler thread records a sample, so readers never see the counter change size
+        self.lock = threading.Lock()
+        self.running = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def top(self, amount: int=10) -> List[Dict[str, Any]]:
+        """
+        Get the <amount> stacks seen in the most samples, innermost frame first.
+        """
+        with self.lock:
+            most_common = self.stacks.most_common(amount)
+            samples = max(1, self.samples)
+        return [{"stack": list(stack), "share": count / samples} for stack, count in most_common]
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while self.running:
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < SamplingProfiler.STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                    frame = frame.f_back
+                stacks.append(tuple(stack))
+            with self.lock:
+                self.stacks.update(stacks)
+                self.samples += len(stacks)
+            time.sleep(self.interval)
@@ -1,46 +1,63 @@
+from typing import Any, Dict
+
 from game.snake_attack_host import SnakeAttackState
-import time
+from game.tick_clock import TickClock
+
+from metrics import Metrics
 
 
 class SnakeAttackHost:
-    FPS = 2
-    def __init__(self, clients):
+    TICK_RATE = 20
+    def __init__(self, clients, tick_rate: float=TICK_RATE, metrics: Metrics | None=None):
         self.clients = clients
+        self.metrics = metrics or Metrics()
         self.client_one = clients[0]["handler"]
         self.client_two = clients[1]["handler"]
 
-        self.game_state = SnakeAttackState(
-                clients[0]["client"].client_id,
-                clients[1]["client"].client_id)
+        # Only client one plays, client two is kicked once the game starts
+        self.game_state = SnakeAttackState(clients[0]["client"].client_id)
 
+        self.tick_clock = TickClock(tick_rate)
         self.running = False
 
     def start_game(self):
         self.running = True
-        current_time = time.time()
-        previous_time = current_time
-        
+
         self.client_one.stop()
         self.client_two.stop()
 
         self.client_one.set_thread(
                 self.client_one.handle_game_as_snake,
-                target_args=(self.game_state,))
+                target_args=(self.game_state, self.get_stats))
 
         self.client_two.set_thread(self.client_two.handle_kick)
         self.client_two.run()
 
         self.client_one.run()
-        while self.game_state.running:
-            previous_time = current_time
-            current_time = time.time()
-            delta_t = current_time - previous_time
+        self.tick_clock.run(
+                self.tick,
+                lambda: self.game_state.running)
+        # Push the final state so the client sees the game end
+        self.broadcast()
+        self.client_one.stop()
 
-            if delta_t < SnakeAttackHost.FPS:
-                time.sleep(SnakeAttackHost.FPS - delta_t)
+    def tick(self):
+        with self.metrics.time("tick"):
+            with self.metrics.time("simulation"):
+                self.game_state.update()
+            self.broadcast()
+        self.metrics.increment("ticks")
 
-            self.game_state.update()
-        self.client_one.stop()
+    def broadcast(self):
+        self.client_one.push_snapshot(self.game_state)
+
+    def get_tick_stats(self):
+        return self.tick_clock.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.get_tick_stats()
+        stats["metrics"] = self.metrics.snapshot()
+        return stats
 
     def clean_up(self):
         self.client_one.stop()